@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+# the modules the CLI and the pipeline stages import, and the commands timed from a fresh interpreter
+MODULES = [
+    "src.pipeline.cli",
+    "src.pipeline.sharding",
+    "src.data.parse_data",
+    "src.features.openai_gpt4",
+    "src.features.extract_information",
+    "src.models.predict_model",
+]
+COMMANDS = {"cli --help": [sys.executable, "-m", "src.pipeline.cli", "--help"]}
+# packages that are slow to import and only needed by some commands: importing MODULES must not load them
+HEAVY_PACKAGES = ["openai", "fitz", "ocrmypdf", "nltk", "geopy", "langchain", "langchain_community", "polars"]
+
+_ROOT = Path(__file__).resolve().parents[2]
+_PROBE = "import json, sys; import {module}; print(json.dumps(sorted(name for name in {heavy!r} if name in sys.modules)))"
+
+
+def _run(command: list) -> subprocess.CompletedProcess:
+    return subprocess.run(command, cwd=_ROOT, capture_output=True, text=True)
+
+
+def time_command(command: list, repeat: int) -> float:
+    """best wall time in seconds of running command in a fresh interpreter, over repeat runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = _run(command)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise click.ClickException(f"{' '.join(command)} failed:\n{completed.stderr.strip()}")
+        best = min(best, elapsed)
+    return best
+
+
+def benchmark_module(module: str, repeat: int) -> dict:
+    """import time of module in a fresh interpreter, and the heavy packages it loads"""
+    command = [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_PACKAGES)]
+    completed = _run(command)
+    if completed.returncode != 0:
+        # e.g. an optional dependency of the module is not installed here
+        return {"name": module, "s": None, "heavy_loaded": None, "error": completed.stderr.strip().splitlines()[-1]}
+    return {"name": module, "s": round(time_command(command, repeat), 3),
+            "heavy_loaded": json.loads(completed.stdout.strip().splitlines()[-1]), "error": None}
+
+
+@click.command()
+@click.option("--module", "modules", multiple=True, default=MODULES, show_default=True,
+              help="Module to time the import of. Repeat for several.")
+@click.option("--repeat", type=int, default=5, show_default=True, help="Best of this many runs.")
+@click.option("--max-seconds", type=float, default=1.0, show_default=True,
+              help="Fail if an import or `cli --help` takes longer than this.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(modules, repeat, max_seconds, output):
+    """Startup time of the CLI and of the pipeline modules, each in a fresh interpreter.
+
+    Fails if one is slower than --max-seconds or loads one of HEAVY_PACKAGES at import time, which should
+    only be imported by the functions that use them.
+    """
+    baseline = time_command([sys.executable, "-c", "pass"], repeat)
+    results = [benchmark_module(module, repeat) for module in modules]
+    results += [{"name": name, "s": round(time_command(command, repeat), 3), "heavy_loaded": None, "error": None}
+                for name, command in COMMANDS.items()]
+    click.echo(f"python startup\t{baseline:.3f} s")
+    click.echo("name\ts\theavy_loaded")
+    failures = []
+    for result in results:
+        if result["error"] is not None:
+            click.echo(f"{result['name']}\tskipped\t{result['error']}")
+            continue
+        click.echo(f"{result['name']}\t{result['s']}\t{','.join(result['heavy_loaded'] or []) or '-'}")
+        if result["s"] > max_seconds:
+            failures.append(f"{result['name']} takes {result['s']} s")
+        if result["heavy_loaded"]:
+            failures.append(f"{result['name']} imports {', '.join(result['heavy_loaded'])}")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump({"python_startup_s": round(baseline, 3), "results": results}, f, indent=2)
+    if failures:
+        raise click.ClickException("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import random
+import re
+import time
+
+import click
+
+from src.benchmarks.parser_benchmark import _best_time
+from src.benchmarks.synthetic_xml import _paragraph
+from src.data.normalize_text import TextNormalizer
+
+
+def _legacy_normalize(text: str) -> str:
+    # the multi-pass cleanup Parser used before TextNormalizer, kept as the reference
+    return re.sub(r'\[.*?\]', '', re.sub(" +", " ", text.replace("\n", " "))).replace(" .", ".").strip()
+
+
+def _legacy_normalize_keyword(text: str) -> str:
+    return re.sub(" +", " ", text.replace("\n", " ")).strip()
+
+
+def _legacy_normalize_joined(text: str) -> str:
+    return re.sub(" +", " ", text).replace("\n", " ").strip()
+
+
+def _fuzz_texts(n: int, seed: int = 0) -> list:
+    """short random strings made of the characters the cleanup cares about (spaces, periods, brackets, newlines)"""
+    rng = random.Random(seed)
+    alphabet = "ab .[]\n\t"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 16))) for _ in range(n)]
+
+
+def check_identical(texts: list) -> int:
+    """Compare TextNormalizer with the legacy cleanup on texts.
+
+    Returns:
+        int: number of texts checked
+
+    Raises:
+        AssertionError: on the first text where the outputs differ
+    """
+    normalizer = TextNormalizer()
+    for text in texts:
+        for legacy, new in ((_legacy_normalize(text), normalizer.normalize(text)),
+                            (_legacy_normalize_keyword(text), normalizer.normalize(text, remove_citations=False)),
+                            (_legacy_normalize_joined(text), normalizer.normalize_joined(text))):
+            assert legacy == new, f"normalized text differs for {text!r}: {legacy!r} != {new!r}"
+    return len(texts)
+
+
+def benchmark_normalizer(paragraphs: int, repeat: int, seed: int = 0) -> dict:
+    """Time the legacy cleanup and TextNormalizer on synthetic paragraphs.
+
+    Returns:
+        dict: number of characters and seconds per million characters of both implementations
+    """
+    rng = random.Random(seed)
+    texts = [_paragraph(rng, rng.randint(1, 12)) for _ in range(paragraphs)]
+    chars = sum(len(text) for text in texts)
+    normalizer = TextNormalizer()
+    legacy_time = _best_time(lambda: [_legacy_normalize(text) for text in texts], repeat)
+    new_time = _best_time(lambda: [normalizer.normalize(text) for text in texts], repeat)
+    return {
+        "paragraphs": paragraphs,
+        "chars": chars,
+        "legacy_s_per_1m_chars": round(legacy_time / chars * 1e6, 4),
+        "normalizer_s_per_1m_chars": round(new_time / chars * 1e6, 4),
+        "speedup": round(legacy_time / new_time, 2),
+    }
+
+
+@click.command()
+@click.option("--paragraphs", type=int, default=20000, show_default=True, help="Synthetic paragraphs to normalize.")
+@click.option("--fuzz", type=int, default=100000, show_default=True,
+              help="Random strings to check for identical output.")
+@click.option("--repeat", type=int, default=3, show_default=True, help="Best of this many runs.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(paragraphs, fuzz, repeat, output):
+    """Check that TextNormalizer matches the legacy text cleanup and time both per million characters."""
+    rng = random.Random(1)
+    started = time.perf_counter()
+    checked = check_identical(_fuzz_texts(fuzz) + [_paragraph(rng, 6) for _ in range(1000)])
+    click.echo(f"identical output on {checked} texts ({time.perf_counter() - started:.1f}s)")
+    result = benchmark_normalizer(paragraphs, repeat)
+    for key, value in result.items():
+        click.echo(f"{key}\t{value}")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from src.benchmarks.synthetic_pdf import write_pdf_corpus
+from src.data.pdf_text import PdfTextExtractor, extract_page_texts, is_text_readable, scanned_pages, unreadable_pages
+
+
+def make_corpus(folder: Path, docs: int, pages: int, scanned: int, native_docs: int, seed: int = 0) -> list:
+    """docs PDFs with scanned pages and native_docs PDFs without
+
+    The first half of docs has scanned of its pages scanned, at random, so that their whole text is unreadable
+    when scanned is most of pages. The other half has a single scanned page. The native PDFs have a blank page
+    in the middle and a last page with only a figure, which have no text but need no OCR.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for index in range(docs):
+        count = scanned if index < (docs + 1) // 2 else 1
+        paths += write_pdf_corpus(folder, 1, start=index, pages=pages,
+                                  scanned_pages=rng.sample(range(pages), min(count, pages)))
+    return paths + write_pdf_corpus(folder, native_docs, start=docs, pages=pages, blank_pages=[pages // 2],
+                                    figure_pages=[pages - 1])
+
+
+def pages_to_ocr(page_texts: list, mode: str, path: str) -> list:
+    """numbers of the pages PdfTextExtractor(ocr=mode) runs OCR on"""
+    if mode == "document":
+        return [] if is_text_readable("".join(page_texts)) else list(range(len(page_texts)))
+    return unreadable_pages(page_texts, path)
+
+
+def benchmark_mode(paths: list, mode: str, run_ocr: bool) -> dict:
+    """pages sent to OCR by mode, and the time of the extraction with OCR if run_ocr
+
+    Raises:
+        AssertionError: if per-page OCR is sent a page without text that is not a scan (a blank or figure page)
+    """
+    page_texts = {str(path): extract_page_texts(path) for path in paths}
+    ocr = {path: pages_to_ocr(texts, mode, path) for path, texts in page_texts.items()}
+    # the pages without text, and those of them that are scans
+    empty = {path: [number for number, text in enumerate(texts) if not text.strip()]
+             for path, texts in page_texts.items()}
+    scans = {path: scanned_pages(path, numbers) for path, numbers in empty.items()}
+    result = {
+        "mode": mode,
+        "files": len(paths),
+        "files_ocr": sum(1 for numbers in ocr.values() if numbers),
+        "pages": sum(len(texts) for texts in page_texts.values()),
+        "pages_ocr": sum(len(numbers) for numbers in ocr.values()),
+        "pages_unreadable_left": sum(len(set(unreadable_pages(page_texts[path], path)) - set(numbers))
+                                     for path, numbers in ocr.items()),
+        "pages_blank_or_figure": sum(len(numbers) - len(scans[path]) for path, numbers in empty.items()),
+        "s": None,
+    }
+    if mode == "pages":
+        assert all(set(numbers) & set(ocr[path]) <= set(scans[path]) for path, numbers in empty.items()), \
+            "blank or figure pages were sent to OCR"
+    if run_ocr:
+        started = time.perf_counter()
+        texts = dict(PdfTextExtractor(executor="serial", ocr=mode).iter_extract(paths))
+        result["s"] = round(time.perf_counter() - started, 2)
+        if mode == "pages":
+            # the pages with a text layer keep their text
+            for path, numbers in ocr.items():
+                kept = [text for number, text in enumerate(page_texts[path]) if number not in numbers]
+                assert all(text in texts[path] for text in kept), f"per-page OCR changed the native pages of {path}"
+    return result
+
+
+@click.command()
+@click.option("--pdf-folder", type=click.Path(exists=True), default=None,
+              help="Use the PDFs of this folder (e.g. data/raw/pdf) instead of synthetic ones.")
+@click.option("--docs", type=int, default=10, show_default=True, help="Number of synthetic PDFs with scanned pages.")
+@click.option("--pages", type=int, default=12, show_default=True, help="Pages per synthetic PDF.")
+@click.option("--scanned", type=int, default=8, show_default=True,
+              help="Scanned pages of the first half of the PDFs with scanned pages. The other half has one.")
+@click.option("--native-docs", type=int, default=5, show_default=True, help="Number of synthetic PDFs without scans.")
+@click.option("--no-ocr", is_flag=True, help="Only count the pages sent to OCR, without running it.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(pdf_folder, docs, pages, scanned, native_docs, no_ocr, output):
+    """Pages sent to OCR and time of whole-document OCR against per-page OCR of unreadable pages."""
+    run_ocr = not no_ocr and shutil.which("tesseract") is not None
+    if not no_ocr and not run_ocr:
+        click.echo("tesseract is not installed: counting the pages sent to OCR without running it")
+    with tempfile.TemporaryDirectory() as folder:
+        if pdf_folder is not None:
+            paths = sorted(Path(pdf_folder).glob("*.pdf"))
+        else:
+            paths = make_corpus(Path(folder), docs, pages, scanned, native_docs)
+        results = [benchmark_mode(paths, mode, run_ocr) for mode in ("document", "pages")]
+    columns = list(results[0])
+    click.echo("\t".join(columns))
+    for result in results:
+        click.echo("\t".join("-" if result[column] is None else str(result[column]) for column in columns))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
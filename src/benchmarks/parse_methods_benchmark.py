@@ -0,0 +1,131 @@
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+from src.benchmarks.parser_benchmark import _best_time
+from src.benchmarks.synthetic_xml import write_corpus
+from src.data.parse_data import Parser
+
+# the parse_multiple_* methods of Parser and the keyword arguments they are benchmarked with
+METHODS = {
+    "parse_multiple_to_nested_dict": {},
+    "parse_multiple_to_papers": {},
+    "parse_multiple_to_simple_dict": {},
+    "parse_multiple_abstract": {},
+    "parse_multiple_views": {"views": ["nested", "simple", "abstract", "metadata"]},
+}
+
+# the papers each method can parse besides the full ones: like on real papers, the nested parse raises on papers
+# without a body, and all but the abstract parse raise on papers without ce:sections
+_EDGE_CASES = {
+    "parse_multiple_to_nested_dict": (),
+    "parse_multiple_to_papers": (),
+    "parse_multiple_to_simple_dict": ("no_body",),
+    "parse_multiple_abstract": ("no_body", "no_sections"),
+    "parse_multiple_views": ("no_body",),
+}
+
+
+def make_corpus(folder: Path, docs: int, no_body: int, no_sections: int, **kwargs) -> dict:
+    """write docs full papers, no_body papers without a body and no_sections papers whose body has no ce:sections
+
+    Returns:
+        dict: {"full": paths, "no_body": paths, "no_sections": paths}
+    """
+    return {
+        "full": write_corpus(folder, docs, **kwargs),
+        "no_body": write_corpus(folder, no_body, start=docs, has_body=False, **kwargs),
+        "no_sections": write_corpus(folder, no_sections, start=docs + no_body, has_sections=False, **kwargs),
+    }
+
+
+def _measure_memory(func) -> tuple:
+    """peak and retained Python memory of func() in bytes (lxml trees are not counted)"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def benchmark_method(parser: Parser, method_name: str, method_kwargs: dict, repeat: int, jobs: int,
+                     executor: str) -> dict:
+    """time a parse_multiple_* method of parser on parser.doc_list and measure its memory"""
+    method = getattr(parser, method_name)
+
+    def run():
+        return method(jobs=jobs, executor=executor, **method_kwargs)
+
+    docs = len(parser.doc_list)
+    elapsed = _best_time(run, repeat)
+    peak, retained = _measure_memory(run)
+    return {
+        "method": method_name,
+        "docs": docs,
+        "docs_per_s": round(docs / elapsed, 1),
+        "ms_per_doc": round(elapsed / docs * 1000, 3),
+        "peak_mib": round(peak / 2 ** 20, 2),
+        "retained_kib_per_doc": round(retained / docs / 1024, 2),
+    }
+
+
+def benchmark_methods(methods: list, docs: int, sections: int, paragraphs: int, keywords: int, no_body: int,
+                      no_sections: int, repeat: int, jobs: int = 1, executor: str = "serial",
+                      iterparse: bool = False) -> list:
+    """benchmark each of methods on the same synthetic corpus
+
+    Returns:
+        list: one dict per method with documents per second, time per document, peak memory while parsing and
+            memory held by the result per document
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = make_corpus(Path(folder) / "papers", docs, no_body, no_sections, sections=sections,
+                             paragraphs=paragraphs, keywords=keywords)
+        for method_name in methods:
+            doc_list = corpus["full"] + [path for case in _EDGE_CASES[method_name] for path in corpus[case]]
+            parser = Parser(doc_list, str(Path(folder) / "unavailable_papers.csv"), iterparse=iterparse)
+            started = time.perf_counter()
+            results.append(benchmark_method(parser, method_name, METHODS[method_name], repeat, jobs, executor))
+            results[-1]["total_s"] = round(time.perf_counter() - started, 2)
+    return results
+
+
+@click.command()
+@click.option("--method", "methods", multiple=True, type=click.Choice(list(METHODS)), default=list(METHODS),
+              show_default=True, help="parse_multiple_* method to benchmark. Repeat for several.")
+@click.option("--docs", type=int, default=50, show_default=True, help="Number of full papers.")
+@click.option("--sections", type=int, default=8, show_default=True, help="Top-level sections per paper.")
+@click.option("--paragraphs", type=int, default=4, show_default=True, help="Paragraphs per (sub)section.")
+@click.option("--keywords", type=int, default=5, show_default=True, help="Keywords per paper.")
+@click.option("--no-body", type=int, default=5, show_default=True, help="Number of papers without a body.")
+@click.option("--no-sections", type=int, default=5, show_default=True,
+              help="Number of papers with a body but no ce:sections.")
+@click.option("--repeat", type=int, default=3, show_default=True, help="Best of this many runs.")
+@click.option("--jobs", type=int, default=1, show_default=True, help="Number of workers.")
+@click.option("--executor", type=click.Choice(["serial", "thread", "process"]), default="serial", show_default=True)
+@click.option("--iterparse", is_flag=True, help="Benchmark the iterparse mode of Parser.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(methods, docs, sections, paragraphs, keywords, no_body, no_sections, repeat, jobs, executor, iterparse,
+         output):
+    """Documents per second and memory of every Parser.parse_multiple_* method on synthetic papers."""
+    results = benchmark_methods(list(methods), docs, sections, paragraphs, keywords, no_body, no_sections, repeat,
+                                jobs=jobs, executor=executor, iterparse=iterparse)
+    columns = list(results[0])
+    click.echo("\t".join(columns))
+    for result in results:
+        click.echo("\t".join(str(result[column]) for column in columns))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
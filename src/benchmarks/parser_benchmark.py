@@ -0,0 +1,101 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from lxml import etree
+
+from src.benchmarks.synthetic_xml import write_corpus
+from src.data.parse_data import Parser, _find_head_or_body
+
+
+def _concat_text(parts: list) -> str:
+    # the previous "text += chunk" assembly, kept as the baseline
+    text = ""
+    for part in parts:
+        text += part
+    return text
+
+
+def _best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _content_parts(parser: Parser, doc: Path) -> list:
+    """the chunks that make up the paper text of doc, in order"""
+    root = etree.parse(str(doc)).getroot()
+    ns = root.nsmap
+    body = _find_head_or_body(root, "body")[0]
+    parts = []
+    state = parser._new_content_state()
+    for content in body.xpath(".//ce:section-title|.//ce:para|.//ce:label", namespaces={"ce": ns["ce"]}):
+        parser._append_content(content, ns, state, parts)
+    return parts
+
+
+def benchmark_text_assembly(sections_list: list, docs: int, repeat: int, iterparse: bool = False) -> list:
+    """Parse documents of growing length and time the whole parse and the text assembly.
+
+    Returns:
+        list: one dict per document length with chars, parse time per document and per 1k chars,
+            and the time to assemble the text with "+=" and with a single join
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for sections in sections_list:
+            paths = write_corpus(Path(folder) / str(sections), docs, sections=sections)
+            parser = Parser(paths, str(Path(folder) / "unavailable_papers.csv"), iterparse=iterparse)
+            parse_time = _best_time(lambda: [parser.parse_single_to_simple_dict(path) for path in paths], repeat)
+            chars = sum(len(text) for path in paths for text in parser.parse_single_to_simple_dict(path).values())
+            parts_list = [_content_parts(parser, path) for path in paths]
+            for parts in parts_list:
+                # both ways of assembling the text must give the same paper
+                assert _concat_text(parts) == "".join(parts)
+            concat_time = _best_time(lambda: [_concat_text(parts) for parts in parts_list], repeat)
+            join_time = _best_time(lambda: ["".join(parts) for parts in parts_list], repeat)
+            results.append({
+                "sections": sections,
+                "chars_per_doc": chars // docs,
+                "chunks_per_doc": sum(len(parts) for parts in parts_list) // docs,
+                "parse_ms_per_doc": round(parse_time / docs * 1000, 3),
+                "parse_us_per_1k_chars": round(parse_time / chars * 1e6 * 1000, 3),
+                "concat_ms_per_doc": round(concat_time / docs * 1000, 4),
+                "join_ms_per_doc": round(join_time / docs * 1000, 4),
+            })
+    return results
+
+
+@click.command()
+@click.option("--sections", "sections_list", multiple=True, type=int, default=[8, 32, 128], show_default=True,
+              help="Number of sections per document. Repeat to benchmark several lengths.")
+@click.option("--docs", type=int, default=5, show_default=True, help="Documents per length.")
+@click.option("--repeat", type=int, default=3, show_default=True, help="Best of this many runs.")
+@click.option("--iterparse", is_flag=True, help="Benchmark the iterparse mode of Parser.")
+@click.option("--max-slowdown", type=float, default=2.0, show_default=True,
+              help="Fail if the parse time per character of the longest documents is this many times that "
+                   "of the shortest ones, i.e. if parsing is no longer linear in the document length.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(sections_list, docs, repeat, iterparse, max_slowdown, output):
+    """Regression benchmark of Parser._parse_single_to_simple_dict on long documents."""
+    results = benchmark_text_assembly(sorted(sections_list), docs, repeat, iterparse=iterparse)
+    columns = list(results[0])
+    click.echo("\t".join(columns))
+    for result in results:
+        click.echo("\t".join(str(result[column]) for column in columns))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    slowdown = results[-1]["parse_us_per_1k_chars"] / results[0]["parse_us_per_1k_chars"]
+    click.echo(f"time per character, longest vs shortest documents: {slowdown:.2f}x")
+    if slowdown > max_slowdown:
+        raise click.ClickException(f"parsing slowed down {slowdown:.2f}x per character on long documents")
+
+
+if __name__ == "__main__":
+    main()
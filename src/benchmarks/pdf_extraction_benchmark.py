@@ -0,0 +1,96 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from src.benchmarks.synthetic_pdf import write_pdf_corpus
+from src.data.pdf_text import PdfTextCache, PdfTextExtractor, extract_pages
+
+
+def _run_serial(paths: list, request_s: float) -> tuple:
+    """extract each PDF page by page and then wait request_s, one file after another, like the qa stage did"""
+    texts = {}
+    started = time.perf_counter()
+    for path in paths:
+        texts[str(path)] = extract_pages(path)
+        time.sleep(request_s)
+    return texts, time.perf_counter() - started
+
+
+def _run_prefetched(paths: list, request_s: float, jobs: int, pages_per_task: int) -> tuple:
+    """the same with the PDFs extracted ahead by a PdfTextCache"""
+    texts = {}
+    started = time.perf_counter()
+    cache = PdfTextCache(PdfTextExtractor(jobs=jobs, pages_per_task=pages_per_task))
+    cache.prefetch(paths)
+    for path in paths:
+        texts[str(path)] = cache.get(path)
+        time.sleep(request_s)
+    return texts, time.perf_counter() - started
+
+
+def benchmark_extraction(paths: list, jobs: int, pages_per_task: int, request_s: float) -> list:
+    """time the extraction alone, with a cold and a warm extraction cache, and with a simulated LLM request per paper,
+    serially and with PdfTextExtractor
+
+    Raises:
+        AssertionError: if the parallel extraction does not give the same text as the serial one
+    """
+    serial, serial_s = _run_serial(paths, 0)
+    started = time.perf_counter()
+    parallel = dict(PdfTextExtractor(jobs=jobs, pages_per_task=pages_per_task).iter_extract(paths))
+    parallel_s = time.perf_counter() - started
+    assert parallel == serial, "parallel extraction changed the text"
+    results = [{"run": "extraction", "serial_s": round(serial_s, 3), "parallel_s": round(parallel_s, 3)}]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        extractor = PdfTextExtractor(jobs=jobs, pages_per_task=pages_per_task, extraction_cache=cache_dir)
+        for run in ("extraction, cold cache", "extraction, warm cache"):
+            started = time.perf_counter()
+            cached = dict(extractor.iter_extract(paths))
+            cached_s = time.perf_counter() - started
+            assert cached == serial, "the extraction cache changed the text"
+            results.append({"run": run, "serial_s": round(serial_s, 3), "parallel_s": round(cached_s, 3)})
+    if request_s > 0:
+        _, serial_s = _run_serial(paths, request_s)
+        prefetched, prefetched_s = _run_prefetched(paths, request_s, jobs, pages_per_task)
+        assert prefetched == serial, "prefetched extraction changed the text"
+        results.append({"run": f"extraction + {request_s * 1000:.0f} ms requests", "serial_s": round(serial_s, 3),
+                        "parallel_s": round(prefetched_s, 3)})
+    return results
+
+
+@click.command()
+@click.option("--pdf-folder", type=click.Path(exists=True), default=None,
+              help="Extract the PDFs of this folder (e.g. data/raw/pdf) instead of synthetic ones.")
+@click.option("--docs", type=int, default=20, show_default=True, help="Number of synthetic PDFs.")
+@click.option("--pages", type=int, default=12, show_default=True, help="Pages per synthetic PDF.")
+@click.option("--long-pages", type=int, default=200, show_default=True,
+              help="Pages of one more synthetic PDF, split into page ranges. 0 for none.")
+@click.option("--jobs", type=int, default=4, show_default=True, help="Number of extraction processes.")
+@click.option("--pages-per-task", type=int, default=50, show_default=True)
+@click.option("--request-ms", type=float, default=200, show_default=True,
+              help="Simulated LLM request time per paper, to measure the overlap. 0 to time the extraction only.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(pdf_folder, docs, pages, long_pages, jobs, pages_per_task, request_ms, output):
+    """Serial page-by-page PDF extraction against PdfTextExtractor (with and without its extraction cache) and
+    PdfTextCache, with the same text."""
+    with tempfile.TemporaryDirectory() as folder:
+        if pdf_folder is not None:
+            paths = sorted(Path(pdf_folder).glob("*.pdf"))
+        else:
+            paths = write_pdf_corpus(folder, docs, pages=pages)
+            if long_pages > 0:
+                paths += write_pdf_corpus(folder, 1, start=docs, pages=long_pages)
+        results = benchmark_extraction(paths, jobs, pages_per_task, request_ms / 1000)
+    click.echo("run\tserial_s\tparallel_s")
+    for result in results:
+        click.echo(f"{result['run']}\t{result['serial_s']}\t{result['parallel_s']}")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import random
+from pathlib import Path
+from typing import Iterable, List, Union
+
+from src.benchmarks.synthetic_xml import _paragraph
+
+# characters of the broken text layer of scanned pages, which is_text_readable rejects
+_GARBAGE = "ÿþýüûúùøöõôóò¤¦§¨©"
+
+
+def make_pdf(path: Union[str, Path], pages: int = 12, paragraphs: int = 4, scanned_pages: Iterable[int] = (),
+             blank_pages: Iterable[int] = (), figure_pages: Iterable[int] = (), seed: int = 0) -> Path:
+    """Write a PDF of pages pages of text made of synthetic paragraphs, like a downloaded paper
+
+    Args:
+        path (Union[str, Path]): where to write the PDF
+        pages (int): number of pages
+        paragraphs (int): paragraphs of six sentences per page
+        scanned_pages (Iterable[int]): numbers of the pages to write as scans: an image of the page with an
+            invisible text layer of garbage, like a badly OCRed scan
+        blank_pages (Iterable[int]): numbers of the pages to leave empty, like separator pages
+        figure_pages (Iterable[int]): numbers of the pages with only a figure (an image on part of the page) and
+            no text
+        seed (int): random seed, so that the same arguments give the same document
+    """
+    import fitz
+    rng = random.Random(seed)
+    scanned_pages = set(scanned_pages)
+    blank_pages = set(blank_pages)
+    figure_pages = set(figure_pages)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        if number in blank_pages:
+            continue
+        if number in figure_pages:
+            figure = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 300, 200), False)
+            figure.set_rect(figure.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            page.insert_image(fitz.Rect(100, 100, page.rect.width - 100, 350), pixmap=figure)
+            continue
+        text = f"{number + 1}. Section {number + 1}\n" + "\n\n".join(_paragraph(rng, 6) for _ in range(paragraphs))
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=8)
+        if number in scanned_pages:
+            pixmap = page.get_pixmap(dpi=150)
+            doc.delete_page(number)
+            page = doc.new_page(number, width=pixmap.width * 72 / 150, height=pixmap.height * 72 / 150)
+            page.insert_image(page.rect, pixmap=pixmap)
+            garbage = "".join(rng.choice(_GARBAGE) for _ in range(len(text)))
+            page.insert_textbox(page.rect, garbage, fontsize=8, render_mode=3)
+    doc.save(str(path))
+    doc.close()
+    return Path(path)
+
+
+def write_pdf_corpus(folder: Union[str, Path], n_docs: int, start: int = 0, **kwargs) -> List[Path]:
+    """write n_docs PDFs made with make_pdf(path, seed=index, **kwargs) to folder and return their paths"""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    return [make_pdf(folder / f"synthetic_{index}.pdf", seed=index, **kwargs) for index in range(start, start + n_docs)]
@@ -0,0 +1,133 @@
+import random
+from pathlib import Path
+from typing import List, Union
+
+# namespaces of the Elsevier full-text API response
+NAMESPACES = {
+    None: "http://www.elsevier.com/xml/svapi/article/dtd",
+    "ce": "http://www.elsevier.com/xml/common/dtd",
+    "prism": "http://prismstandard.org/namespaces/basic/2.0/",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "xocs": "http://www.elsevier.com/xml/xocs/dtd",
+    "ja": "http://www.elsevier.com/xml/ja/dtd",
+}
+
+_WORDS = ("street view images perception safety greenery urban visual quality walkability deep learning "
+          "participants survey semantic segmentation city neighbourhood model results index sky buildings "
+          "pedestrians environment method data analysis correlation regression").split()
+
+_SECTION_TITLES = ["Introduction", "Literature review", "Data and methods", "Study area", "Model design",
+                   "Results", "Discussion", "Limitations", "Conclusion"]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 24))]
+    # citations and stray spaces before periods, like real papers
+    if rng.random() < 0.3:
+        words.append(f"[{rng.randint(1, 80)}]")
+    return " ".join(words).capitalize() + (" ." if rng.random() < 0.2 else ".")
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    text = " ".join(_sentence(rng) for _ in range(sentences))
+    # line breaks and repeated spaces inside paragraphs
+    return text.replace(". ", ".\n  ", 2)
+
+
+def _keywords(rng: random.Random, n: int) -> str:
+    # the first one has a repeated space, like some real keywords
+    words = ["street  view"] + [f"{rng.choice(_WORDS)} {rng.choice(_WORDS)}" for _ in range(n - 1)]
+    return "".join(f"<ce:keyword><ce:text>{word}</ce:text></ce:keyword>" for word in words[:n])
+
+
+def make_article(index: int = 0, sections: int = 8, subsections: int = 2, paragraphs: int = 4,
+                 sentences: int = 6, references: int = 50, keywords: int = 2, has_body: bool = True,
+                 has_sections: bool = True, back_matter: bool = False, seed: int = 0) -> str:
+    """Make an Elsevier-like full-text xml document
+
+    Args:
+        index (int): used in the DOI, EID and title
+        sections (int): number of top-level ce:section elements
+        subsections (int): number of ce:section elements in every other section
+        paragraphs (int): number of ce:para elements per (sub)section
+        sentences (int): sentences per paragraph
+        references (int): number of bibliography entries in the tail
+        keywords (int): number of ce:keyword elements
+        has_body (bool): False to make a document without a body (e.g. abstract only)
+        has_sections (bool): False to make a body without ce:sections (e.g. a short communication)
+        back_matter (bool): True to end the body with unnumbered author contribution and competing interest
+            sections and an acknowledgment, like most published papers
+        seed (int): random seed, so that the same arguments give the same document
+
+    Returns:
+        str: the xml document
+    """
+    rng = random.Random(f"{seed}-{index}")
+    ns_declarations = " ".join(f'xmlns="{uri}"' if prefix is None else f'xmlns:{prefix}="{uri}"'
+                               for prefix, uri in NAMESPACES.items())
+
+    def paras(n):
+        return "".join(f"<ce:para>{_paragraph(rng, sentences)}</ce:para>" for _ in range(n))
+
+    body = ""
+    if has_body and not has_sections:
+        body = f"<body>{paras(paragraphs)}</body>"
+    elif has_body:
+        section_xml = []
+        for s in range(sections):
+            title = _SECTION_TITLES[s % len(_SECTION_TITLES)]
+            if subsections > 0 and s % 2 == 1:
+                inner = "".join(
+                    f"<ce:section><ce:label>{s + 1}.{t + 1}</ce:label><ce:section-title>{title} part {t + 1}"
+                    f"</ce:section-title>{paras(paragraphs)}</ce:section>" for t in range(subsections))
+            else:
+                inner = paras(paragraphs)
+            section_xml.append(f"<ce:section><ce:label>{s + 1}</ce:label><ce:section-title>{title}</ce:section-title>"
+                               f"{inner}<ce:figure><ce:label>Fig. {s + 1}</ce:label><ce:caption><ce:simple-para>"
+                               f"{_sentence(rng)}</ce:simple-para></ce:caption></ce:figure></ce:section>")
+        acknowledgment = ""
+        if back_matter:
+            section_xml.append(
+                "<ce:section><ce:section-title>CRediT authorship contribution statement</ce:section-title><ce:para>"
+                "<ce:bold>A. Author:</ce:bold> Conceptualization, Methodology, Writing – original draft. "
+                "<ce:bold>B. Author:</ce:bold> Supervision, Writing – review &amp; editing.</ce:para></ce:section>"
+                "<ce:section><ce:section-title>Declaration of competing interest</ce:section-title><ce:para>The "
+                "authors declare that they have no known competing financial interests or personal relationships "
+                "that could have appeared to influence the work reported in this paper.</ce:para></ce:section>")
+            acknowledgment = ("<ce:acknowledgment><ce:section-title>Acknowledgements</ce:section-title><ce:para>We "
+                              "thank the anonymous reviewers for their comments. This research was supported by the "
+                              f"National Research Foundation under grant no. {index}.</ce:para></ce:acknowledgment>")
+        body = f"<body><ce:sections>{''.join(section_xml)}</ce:sections>{acknowledgment}</body>"
+    abstract = _paragraph(rng, 5)
+    tail = "".join(f"<ce:bib-reference><ce:label>[{r + 1}]</ce:label><ce:other-ref><ce:textref>{_sentence(rng)}"
+                   f"</ce:textref></ce:other-ref></ce:bib-reference>" for r in range(references))
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<full-text-retrieval-response {ns_declarations}>'
+        f'<coredata><prism:doi>10.1016/j.synthetic.{index}</prism:doi><eid>1-s2.0-{index}</eid>'
+        f'<dc:title>Synthetic paper, number {index}</dc:title>'
+        f'<dc:description><ce:abstract><ce:abstract-sec><ce:para>{abstract}</ce:para></ce:abstract-sec></ce:abstract>'
+        f'</dc:description></coredata>'
+        f'<originalText><xocs:doc><xocs:serial-item><article xmlns="{NAMESPACES["ja"]}">'
+        f'<head><ce:title>Synthetic paper, number {index}</ce:title>'
+        f'<ce:abstract><ce:abstract-sec><ce:simple-para>{abstract}</ce:simple-para></ce:abstract-sec></ce:abstract>'
+        f'<ce:keywords>{_keywords(rng, keywords)}</ce:keywords><ce:data-availability><ce:para>Data will be made available on request.</ce:para>'
+        f'</ce:data-availability></head>{body}'
+        f'<tail><ce:bibliography><ce:bibliography-sec>{tail}</ce:bibliography-sec></ce:bibliography></tail>'
+        f'</article></xocs:serial-item></xocs:doc></originalText></full-text-retrieval-response>'
+    )
+
+
+def write_corpus(folder: Union[str, Path], n_docs: int, start: int = 0, **kwargs) -> List[Path]:
+    """write n_docs documents made with make_article(index, **kwargs) to folder and return their paths
+
+    Indexes start at start, so that several calls can write to the same folder without clashing DOIs.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(start, start + n_docs):
+        path = folder / f"synthetic_{index}.xml"
+        path.write_text(make_article(index, **kwargs), encoding="utf-8")
+        paths.append(path)
+    return paths
@@ -0,0 +1,71 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from src.benchmarks.synthetic_xml import write_corpus
+from src.data.parse_data import Parser
+from src.features.token_reduction import TextReducer, tiktoken
+
+
+def _load_text(path: Path) -> str:
+    if path.suffix == ".pdf":
+        import fitz
+        with fitz.open(str(path)) as doc:
+            return "".join(page.get_text() for page in doc)
+    return path.read_text(encoding="utf-8")
+
+
+def _synthetic_texts(folder: Path, docs: int, sections: int) -> dict:
+    paths = write_corpus(folder, docs, sections=sections, back_matter=True)
+    parser = Parser(paths, str(folder / "unavailable_papers.csv"))
+    return dict(parser.iter_multiple_to_simple_dict())
+
+
+def benchmark_reduction(texts: dict, reducer: TextReducer) -> list:
+    """tokens before and after reducer.reduce and the time it takes, for each {name: text} of texts"""
+    results = []
+    for name, text in texts.items():
+        started = time.perf_counter()
+        _, stats = reducer.reduce_with_stats(text)
+        elapsed = time.perf_counter() - started
+        results.append({"paper": name, **stats,
+                        "saved_pct": round(stats["tokens_saved"] / max(stats["tokens_before"], 1) * 100, 1),
+                        "ms": round(elapsed * 1000, 2)})
+    return results
+
+
+@click.command()
+@click.option("--paper-folder", type=click.Path(exists=True), default=None,
+              help="Reduce the .txt and .pdf papers of this folder (e.g. data/raw/all_papers) instead of synthetic ones.")
+@click.option("--docs", type=int, default=20, show_default=True, help="Number of synthetic papers.")
+@click.option("--sections", type=int, default=8, show_default=True, help="Sections per synthetic paper.")
+@click.option("--reduction-config", type=click.Path(exists=True), default=None,
+              help="JSON file of TextReducer settings. Defaults to the built-in rules.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the per-paper results as JSON.")
+def main(paper_folder, docs, sections, reduction_config, output):
+    """Tokens saved per paper by TextReducer, the preprocessing of --reduce-tokens in the qa stage."""
+    reducer = TextReducer() if reduction_config is None else TextReducer.from_json(reduction_config)
+    if paper_folder is not None:
+        paths = sorted(path for path in Path(paper_folder).iterdir() if path.suffix in (".txt", ".pdf"))
+        results = benchmark_reduction({path.name: _load_text(path) for path in paths}, reducer)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            results = benchmark_reduction(_synthetic_texts(Path(folder), docs, sections), reducer)
+    columns = list(results[0])
+    click.echo("\t".join(columns))
+    for result in results:
+        click.echo("\t".join(str(result[column]) for column in columns))
+    before = sum(result["tokens_before"] for result in results)
+    saved = sum(result["tokens_saved"] for result in results)
+    click.echo(f"saved {saved} of {before} tokens ({saved / max(before, 1):.1%}) over {len(results)} papers"
+               + ("" if tiktoken is not None else ", estimated as 4 characters per token without tiktoken"))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
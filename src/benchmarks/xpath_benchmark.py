@@ -0,0 +1,73 @@
+import json
+import tempfile
+from pathlib import Path
+
+import click
+from lxml import etree
+
+from src.benchmarks.parser_benchmark import _best_time
+from src.benchmarks.synthetic_xml import write_corpus
+from src.data.parse_data import _SCAN_XPATHS, _find_head_or_body
+
+
+def _scan(root) -> tuple:
+    # the previous lookup of Parser: two scans of the whole tree
+    return _SCAN_XPATHS["head"](root), _SCAN_XPATHS["body"](root)
+
+
+def _direct(root) -> tuple:
+    return _find_head_or_body(root, "head"), _find_head_or_body(root, "body")
+
+
+def benchmark_lookup(paths: list, repeat: int) -> dict:
+    """Time finding head and body in each document with the whole-tree scan and with the direct path.
+
+    Raises:
+        AssertionError: if the two lookups find different elements in a document
+    """
+    roots = [etree.parse(str(path)).getroot() for path in paths]
+    for path, root in zip(paths, roots):
+        assert _scan(root) == _direct(root), f"head/body lookups differ for {path}"
+    elements = sum(sum(1 for _ in root.iter()) for root in roots)
+    scan_time = _best_time(lambda: [_scan(root) for root in roots], repeat)
+    direct_time = _best_time(lambda: [_direct(root) for root in roots], repeat)
+    return {
+        "docs": len(roots),
+        "elements_per_doc": elements // len(roots),
+        "scan_us_per_doc": round(scan_time / len(roots) * 1e6, 1),
+        "direct_us_per_doc": round(direct_time / len(roots) * 1e6, 1),
+        "speedup": round(scan_time / direct_time, 1),
+    }
+
+
+@click.command()
+@click.option("--xml-folder", type=click.Path(exists=True), default=None,
+              help="Benchmark downloaded papers (e.g. data/raw/xml) instead of synthetic ones.")
+@click.option("--sections", "sections_list", multiple=True, type=int, default=[8, 32, 128], show_default=True,
+              help="Number of sections per synthetic document. Repeat to benchmark several lengths.")
+@click.option("--docs", type=int, default=20, show_default=True, help="Documents per length.")
+@click.option("--repeat", type=int, default=5, show_default=True, help="Best of this many runs.")
+@click.option("--output", type=click.Path(), default=None, help="Also save the results as JSON.")
+def main(xml_folder, sections_list, docs, repeat, output):
+    """Per-document time to find head and body with the whole-tree scan and with the direct namespace path."""
+    results = []
+    if xml_folder is not None:
+        results.append({"corpus": xml_folder, **benchmark_lookup(sorted(Path(xml_folder).glob("*.xml")), repeat)})
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            for sections in sorted(sections_list):
+                paths = write_corpus(Path(folder) / str(sections), docs, sections=sections)
+                # papers without a body take the fallback scan
+                paths += write_corpus(Path(folder) / f"{sections}_no_body", 2, has_body=False, seed=1)
+                results.append({"corpus": f"synthetic, {sections} sections", **benchmark_lookup(paths, repeat)})
+    columns = list(results[0])
+    click.echo("\t".join(columns))
+    for result in results:
+        click.echo("\t".join(str(result[column]) for column in columns))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
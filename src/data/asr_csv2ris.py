@@ -50,20 +50,29 @@ class CSV2RISConverter:
         else:
             return instr
 
-    def run(self):
+    def _to_entry(self, row: dict) -> OrderedDict:
+        return OrderedDict(
+            [(self.remap[k], self.process(v,k)) if k in self.remap.keys() 
+             else (k, self.process(v,k)) 
+             for k, v in row.items()]
+        )
+
+    def run(self, rows=None):
+        """convert the csv file, or rows (an iterable of dicts) if given, to ris
+        """
         # csv --> ris
         entries = []
 
-        print("Reading CSV...")
-        with open(self.csv_file_name, mode='r', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                ris_dict = OrderedDict(
-                    [(self.remap[k], self.process(v,k)) if k in self.remap.keys() 
-                     else (k, self.process(v,k)) 
-                     for k, v in row.items()]
-                )
-                entries.append(ris_dict)
+        if rows is not None:
+            # values are read as strings from the csv file, so do the same for rows
+            for row in rows:
+                entries.append(self._to_entry({k: "" if v is None else str(v) for k, v in row.items()}))
+        else:
+            print("Reading CSV...")
+            with open(self.csv_file_name, mode='r', encoding='utf-8-sig') as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    entries.append(self._to_entry(row))
 
         print("Writing RIS...")
         with open(self.ris_file_name, "w") as risfile:
@@ -0,0 +1,69 @@
+from typing import List
+
+
+class SentenceChunker:
+    """Split paragraphs into sentence-aligned chunks of at most chunk_size characters.
+
+    This gives the same chunks as the previous
+        sent_tokenize(text) -> ".\\n".join(sentences) -> CharacterTextSplitter(separator=".\\n", chunk_size, chunk_overlap=0)
+    without building a langchain splitter per paragraph. Sentences are packed greedily: a chunk is closed when the
+    next sentence (plus the separator) would make it longer than chunk_size, so a single sentence longer than
+    chunk_size becomes a chunk of its own. Sentences ending with a period are joined with ". ".
+
+    There is no batch method: Parser splits each paragraph while it walks the XML, since the chunks are written in
+    between section titles and spans, and Punkt tokenizes one text at a time anyway. Loading the model once per
+    chunker is what batching would have saved.
+
+    Args:
+        chunk_size (int): maximum number of characters per chunk, unless a single sentence is longer
+        language (str): Punkt model to split sentences with
+        tokenizer: anything with a tokenize(text) -> list of sentences method, instead of the Punkt model
+    """
+
+    separator = ".\n"
+
+    def __init__(self, chunk_size: int = 1000, language: str = "english", tokenizer=None) -> None:
+        self.chunk_size = chunk_size
+        self.language = language
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        # load the Punkt model (and nltk, which is slow to import) on first use, once per chunker
+        if self._tokenizer is None:
+            import nltk
+            try:
+                from nltk.tokenize import PunktTokenizer  # nltk >= 3.8.2
+                self._tokenizer = PunktTokenizer(self.language)
+            except ImportError:
+                self._tokenizer = nltk.data.load(f"tokenizers/punkt/{self.language}.pickle")
+        return self._tokenizer
+
+    def _pack(self, pieces: List[str]) -> List[str]:
+        chunks = []
+        current = []
+        total = 0
+        separator_len = len(self.separator)
+        for piece in pieces:
+            if current and total + len(piece) + separator_len > self.chunk_size:
+                chunks.append(self.separator.join(current))
+                current = []
+                total = 0
+            total += len(piece) + (separator_len if current else 0)
+            current.append(piece)
+        if current:
+            chunks.append(self.separator.join(current))
+        return chunks
+
+    def split(self, text: str) -> List[str]:
+        """split a paragraph into chunks of whole sentences"""
+        sentences = self.tokenizer.tokenize(text)
+        # split again at the separator, as the text splitter did, in case a sentence contains ".\n"
+        pieces = [piece for piece in self.separator.join(sentences).split(self.separator) if piece]
+        chunks = []
+        for chunk in self._pack(pieces):
+            chunk = chunk.strip()
+            if chunk:
+                chunks.append(chunk.replace("..\n", ". "))
+        return chunks
+
@@ -0,0 +1,110 @@
+import sys
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+
+def create_nested_defaultdict():
+    # module-level so that nested dicts can be sent back from worker processes
+    return defaultdict(create_nested_defaultdict)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Section:
+    """The paragraphs of one (sub)section of a paper.
+
+    Args:
+        label (str): category of the section (e.g. "Introduction", see SectionTaxonomy)
+        title (str): title of the top-level section
+        sub_title (str): title of the subsection, or the title of the section if it has no subsections
+        paragraphs (Tuple[str, ...]): cleaned text of the ce:para elements
+    """
+
+    __slots__ = ("label", "title", "sub_title", "paragraphs")
+
+    def __init__(self, label: str, title: str, sub_title: str, paragraphs: Iterable[str]) -> None:
+        # labels and titles repeat across papers (e.g. "Introduction"), so keep one copy of each
+        self.label = _intern(label)
+        self.title = _intern(title)
+        self.sub_title = _intern(sub_title)
+        self.paragraphs = tuple(paragraphs)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Section) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Section({self.label!r}, {self.title!r}, {self.sub_title!r}, {len(self.paragraphs)} paragraphs)"
+
+
+class Paper:
+    """A parsed paper with its sections as a flat tuple, in document order.
+
+    Uses a fraction of the memory of the nested dict of Parser.parse_single_to_nested_dict
+    (EID -> label -> section -> subsection -> paragraphs), which has a dict per level, and attributes cannot be
+    mistyped into new branches. to_nested_dict() and from_nested_dict() convert between the two.
+
+    Args:
+        eid (str): EID of the paper
+        title (str): title of the paper
+        keywords (Iterable[str]): keywords
+        abstract (str): abstract
+        sections (Iterable[Section]): (sub)sections in document order
+    """
+
+    __slots__ = ("eid", "title", "keywords", "abstract", "sections")
+
+    def __init__(self, eid: str, title: Optional[str], keywords: Iterable[str] = (), abstract: str = "",
+                 sections: Iterable[Section] = ()) -> None:
+        self.eid = eid
+        self.title = title
+        self.keywords = tuple(keywords)
+        self.abstract = abstract
+        self.sections = tuple(sections)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Paper) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Paper({self.eid!r}, {self.title!r}, {len(self.sections)} sections)"
+
+    def labels(self) -> List[str]:
+        """labels of the sections, in order of first appearance"""
+        return list(dict.fromkeys(section.label for section in self.sections))
+
+    def text(self, label: Optional[str] = None) -> str:
+        """paragraphs of the sections with label (all sections if None), separated by blank lines"""
+        return "\n\n".join(paragraph for section in self.sections if label is None or section.label == label
+                           for paragraph in section.paragraphs)
+
+    def to_nested_dict(self) -> defaultdict:
+        """{EID: {"title", "keywords", "abstract", label: {section title: {subsection title: [paragraphs]}}}},
+        the same as Parser.parse_single_to_nested_dict"""
+        label_dict = create_nested_defaultdict()
+        paper_dict = label_dict[self.eid]
+        paper_dict["title"] = self.title
+        paper_dict["keywords"] = list(self.keywords)
+        paper_dict["abstract"] = self.abstract
+        for section in self.sections:
+            paper_dict[section.label][section.title][section.sub_title] = list(section.paragraphs)
+        return label_dict
+
+    @classmethod
+    def from_nested_dict(cls, label_dict: dict) -> "Paper":
+        """the Paper of a nested dict with a single EID (e.g. a cached output of parse_single_to_nested_dict)"""
+        (eid, paper_dict), = label_dict.items()
+        sections = [Section(label, title, sub_title, paragraphs)
+                    for label, section_dicts in paper_dict.items() if label not in ("title", "keywords", "abstract")
+                    for title, sub_dicts in section_dicts.items()
+                    for sub_title, paragraphs in sub_dicts.items()]
+        return cls(eid, paper_dict.get("title"), paper_dict.get("keywords", ()), paper_dict.get("abstract", ""),
+                   sections)
+
+
+def papers_to_nested_dict(papers: Iterable[Paper]) -> defaultdict:
+    """the nested dicts of papers in one dict, like Parser.parse_multiple_to_nested_dict"""
+    label_dict_joined = defaultdict(str)
+    for paper in papers:
+        label_dict_joined.update(paper.to_nested_dict())
+    return label_dict_joined
@@ -1,21 +1,44 @@
 import polars as pl
-from elsapy_wrapper.elsclient import ElsClient
-from elsapy_wrapper.elsprofile import ElsAuthor, ElsAffil
-from elsapy_wrapper.elsdoc import FullDoc, AbsDoc
-from elsapy_wrapper.elssearch import ElsSearch
+from src.data.elsapy_wrapper.elsclient import ElsClient
+from src.data.elsapy_wrapper.elsprofile import ElsAuthor, ElsAffil
+from src.data.elsapy_wrapper.elsdoc import FullDoc, AbsDoc
+from src.data.elsapy_wrapper.elssearch import ElsSearch
 import json
 import sys
-from util.log_util import get_logger
-from typing import Union
+import urllib.parse
+from src.data.util.log_util import get_logger
+from typing import Optional, Union
+from functools import partial
 from pathlib import Path
 import requests
 
+from src.pipeline.executor import imap_jobs
+from src.pipeline.profiling import profile_stage
+from src.pipeline.sharding import Shard, append_unavailable_paper, in_shard
+
 class PaperDownloader:
     def __init__(self, api_key:  Union[str, None], inst_token:  Union[str, None], unavailable_papers_csv_path: str):
         # Initialize client
         self.client = ElsClient(api_key, accept = "text/xml")
         self.client.inst_token = inst_token
         self.unavailable_papers_csv_path = unavailable_papers_csv_path
+        self.logger = get_logger(__name__)
+
+    def __getstate__(self):
+        # process workers (executor="process") get the API key and token, and create their own client
+        state = self.__dict__.copy()
+        client = state.pop("client")
+        del state["logger"]
+        state["api_key"], state["inst_token"] = client.api_key, client.inst_token
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        api_key, inst_token = state.pop("api_key"), state.pop("inst_token")
+        self.__dict__.update(state)
+        self.client = ElsClient(api_key, accept = "text/xml")
+        self.client.inst_token = inst_token
+        self.logger = get_logger(__name__)
         
     def abstract_download(self, eid_list: list, output_folder: str) -> None:
         # set local_dir to output_folder
@@ -31,48 +54,79 @@ class PaperDownloader:
             else:
                 logger.info("Failed to read: " + eid)
 
-    def fulldoc_download(self, doi_link_df: pl.DataFrame, xml_output_folder: str, pdf_output_folder: str) -> None: 
-        # store unavailable papers' links to save as text file
-        unavailable_papers = {
-            "Title": [],
-            "DOI": [],
-            "Link": []
-        }
+    def download_single(self, row: dict, xml_output_folder: str, pdf_output_folder: str) -> Union[Path, None]:
+        """Download the full text of a single paper
+
+        Args:
+            row (dict): a row with "DOI", "Link", and "Title"
+            xml_output_folder (str): folder to save XML full texts from the Elsevier API
+            pdf_output_folder (str): folder to save PDFs from the PLOS One API
+
+        Returns:
+            Union[Path, None]: path to the downloaded file, or None if the paper is unavailable
+        """
+        if (row["DOI"] == "") | (row["DOI"] == None):
+            return None
         # set local_dir to output_folder
         self.client.local_dir = xml_output_folder
-        logger = get_logger(__name__)
-        ## ScienceDirect (full-text) document example using DOI
-        for row in doi_link_df.rows(named=True):
-            if (row["DOI"] == "") | (row["DOI"] == None):
-                unavailable_papers["Title"].append(row["Title"].replace(",", ""))
-                unavailable_papers["DOI"].append(row["DOI"])
-                unavailable_papers["Link"].append(row["Link"])
-                continue
-            # input eid to get full text     
-            doi_doc = FullDoc(doi = row["DOI"]) 
-            if doi_doc.read(self.client):
-                logger.info("Read doi_doc.title: " + doi_doc.title)
-                doi_doc.write()   
-            else:
-                logger.info("Failed to read: " + row["DOI"])
-                try:
-                    # try PLOS One API
-                    url = f"https://journals.plos.org/plosone/article/file?id={row['DOI']}&type=printable" 
-                    # download pdf
-                    response = requests.get(url)
-                    # save as pdf 
-                    with open(Path(pdf_output_folder) / f"{row['DOI']}.pdf", 'wb') as f:
-                        f.write(response.content)
-                except:
-                    unavailable_papers["Title"].append(row["Title"].replace(",", ""))
-                    unavailable_papers["DOI"].append(row["DOI"])
-                    unavailable_papers["Link"].append(row["Link"])
-                
-        # save unavailable papers' links to csv file after converting to DataFrame
+        # input eid to get full text
+        doi_doc = FullDoc(doi = row["DOI"])
+        if doi_doc.read(self.client):
+            self.logger.info("Read doi_doc.title: " + doi_doc.title)
+            doi_doc.write()
+            return Path(xml_output_folder) / (urllib.parse.quote_plus(doi_doc.uri) + ".xml")
+        self.logger.info("Failed to read: " + row["DOI"])
+        try:
+            # try PLOS One API
+            url = f"https://journals.plos.org/plosone/article/file?id={row['DOI']}&type=printable"
+            # download pdf
+            response = requests.get(url)
+            # save as pdf
+            pdf_path = Path(pdf_output_folder) / f"{row['DOI']}.pdf"
+            with open(pdf_path, 'wb') as f:
+                f.write(response.content)
+            return pdf_path
+        except:
+            return None
+
+    def write_unavailable_papers(self, unavailable_rows: list) -> None:
+        """save unavailable papers' titles, DOIs and links to self.unavailable_papers_csv_path
+        """
+        unavailable_papers = {
+            "Title": [row["Title"].replace(",", "") for row in unavailable_rows],
+            "DOI": [row["DOI"] for row in unavailable_rows],
+            "Link": [row["Link"] for row in unavailable_rows]
+        }
         unavailable_papers_df = pl.DataFrame(unavailable_papers)
         unavailable_papers_df.write_csv(self.unavailable_papers_csv_path)
 
-        # # save unavailable papers' links to text file
-        # with open(Path(output_folder) / 'unavailable_papers_links.txt', 'w') as file:
-        #     for item in unavailable_papers:
-        #         file.write("%s\n" % item)   
\ No newline at end of file
+    def append_unavailable_paper(self, row: dict) -> None:
+        """append a single unavailable paper to self.unavailable_papers_csv_path
+        """
+        append_unavailable_paper(self.unavailable_papers_csv_path, row["Title"], row["DOI"], row["Link"])
+
+    def fulldoc_download(self, doi_link_df: pl.DataFrame, xml_output_folder: str, pdf_output_folder: str,
+                         jobs: int = 1, executor: str = "serial", shard: Optional[Shard] = None) -> None:
+        """download full texts of the papers in doi_link_df
+
+        Args:
+            doi_link_df (pl.DataFrame): dataframe with "DOI", "Link", and "Title"
+            xml_output_folder (str): folder to save XML full texts from the Elsevier API
+            pdf_output_folder (str): folder to save PDFs from the PLOS One API
+            jobs (int): number of workers. Defaults to 1.
+            executor (str): "serial", "thread", or "process". Defaults to "serial".
+            shard (Optional[Shard]): (i, N) to only download the papers whose DOI hashes to shard i of N
+        """
+        # store unavailable papers' rows to save as csv file
+        unavailable_rows = []
+        ## ScienceDirect (full-text) document example using DOI
+        rows = [row for row in doi_link_df.rows(named=True) if in_shard(row["DOI"], shard)]
+        download = partial(self.download_single, xml_output_folder=xml_output_folder, pdf_output_folder=pdf_output_folder)
+        with profile_stage("download", items=len(rows)):
+            file_paths = imap_jobs(download, rows, jobs=jobs, executor=executor, desc="Downloading papers")
+            for row, file_path in zip(rows, file_paths):
+                if file_path is None:
+                    unavailable_rows.append(row)
+
+        # save unavailable papers' links to csv file after converting to DataFrame
+        self.write_unavailable_papers(unavailable_rows)
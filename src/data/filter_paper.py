@@ -1,5 +1,7 @@
 import polars as pl
 
+from src.pipeline.tables import read_arrow_table
+
 class PaperFilter:
     def __init__(self, 
                 initial_input_filepath: str, 
@@ -12,8 +14,10 @@ class PaperFilter:
             input_paper_df = pl.read_csv(self.initial_input_filepath)
         elif self.initial_input_filepath[-5:] == ".xlsx":
             input_paper_df = pl.read_excel(self.initial_input_filepath, sheet_id=1, read_csv_options={"infer_schema_length":0})
+        elif self.initial_input_filepath.endswith((".parquet", ".arrow", ".feather")):
+            input_paper_df = pl.from_arrow(read_arrow_table(self.initial_input_filepath))
         else:
-            raise ValueError("Input file must be either .csv or .xlsx")
+            raise ValueError("Input file must be either .csv, .xlsx, .parquet, or .arrow")
         # filter papers
         input_paper_df = input_paper_df.filter(pl.col(self.include_col_name) == "1")
         return input_paper_df
\ No newline at end of file
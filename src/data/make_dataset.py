@@ -10,11 +10,12 @@ import json
 from typing import Union
 from datetime import date
 
-from download_paper import PaperDownloader
-from parse_data import Parser
-from filter_paper import PaperFilter
-from util.log_util import get_logger
-from asr_csv2ris import CSV2RISConverter
+from src.data.download_paper import PaperDownloader
+from src.data.parse_data import Parser, save_papers
+from src.data.filter_paper import PaperFilter
+from src.data.util.log_util import get_logger
+from src.data.asr_csv2ris import CSV2RISConverter
+from src.pipeline.tables import table_path, write_table
 
 # @click.command()
 # @click.argument('input_filepath', type=click.Path(exists=True))
@@ -24,9 +25,19 @@ def main(output_path: str,
         inst_token: Union[str, None],
         initial_input_folder: str = '', 
         abstract_filtered_input_filepath: str = '',
-        ris_filepath: str = ''):
+        ris_filepath: str = '',
+        question_list_text: str = '',
+        qa_output_json_file_path: str = '',
+        openai_api_key: Union[str, None] = None,
+        queue_size: int = 8,
+        table_format: str = "parquet",
+        export_csv: bool = True):
     """ Runs data processing scripts to turn raw data from (../raw) into
         cleaned data ready to be analyzed (saved in ../processed).
+        If question_list_text is given, download, parsing and Q&A run as a streaming
+        pipeline and the Q&A results are saved to qa_output_json_file_path.
+        Intermediate tables are saved as table_format ("parquet", "arrow", or "csv"),
+        with a csv copy if export_csv is True.
     """
     logger = get_logger(__name__)
     logger.info('making final data set from raw data')
@@ -42,22 +53,35 @@ def main(output_path: str,
     # drop duplicates
     paper_df = paper_df.unique(subset=["EID"])
     # save to the same folder as abstract_filtered_input_filepath
-    paper_df.write_csv(Path(abstract_filtered_input_filepath).parent / ("scopus_input.csv"))
+    write_table(paper_df, table_path(Path(abstract_filtered_input_filepath).parent / "scopus_input", table_format),
+                export_csv=export_csv)
     
     if abstract_filtered_input_filepath != '':
         # load the filtered papers
         paper_filter = PaperFilter(abstract_filtered_input_filepath)
         input_paper_df = paper_filter.filter_paper()
         
-        # save to csv and convert to ris
+        # save as a table and convert to ris
         if abstract_filtered_input_filepath[-5:] == ".xlsx":
-            input_paper_df.write_csv(abstract_filtered_input_filepath[:-5] + ".csv")
+            write_table(input_paper_df, table_path(abstract_filtered_input_filepath[:-5], table_format),
+                        export_csv=export_csv)
             csv2ris = CSV2RISConverter(abstract_filtered_input_filepath[:-5] + ".csv", ris_filepath)
-            csv2ris.run()
+            csv2ris.run(input_paper_df.rows(named=True))
         
         # get DOI and link to dowlnoad full text and store link for unavailable papers
         full_doi_link_df = (input_paper_df.
                     select(["DOI","Link", "Title"]))
+        if question_list_text != '':
+            # stream each paper through download -> parse -> Q&A
+            from src.features.openai_gpt4 import PaperReviewer
+            from src.pipeline.streaming import StreamingPipeline
+            parser = Parser([], unavailable_paper_csv_path)
+            reviewer = PaperReviewer(question_list_text, openai_api_key=openai_api_key)
+            pipeline = StreamingPipeline(paper_downloader, parser, reviewer, output_path, queue_size=queue_size)
+            pipeline.run(full_doi_link_df, qa_output_json_file_path)
+            logger.info('downloaded, parsed and ran Q&A with papers')
+            return
+
         # make output folders
         xml_paper_output_folder = Path(output_path) / "xml"
         xml_paper_output_folder.mkdir(parents=True, exist_ok=True)
@@ -72,11 +96,11 @@ def main(output_path: str,
 
         # initialize Parser
         doc_list = list(xml_paper_output_folder.glob("*.xml"))
-        parser = Parser(doc_list, unavailable_paper_csv_path)
-        label_dict_joined = parser.parse_multiple_to_simple_dict()
-        label_dict_joined = dict(label_dict_joined)
-        # use the map function to write each paper content to a file
-        list(map(lambda x: open(f"{str(paper_output_folder)}/{x[0].replace('/', '_')}.txt", "w").write(x[1]), label_dict_joined.items()))
+        # unchanged xml files are taken from the parse cache instead of being parsed again
+        parser = Parser(doc_list, unavailable_paper_csv_path,
+                        parse_cache=str(Path(output_path).parent / "interim" / "parse_cache"))
+        # write each paper content to a file as soon as it is parsed
+        save_papers(parser.iter_multiple_to_simple_dict(), paper_output_folder)
         logger.info('saved papers as text files')
 
 if __name__ == '__main__':
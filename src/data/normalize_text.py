@@ -0,0 +1,48 @@
+import re
+
+from lxml import etree
+
+
+class TextNormalizer:
+    """Clean the text of xml elements with precompiled patterns, shared by all parse methods.
+
+    The parse methods used to clean every paragraph, title and keyword with
+        re.sub(r'\\[.*?\\]', '', re.sub(" +", " ", text.replace("\\n", " "))).replace(" .", ".").strip()
+    normalize() gives exactly the same result, but
+        - squeezes only runs of two or more spaces, instead of replacing every single space with itself
+        - skips the regex passes when the text has no double space or no "[" at all
+    str.replace and the "in" checks run in C, so this is about twice as fast as the old cleanup. A single
+    regex doing everything at once was tried and is slower, since it has to try its alternatives at every character.
+    """
+
+    _SPACES = re.compile(" {2,}")
+    _CITATIONS = re.compile(r"\[.*?\]")
+
+    def _squeeze(self, text: str) -> str:
+        return self._SPACES.sub(" ", text) if "  " in text else text
+
+    def normalize(self, text: str, remove_citations: bool = True) -> str:
+        """replace newlines, squeeze spaces, remove citations in brackets and spaces before periods
+
+        Args:
+            text (str): raw text
+            remove_citations (bool): False to only replace newlines and squeeze spaces (used for keywords)
+        """
+        text = self._squeeze(text.replace("\n", " "))
+        if not remove_citations:
+            return text.strip()
+        if "[" in text:
+            text = self._CITATIONS.sub("", text)
+        return text.replace(" .", ".").strip()
+
+    def normalize_joined(self, text: str) -> str:
+        """squeeze spaces, then replace newlines, for text joined from text nodes (abstract and data availability)
+
+        Spaces are squeezed before newlines are replaced, so " \\n " becomes three spaces, as it always has.
+        """
+        return self._squeeze(text).replace("\n", " ").strip()
+
+    def element_text(self, element: etree._Element, remove_citations: bool = True) -> str:
+        """normalize the text content of element (including its tail, like etree.tostring(method="text"))"""
+        return self.normalize(etree.tostring(element, method="text", encoding="unicode"),
+                              remove_citations=remove_citations)
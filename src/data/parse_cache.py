@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+from src.data.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+
+class ParseCache:
+    """Store the output of the Parser methods on disk, keyed by the content hash of the xml file.
+
+    The key is the sha256 of the file content together with the name of the method and the settings that change
+    its output (parser version, chunk size, section taxonomy...), so a result is reused only for the same bytes
+    parsed the same way. Renaming or touching a file keeps its results; changing it or the parser does not.
+    Each result is a JSON file in cache_dir/<first 2 characters of the key>/<key>.json, written atomically,
+    so several processes can share the cache. PdfTextExtractor stores the text of PDFs the same way.
+
+    Args:
+        cache_dir (Union[str, Path]): folder of the cache, created if needed
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = "data/interim/parse_cache") -> None:
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(doc: Union[str, Path]) -> str:
+        """sha256 of the content of doc"""
+        sha = hashlib.sha256()
+        with open(doc, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def key(self, doc: Union[str, Path], method_name: str, params: dict, content_hash: Optional[str] = None) -> str:
+        """cache key of the output of method_name on doc with params
+
+        Pass content_hash (from content_hash(doc)) to look up several outputs of doc without reading it again.
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(doc)
+        sha = hashlib.sha256(content_hash.encode())
+        sha.update(json.dumps({"method": method_name, "params": params}, sort_keys=True).encode())
+        return sha.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """the stored result of key, or None if there is none (or it cannot be read)"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except ValueError:
+            logger.warning(f"ignoring corrupt parse cache entry {path}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """store result under key"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def reset_counts(self) -> None:
+        self.hits = 0
+        self.misses = 0
@@ -1,10 +1,35 @@
 import lxml
 from lxml import etree
-import re
+import functools
+import json
+import math
 from collections import defaultdict
-from tqdm import tqdm
-from langchain.text_splitter import CharacterTextSplitter
-from nltk.tokenize import sent_tokenize
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from src.data.chunk_text import SentenceChunker
+from src.data.document_model import Paper, Section, create_nested_defaultdict
+from src.data.normalize_text import TextNormalizer
+from src.data.parse_cache import ParseCache
+from src.data.section_taxonomy import SectionTaxonomy
+from src.data.util.log_util import get_logger
+
+from src.pipeline.executor import imap_jobs
+from src.pipeline.profiling import profile_iter
+from src.pipeline.sharding import Shard, append_unavailable_paper, doi_from_path, in_shard
+
+logger = get_logger(__name__)
+
+# part of the parse cache key: bump it when a change to the parser changes its output
+PARSER_VERSION = 1
+
+# views of a document that Parser.parse_single_views can make in one pass, and the parse_single_* method
+# that makes the same output (also used as their parse cache key)
+VIEWS = {"nested": "parse_single_to_nested_dict", "simple": "parse_single_to_simple_dict",
+         "abstract": "parse_single_abstract", "metadata": "parse_single_metadata",
+         "section_index": "parse_single_section_index"}
+
+# label of the span of the section index that covers the DOI, title, keywords, abstract and data availability
+HEADER_LABEL = "Header"
 
 # helper function
 def is_float(string):
@@ -14,6 +39,133 @@ def is_float(string):
     except ValueError:
         return False
 
+# namespaces of the Elsevier full-text API response, to find head and body without scanning the whole tree
+_ELSEVIER_NS = {"svapi": "http://www.elsevier.com/xml/svapi/article/dtd", "xocs": "http://www.elsevier.com/xml/xocs/dtd",
+                "ja": "http://www.elsevier.com/xml/ja/dtd"}
+_DIRECT_XPATHS = {name: etree.XPath(f"/*/svapi:originalText/xocs:doc/xocs:serial-item/*/ja:{name}", namespaces=_ELSEVIER_NS)
+                  for name in ("head", "body")}
+# the original lookup: any element in the document whose name is head/body, compared case-insensitively on FULTEXR
+_SCAN_XPATHS = {name: etree.XPath(f"//*[translate(name(), 'FULLTEXTR', 'fulltextr')='{name}']")
+                for name in ("head", "body")}
+
+def _find_head_or_body(root, name: str) -> list:
+    """the "head" or "body" elements of the document of root, as found by _SCAN_XPATHS[name]
+
+    The element is looked up at its place in an Elsevier article (originalText/xocs:doc/xocs:serial-item/*/name),
+    which only visits a few elements. The whole tree is scanned only if it is not there (e.g. papers without a body,
+    or other document layouts).
+    """
+    found = _DIRECT_XPATHS[name](root)
+    # name() of a prefixed element is "prefix:name", which the scan does not match
+    if len(found) > 0 and found[0].prefix is None:
+        return found
+    return _SCAN_XPATHS[name](root)
+
+def _find_eid(coredata, ns: dict):
+    """the eid element of coredata, in the default namespace of the document (as served by the Elsevier API)
+    or without a namespace"""
+    eid = coredata.find("eid", namespaces={None: ns[None]})
+    return eid if eid is not None else coredata.find("eid")
+
+def _is_unprefixed(element, name: str) -> bool:
+    # same as the xpath translate(name(), ...)=name used in tree mode for "head" and "body"
+    return element.prefix is None and etree.QName(element).localname == name
+
+def _is_body_content(element, ns: dict, body) -> bool:
+    # the elements of .//ce:section-title|.//ce:para|.//ce:label in the body
+    return element.tag in (f'{{{ns["ce"]}}}section-title', f'{{{ns["ce"]}}}para', f'{{{ns["ce"]}}}label')
+
+def _is_top_level_section(element, ns: dict, body) -> bool:
+    # the elements of body/ce:sections/ce:section
+    parent = element.getparent()
+    return element.tag == f'{{{ns["ce"]}}}section' and parent is not None and \
+        parent.tag == f'{{{ns["ce"]}}}sections' and parent.getparent() is body
+
+def _to_nested_defaultdict(value):
+    # turn the plain dicts of a cached nested dict back into nested defaultdicts
+    if not isinstance(value, dict):
+        return value
+    nested = create_nested_defaultdict()
+    for key, item in value.items():
+        nested[key] = _to_nested_defaultdict(item)
+    return nested
+
+def _restore_cached(method_name: str, cached: dict):
+    # give a cached output the types of a freshly parsed one
+    if method_name == "parse_single_to_nested_dict":
+        return _to_nested_defaultdict(cached)
+    if method_name == "parse_single_metadata":
+        return cached
+    if method_name == "parse_single_section_index":
+        return defaultdict(list, cached)
+    return defaultdict(str, cached)
+
+def _section_index(header: str, parts: list, spans: list, text_length: int) -> list:
+    """[[label, start, end], ...] of the paper text header + "".join(parts), stripped to text_length
+
+    Args:
+        spans (list): (label, index in parts of the first chunk with that label) where the label changes
+    """
+    index = [[HEADER_LABEL, 0, len(header)]]
+    offset = len(header)
+    position = 0
+    for label, part_index in spans:
+        offset += sum(len(part) for part in parts[position:part_index])
+        position = part_index
+        index[-1][2] = offset
+        index.append([label, offset, offset])
+    # the strip of the paper text only shortens the last span
+    index[-1][2] = text_length
+    return index
+
+def _parse_chunk(task: tuple) -> tuple:
+    """parse a chunk of documents in a worker process
+
+    Args:
+        task (tuple): (parser class, keyword arguments of the parser, name of a parse_single_* method,
+            keyword arguments of the method, list of documents)
+
+    Returns:
+        tuple: the result of the method for each document, in the same order, and the counts of this chunk
+            (see Parser._worker_stats)
+    """
+    parser_class, parser_kwargs, method_name, method_kwargs, docs = task
+    parser = parser_class([], **parser_kwargs)
+    # the taxonomy and the cache are copies in this process, only count this chunk
+    parser.section_taxonomy.reset_counts()
+    if parser.parse_cache is not None:
+        parser.parse_cache.reset_counts()
+    parse = functools.partial(getattr(parser, method_name), **method_kwargs)
+    return [parse(doc) for doc in docs], parser._worker_stats()
+
+def save_papers(label_dict, paper_output_folder: str) -> None:
+    """Writes each paper content to {paper_output_folder}/{DOI with "/" replaced by "_"}.txt
+
+    Args:
+        label_dict: {DOI: paper content}, or an iterator of (DOI, paper content) such as
+            Parser.iter_multiple_to_simple_dict(), to write each paper as soon as it is parsed
+    """
+    items = label_dict.items() if isinstance(label_dict, dict) else label_dict
+    for doi, text in items:
+        with open(f"{str(paper_output_folder)}/{doi.replace('/', '_')}.txt", "w") as f:
+            f.write(text)
+
+def section_index_path(paper_path: Union[str, Path]) -> Path:
+    """path of the section index of the paper text file paper_path (e.g. 10.1016_j.x.1.txt -> 10.1016_j.x.1.sections.json)"""
+    return Path(paper_path).with_suffix(".sections.json")
+
+def save_section_indexes(index_dict, paper_output_folder: str) -> None:
+    """Writes the section index of each paper next to its text, to {paper_output_folder}/{DOI with "/" replaced by "_"}.sections.json
+
+    Args:
+        index_dict: {DOI: section index} (see Parser.parse_single_section_index), or an iterator of
+            (DOI, section index)
+    """
+    items = index_dict.items() if isinstance(index_dict, dict) else index_dict
+    for doi, spans in items:
+        with open(section_index_path(f"{str(paper_output_folder)}/{doi.replace('/', '_')}.txt"), "w") as f:
+            json.dump(spans, f)
+
 class Parser:
     """This class parse data from a list of xml files and structure strings into a JSON file with the following structure
         - EID
@@ -29,11 +181,34 @@ class Parser:
             - others
                 - a dict of subsections...
         The parsing is conducted using regex expressions.
+
+    Args:
+        doc_list (list): paths to the xml files
+        unavailable_papers_csv_path (str): csv file to append papers without a body to
+        iterparse (bool): stream full texts with etree.iterparse instead of loading the whole document.
+            The output is the same; peak memory per document is much lower for large articles.
+        section_taxonomy (SectionTaxonomy or path): rules to label the top-level sections in the nested dict,
+            or a JSON file to load them from (see SectionTaxonomy). Defaults to the built-in rules.
+        parse_cache (ParseCache or path): reuse the outputs of documents parsed before, if their content and the
+            parser are unchanged, from this cache (or a ParseCache in this folder). Defaults to no cache.
     """
     
-    def __init__(self, doc_list: list, unavailable_papers_csv_path: str) -> None:
+    def __init__(self, doc_list: list, unavailable_papers_csv_path: str, iterparse: bool = False,
+                 section_taxonomy: Optional[Union[SectionTaxonomy, str, Path]] = None,
+                 parse_cache: Optional[Union[ParseCache, str, Path]] = None) -> None:
         self._doc_list = doc_list
         self.unavailable_papers_csv_path = unavailable_papers_csv_path
+        self.iterparse = iterparse
+        if section_taxonomy is None:
+            section_taxonomy = SectionTaxonomy()
+        elif not isinstance(section_taxonomy, SectionTaxonomy):
+            section_taxonomy = SectionTaxonomy.from_json(section_taxonomy)
+        self.section_taxonomy = section_taxonomy
+        if parse_cache is not None and not isinstance(parse_cache, ParseCache):
+            parse_cache = ParseCache(parse_cache)
+        self.parse_cache = parse_cache
+        self.normalizer = TextNormalizer()
+        self.chunker = SentenceChunker(chunk_size=1000)
         
     @property
     def doc_list(self):
@@ -42,108 +217,408 @@ class Parser:
     def doc_list(self,doc_list):
         self._doc_list = doc_list
 
+    def docs_in_shard(self, shard: Optional[Shard] = None) -> list:
+        """files in self.doc_list whose DOI (taken from the file name) hashes to shard (i, N)"""
+        return [doc for doc in self.doc_list if in_shard(doi_from_path(doc), shard)]
+
+    def _cache_params(self, method_name: str) -> dict:
+        # settings that change the output of method_name, part of the parse cache key
+        params = {"version": PARSER_VERSION}
+        if method_name in ("parse_single_to_simple_dict", "parse_single_section_index"):
+            params["chunker"] = [self.chunker.chunk_size, self.chunker.language]
+        if method_name in ("parse_single_to_nested_dict", "parse_single_section_index"):
+            params["taxonomy"] = [self.section_taxonomy.rules, self.section_taxonomy.default_label]
+        return params
+
+    def _cached(self, method_name: str, doc, parse):
+        """the output of parse(doc) from self.parse_cache, or parse it and store the output
+
+        Empty outputs (papers without a body) are not stored, so they are parsed again and still
+        written to the unavailable papers csv.
+        """
+        if self.parse_cache is None:
+            return parse(doc)
+        key = self.parse_cache.key(doc, method_name, self._cache_params(method_name))
+        cached = self.parse_cache.get(key)
+        if cached is not None:
+            return _restore_cached(method_name, cached)
+        label_dict = parse(doc)
+        if len(label_dict) > 0:
+            self.parse_cache.put(key, label_dict)
+        return label_dict
+
+    def _worker_kwargs(self) -> dict:
+        # keyword arguments to make the same parser in a worker process
+        return {"unavailable_papers_csv_path": self.unavailable_papers_csv_path, "iterparse": self.iterparse,
+                "section_taxonomy": self.section_taxonomy, "parse_cache": self.parse_cache}
+
+    def _worker_stats(self) -> dict:
+        stats = {"section_labels": dict(self.section_taxonomy.label_counts),
+                 "section_cache_hits": self.section_taxonomy.cache_hits}
+        if self.parse_cache is not None:
+            stats["parse_cache"] = (self.parse_cache.hits, self.parse_cache.misses)
+        return stats
+
+    def _add_worker_stats(self, stats: dict) -> None:
+        self.section_taxonomy.add_counts(stats["section_labels"], stats["section_cache_hits"])
+        if "parse_cache" in stats:
+            self.parse_cache.hits += stats["parse_cache"][0]
+            self.parse_cache.misses += stats["parse_cache"][1]
+
     def _split_text(self,text) -> list:
-        # use nltk to split the text by sentences
-        sentences = sent_tokenize(text)
-        text_cleaned = ".\n".join(sentences)
-        text_splitter = CharacterTextSplitter(separator=".\n", chunk_size=1000, chunk_overlap=0)
-        texts = text_splitter.split_text(text_cleaned)
-        return [t.replace('..\n', '. ') for t in texts if t]
+        # split the text by sentences into chunks of up to 1000 characters
+        return self.chunker.split(text)
     
     def _categorize_section(self, title: str) -> str:
         """a method to categorize titles
 
         Args:
-            title (_type_): _description_
+            title (str): section title. Titles that match no rule of self.section_taxonomy are "Others".
         """
-        patterns = [
-            (r'.*intro.*|.*background.*|.*problem statement.*|.*research objective.*', 'Introduction'),
-            (r'.*review.*|.*work.*', 'Literature review'),
-            (r'(?!.*result.*)(.*method.*|.*data.*|.*experiment.*|.*model.*|.*pipeline.*|.*evaluation.*|.*design.*|.*materials.*)', 'Methodology'),
-            (r'.*result.*|.*discussion.*|.*conclusion.*|.*summary.*|.*implication.*', 'Results')
-            ]
-
-        title = title.lower()  # convert to lowercase
-        for pattern, label in patterns:
-            if re.search(pattern, title):
-                return label 
-        # if it doesn't get caught by any labels, then return as "others"
-        return "Others" 
+        return self.section_taxonomy.categorize(title)
         
-    def _parse_single_to_nested_dict(self, doc_xml_root: lxml.etree._Element) -> defaultdict:
-        """method to parse a single xml object and return a dictionary
+    def _parse_head(self, head: lxml.etree._Element, ns: dict) -> tuple:
+        """get keywords, abstract and data availability from the head element"""
+        # get keywords
+        keywords = [self.normalizer.element_text(keyword, remove_citations=False) for keyword in head.xpath(".//ce:keyword", namespaces={"ce": ns["ce"]})]
+        
+        # get abstract
+        abstract = self.normalizer.normalize_joined("".join(head.xpath(".//ce:abstract//ce:simple-para/text()", namespaces={"ce":ns["ce"]})))
+
+        # get data availability
+        data_availability = self.normalizer.normalize_joined("".join(head.xpath(".//ce:data-availability//ce:para/text()", namespaces={"ce":ns["ce"]})))
+        if data_availability == "":
+            data_availability = "Not mentioned"
+        return keywords, abstract, data_availability
+
+    def _clean_element_text(self, element: lxml.etree._Element) -> str:
+        return self.normalizer.element_text(element)
+
+    def _section_leaves(self, section: lxml.etree._Element, ns: dict) -> list:
+        """categorize a top-level ce:section and return a Section for it, or for each of its subsections"""
+        section_title = section.find("ce:section-title",namespaces={"ce": ns["ce"]}).text
+        label = self._categorize_section(section_title) 
+        section_below_list = section.findall("ce:section",namespaces={"ce": ns["ce"]})
+        leaves = []
+        if len(section_below_list) > 0:
+            for section_below in section_below_list:
+                sub_section_title = section_below.find("ce:section-title",namespaces={"ce": ns["ce"]}).text
+                paragraphs = [self._clean_element_text(para) for para in section_below.xpath(".//ce:para", namespaces={"ce": ns["ce"]})]
+                # send any subsections with "result" in their titles to result label
+                if "result" in sub_section_title:
+                    leaves.append(Section("Results", section_title, sub_section_title, paragraphs))
+                else:
+                    leaves.append(Section(label, section_title, sub_section_title, paragraphs))
+        else:
+            paragraphs = [self._clean_element_text(para) for para in section.xpath(".//ce:para", namespaces={"ce": ns["ce"]})]
+            leaves.append(Section(label, section_title, section_title, paragraphs))
+        return leaves
+
+    def _parse_single_to_paper(self, doc_xml_root: lxml.etree._Element) -> Paper:
+        """method to parse a single xml object and return a Paper
 
         Args:
             doc_xml_root (etree root object): etree roo object of a single xml file
         
         Return: 
-            label_dict (dict): dictionary with the structure stated above
+            Paper: the paper, with its sections in document order
         """
-        # initialize the final dict (3 level, i.e. EID -> general sections -> actual sections -> Subsections)
-        def create_nested_defaultdict():
-            return defaultdict(create_nested_defaultdict)
-        label_dict = create_nested_defaultdict()
-        
         # get namespace
         ns = doc_xml_root.nsmap
 
-        # get EID (All the elments in the list will be under this EID)
+        # get EID
         coredata = doc_xml_root.find("coredata", namespaces={None:ns[None]})
-        eid = coredata.find("eid", namespaces={"prism":ns["prism"]}).text
+        eid = _find_eid(coredata, ns).text
 
         # get a title
-        label_dict[eid]["title"] = coredata.find("dc:title", namespaces={"dc":ns["dc"]}).text
+        title = coredata.find("dc:title", namespaces={"dc":ns["dc"]}).text
 
-        # get keywords
-        head = doc_xml_root.xpath(f"//*[translate(name(), 'FULLTEXTR', 'fulltextr')='head']")[0]
-        keywords = [re.sub(" +", " ", etree.tostring(keyword, method="text", encoding="unicode").replace("\n", " ")).strip() for keyword in head.xpath(".//ce:keyword", namespaces={"ce": ns["ce"]})]
-        label_dict[eid]["keywords"] = keywords
-        
-        # get abstract
-        abstract = re.sub(" +", " ", "".join(head.xpath(".//ce:abstract//ce:simple-para/text()", namespaces={"ce":ns["ce"]}))).replace("\n", " ").strip()
-        label_dict[eid]["abstract"] = abstract
+        # get keywords and abstract
+        head = _find_head_or_body(doc_xml_root, "head")[0]
+        keywords, abstract, _ = self._parse_head(head, ns)
         
         # find sections
-        body = doc_xml_root.xpath(f"//*[translate(name(), 'FULLTEXTR', 'fulltextr')='body']")
+        body = _find_head_or_body(doc_xml_root, "body")
         section_element_root = body[0].find("ce:sections", namespaces = {"ce":ns["ce"]}).findall("ce:section", namespaces={"ce": ns["ce"]})  
 
+        sections = []
         for section in section_element_root:
-            section_title = section.find("ce:section-title",namespaces={"ce": ns["ce"]}).text
-            label = self._categorize_section(section_title) 
-            section_below_list = section.findall("ce:section",namespaces={"ce": ns["ce"]})
-            if len(section_below_list) > 0:
-                for section_below in section_below_list:
-                    sub_section_title = section_below.find("ce:section-title",namespaces={"ce": ns["ce"]}).text
-                    paragraphs = [re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(para, method="text", encoding="unicode").\
-                        replace("\n", " "))).replace(" .", ".").strip() for para in section_below.xpath(".//ce:para", namespaces={"ce": ns["ce"]})]
-                    # send any subsections with "result" in their titles to result label
-                    if "result" in sub_section_title:
-                        label_dict[eid]["Results"][section_title][sub_section_title] = paragraphs
-                    else:
-                        # store in the label_dict
-                        label_dict[eid][label][section_title][sub_section_title] = paragraphs
-            else:
-                paragraphs = [re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(para, method="text", encoding="unicode").\
-                    replace("\n", " "))).replace(" .", ".").strip() for para in section.xpath(".//ce:para", namespaces={"ce": ns["ce"]})]
-                # store in the label_dict
-                label_dict[eid][label][section_title][section_title] = paragraphs
-        return label_dict
+            sections.extend(self._section_leaves(section, ns))
+        return Paper(eid, title, keywords, abstract, sections)
+
+    def _parse_single_to_nested_dict(self, doc_xml_root: lxml.etree._Element) -> defaultdict:
+        """method to parse a single xml object and return a dictionary
+
+        Args:
+            doc_xml_root (etree root object): etree roo object of a single xml file
+        
+        Return: 
+            label_dict (dict): dictionary with the structure stated above
+        """
+        # 3 levels, i.e. EID -> general sections -> actual sections -> Subsections
+        return self._parse_single_to_paper(doc_xml_root).to_nested_dict()
+
+    def _iterparse_document(self, doc, is_capture):
+        """Stream an Elsevier xml file with etree.iterparse and yield its parts as (kind, element)
+
+        - ("root", element): first, to get the namespaces
+        - ("coredata", element) and ("head", element): once the element is complete
+        - ("body", element) when the body starts and ("body_end", element) when it ends
+        - ("sections", element): the ce:sections element of the body, once it is complete
+        - ("capture", element): complete elements of the body for which is_capture(element, ns, body)
+          is True, in document order. Captures inside another capture are yielded after the outer one ends.
+        Every element is cleared once it has been yielded and is not inside a capture, and parsing stops
+        after the body, so memory is bounded by the largest head or capture instead of the whole document
+        (e.g. references and tables in the tail are never kept).
+        """
+        root = body = None
+        ns = {}
+        coredata_tag = None
+        in_coredata = in_head = False
+        coredata_done = head_done = body_done = False
+        captures = []
+        open_captures = []
+        for event, element in etree.iterparse(str(doc), events=("start", "end")):
+            if not isinstance(element.tag, str):
+                continue
+            if root is None:
+                root = element
+                ns = root.nsmap
+                coredata_tag = f"{{{ns[None]}}}coredata" if None in ns else "coredata"
+                yield "root", root
+                continue
+            if event == "start":
+                if not coredata_done and element.tag == coredata_tag and element.getparent() is root:
+                    in_coredata = True
+                elif not head_done and not in_head and _is_unprefixed(element, "head"):
+                    in_head = True
+                elif body is None and _is_unprefixed(element, "body"):
+                    body = element
+                    yield "body", body
+                elif body is not None and not body_done and is_capture(element, ns, body):
+                    captures.append(element)
+                    open_captures.append(element)
+                continue
+
+            if in_coredata:
+                if element.tag != coredata_tag or element.getparent() is not root:
+                    # keep the children until coredata is complete
+                    continue
+                in_coredata = False
+                coredata_done = True
+                yield "coredata", element
+            elif in_head:
+                if not _is_unprefixed(element, "head"):
+                    continue
+                in_head = False
+                head_done = True
+                yield "head", element
+            elif open_captures:
+                if open_captures[-1] is not element:
+                    continue
+                open_captures.pop()
+                if open_captures:
+                    continue
+                for capture in captures:
+                    yield "capture", capture
+                captures = []
+            elif body is not None and element is body:
+                body_done = True
+                yield "body_end", body
+            elif body is not None and not body_done and element.tag == f"{{{ns['ce']}}}sections" and element.getparent() is body:
+                yield "sections", element
+
+            # free the element and its finished siblings
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if coredata_done and head_done and body_done:
+                return
+
+    def _iterparse_single_to_paper(self, doc) -> Paper:
+        """same as _parse_single_to_paper, but streams doc with _iterparse_document"""
+        eid = title = None
+        keywords, abstract = [], ""
+        sections = []
+        has_body = has_sections = False
+        for kind, element in self._iterparse_document(doc, _is_top_level_section):
+            if kind == "root":
+                ns = element.nsmap
+            elif kind == "coredata":
+                eid = _find_eid(element, ns).text
+                title = element.find("dc:title", namespaces={"dc":ns["dc"]}).text
+            elif kind == "head":
+                keywords, abstract, _ = self._parse_head(element, ns)
+            elif kind == "body":
+                has_body = True
+            elif kind == "sections":
+                has_sections = True
+            elif kind == "capture":
+                sections.extend(self._section_leaves(element, ns))
+        if not has_body:
+            raise IndexError(f"{doc} has no body")
+        if not has_sections:
+            raise AttributeError(f"{doc} has no ce:sections in its body")
+        return Paper(eid, title, keywords, abstract, sections)
     
-    def parse_multiple_to_nested_dict(self) -> defaultdict:
+    def _parse_multiple(self, method_name: str, doc_list: list, jobs: int, executor: str, desc: str = None,
+                        method_kwargs: Optional[dict] = None):
+        """apply the parse_single_* method method_name (with method_kwargs) to doc_list and yield the results in the
+        order of doc_list
+
+        With executor="process", doc_list is split into about 4 chunks per worker and each worker process
+        parses a whole chunk with its own parser, so only the file names and the results are sent between
+        processes. Merging the results in the order of doc_list gives the same output as a serial run.
+        """
+        if executor == "process" and jobs > 1 and len(doc_list) > 1:
+            chunksize = max(1, math.ceil(len(doc_list) / (jobs * 4)))
+            tasks = [(type(self), self._worker_kwargs(), method_name, method_kwargs or {}, doc_list[i:i + chunksize])
+                     for i in range(0, len(doc_list), chunksize)]
+            for results, stats in imap_jobs(_parse_chunk, tasks, jobs=jobs, executor=executor,
+                                            desc=desc + f" ({chunksize} per chunk)" if desc is not None else None):
+                self._add_worker_stats(stats)
+                yield from results
+        else:
+            parse = functools.partial(getattr(self, method_name), **(method_kwargs or {}))
+            yield from imap_jobs(parse, doc_list, jobs=jobs, executor=executor, desc=desc)
+
+    def parse_single_to_nested_dict(self, doc) -> defaultdict:
+        """Parse a single xml file into a nested dictionary (see the class docstring)"""
+        return self._cached("parse_single_to_nested_dict", doc, self._parse_doc_to_nested_dict)
+
+    def _parse_doc_to_nested_dict(self, doc) -> defaultdict:
+        return self._parse_doc_to_paper(doc).to_nested_dict()
+
+    def _parse_doc_to_paper(self, doc) -> Paper:
+        if self.iterparse:
+            return self._iterparse_single_to_paper(doc)
+        root = etree.parse(doc).getroot()
+        return self._parse_single_to_paper(root)
+
+    def parse_single_to_paper(self, doc) -> Paper:
+        """Parse a single xml file into a Paper, the compact form of parse_single_to_nested_dict"""
+        if self.parse_cache is not None:
+            # the cache stores the nested dict
+            return Paper.from_nested_dict(self.parse_single_to_nested_dict(doc))
+        return self._parse_doc_to_paper(doc)
+
+    def iter_multiple_to_papers(self, shard: Optional[Shard] = None, jobs: int = 1,
+                                executor: str = "serial") -> Iterator[Paper]:
+        """same as iter_multiple_to_nested_dict, but yield a Paper at a time"""
+        doc_list = self.docs_in_shard(shard)
+        yield from profile_iter("parse", self._parse_multiple("parse_single_to_paper", doc_list, jobs, executor),
+                                items=len(doc_list))
+        logger.info(f"section labels: {self.section_taxonomy.stats()}")
+
+    def parse_multiple_to_papers(self, shard: Optional[Shard] = None, jobs: int = 1,
+                                 executor: str = "serial") -> List[Paper]:
+        """use self.doc_list to parse them into a list of Papers, which takes much less memory than
+        parse_multiple_to_nested_dict for a whole corpus (Paper.to_nested_dict gives the dict of a paper)"""
+        return list(self.iter_multiple_to_papers(shard=shard, jobs=jobs, executor=executor))
+
+    def _iter_multiple(self, method_name: str, shard: Optional[Shard], jobs: int, executor: str,
+                       desc: str = None) -> Iterator[Tuple[str, object]]:
+        # yield the (key, value) pairs of each parsed paper as soon as it is parsed, in the order of doc_list
+        doc_list = self.docs_in_shard(shard)
+        for label_dict in profile_iter("parse", self._parse_multiple(method_name, doc_list, jobs, executor, desc=desc),
+                                       items=len(doc_list)):
+            yield from label_dict.items()
+        if self.parse_cache is not None:
+            logger.info(f"parse cache: {self.parse_cache.hits} reused, {self.parse_cache.misses} parsed")
+
+    def iter_multiple_to_nested_dict(self, shard: Optional[Shard] = None, jobs: int = 1,
+                                     executor: str = "serial") -> Iterator[Tuple[str, defaultdict]]:
+        """same as parse_multiple_to_nested_dict, but yield (EID, nested dict) one paper at a time"""
+        yield from self._iter_multiple("parse_single_to_nested_dict", shard, jobs, executor)
+        logger.info(f"section labels: {self.section_taxonomy.stats()}")
+
+    def parse_multiple_to_nested_dict(self, shard: Optional[Shard] = None, jobs: int = 1,
+                                      executor: str = "serial") -> defaultdict:
         """use self.doc_list to parse them into JSON
+
+        Args:
+            shard (Optional[Shard]): (i, N) to only parse shard i of N. Defaults to all files.
+            jobs (int): number of workers. Defaults to 1.
+            executor (str): "serial", "thread", or "process". Defaults to "serial".
         """
         # final dictionary
         label_dict_joined = defaultdict(str)
-        
-        for doc in self.doc_list:
-            root = etree.parse(doc).getroot()
-            label_dict = self._parse_single_to_nested_dict(root)
-            # check the length of the dictionary
-            if len(label_dict) > 0:
-                label_dict_joined.update(label_dict)
-            
+        label_dict_joined.update(self.iter_multiple_to_nested_dict(shard=shard, jobs=jobs, executor=executor))
         return label_dict_joined
     
+    def _header_text(self, doi: str, title: str, keywords: list, abstract: str, data_availability: str) -> str:
+        return "DOI: " + doi + "\n\n" + "Title: " + title + "\n\n" + "Keywords: " + ", ".join(keywords) +\
+            "\n\n" + "Abstract: " + abstract + "\n\n" + "Data availability: " + data_availability + "\n\n" + "Paper content:\n"
+
+    def _append_content(self, content: lxml.etree._Element, ns: dict, state: dict, parts: list) -> None:
+        """append the text chunks of a ce:section-title, ce:para or ce:label of the body to parts
+
+        The paper text is joined from parts once at the end, which takes linear time
+        instead of growing one string chunk by chunk.
+
+        Args:
+            content (lxml.etree._Element): the element
+            ns (dict): namespaces of the document
+            state (dict): section title flags and titles, carried over from the previous contents
+                (see _new_content_state). If it has "spans", the section label of the chunks is tracked there
+                for _section_index.
+            parts (list): buffer of "title: text\n\n" chunks
+        """
+        # check the label of the content
+        if content.tag == f'{{{ns["ce"]}}}label':
+            # if the label can be an integer, then set a section title flag
+            if content.text.isdigit():
+                state["section_title_flag"] = True  
+            # if the label can be a float, then set a subsection title flag
+            elif is_float(content.text):
+                state["sub_section_title_flag"] = True
+            # finally skip
+            return
+
+        # if the content is a section title, then store it as title and skip
+        if content.tag == f'{{{ns["ce"]}}}section-title':
+            if state["section_title_flag"]:
+                state["section_title_flag"] = False
+                state["section_title"] = self._clean_element_text(content)
+                if "spans" in state:
+                    state["section_label"] = state["label"] = self.section_taxonomy.categorize(
+                        state["section_title"], count=False)
+                return
+            elif state["sub_section_title_flag"]:
+                state["sub_section_title_flag"] = False
+                state["sub_section_title"] = self._clean_element_text(content)
+                if "spans" in state:
+                    # as in _section_leaves, subsections with "result" in their titles are results
+                    state["label"] = "Results" if "result" in state["sub_section_title"] else state["section_label"]
+                return
+        if state["sub_section_title"] != "":
+            title = state["section_title"] + ": " + state["sub_section_title"]
+        else:
+            title = state["section_title"]
+        # get content and store it to text
+        _text_temp = self._clean_element_text(content)
+        # split the text into chunks and add the title to each chunk
+        prefix = title + ": "
+        if "spans" in state and (not state["spans"] or state["spans"][-1][0] != state["label"]):
+            state["spans"].append((state["label"], len(parts)))
+        for _text_chunk in self._split_text(_text_temp):
+            parts.append(prefix)
+            parts.append(_text_chunk)
+            parts.append("\n\n")
+
+    def _new_content_state(self, section_index: bool = False) -> dict:
+        # set section title flag and subsection title flag, and initialize section title and subsection title
+        state = {"section_title_flag": False, "sub_section_title_flag": False, "section_title": "", "sub_section_title": ""}
+        if section_index:
+            # text before the first numbered section title has the label of an empty title
+            state["section_label"] = state["label"] = self.section_taxonomy.categorize("", count=False)
+            state["spans"] = []
+        return state
+
+    def _write_unavailable_paper(self, title: str, doi: str) -> None:
+        # append title, doi, and an empty link, with the appends of the download stage
+        append_unavailable_paper(self.unavailable_papers_csv_path, title, doi, None)
+
     def _parse_single_to_simple_dict(self, doc_xml_root: lxml.etree._Element) -> defaultdict:
         """Parse xml file and return a simple dictionary containing the paper content
 
@@ -166,93 +641,97 @@ class Parser:
         # get a title
         title = coredata.find("dc:title", namespaces={"dc":ns["dc"]}).text
 
-        # get keywords
-        head = doc_xml_root.xpath(f"//*[translate(name(), 'FULLTEXTR', 'fulltextr')='head']")[0]
-        keywords = [re.sub(" +", " ", etree.tostring(keyword, method="text", encoding="unicode").replace("\n", " ")).strip() for keyword in head.xpath(".//ce:keyword", namespaces={"ce": ns["ce"]})]
-        
-        # get abstract
-        abstract = re.sub(" +", " ", "".join(head.xpath(".//ce:abstract//ce:simple-para/text()", namespaces={"ce":ns["ce"]}))).replace("\n", " ").strip()
-
-        # get data availability
-        data_availability = re.sub(" +", " ", "".join(head.xpath(".//ce:data-availability//ce:para/text()", namespaces={"ce":ns["ce"]}))).replace("\n", " ").strip() 
-        if data_availability == "":
-            data_availability = "Not mentioned"
+        # get keywords, abstract and data availability
+        head = _find_head_or_body(doc_xml_root, "head")[0]
+        keywords, abstract, data_availability = self._parse_head(head, ns)
             
         # find sections
-        body = doc_xml_root.xpath(f"//*[translate(name(), 'FULLTEXTR', 'fulltextr')='body']")
+        body = _find_head_or_body(doc_xml_root, "body")
         # if there is no body, then return an empty dictionary
         if len(body) == 0:
-            # open file and append doi to the end of the file in the first column
-            with open(self.unavailable_papers_csv_path, "a") as file:
-                # append title, doi, and empty strong to the end of the file in the first, second, and third column
-                # make sure to escape commas in the title
-                file.write(f"{title.replace(',', '')},{doi},\n")
+            self._write_unavailable_paper(title, doi)
             return label_dict
 
         section_element_root = body[0].find("ce:sections", namespaces = {"ce":ns["ce"]}).findall("ce:section", namespaces={"ce": ns["ce"]})  
         content_list = body[0].xpath(".//ce:section-title|.//ce:para|.//ce:label", namespaces={"ce": ns["ce"]})
-        # store all the text content to text
-        text = "DOI: " + doi + "\n\n" + "Title: " + title + "\n\n" + "Keywords: " + ", ".join(keywords) +\
-            "\n\n" + "Abstract: " + abstract + "\n\n" + "Data availability: " + data_availability + "\n\n" + "Paper content:\n"    
-        # set section title flag and subsection title flag
-        section_title_flag = False
-        sub_section_title_flag = False
-        # initialize section title and subsection title
-        section_title = ""
-        sub_section_title = "" 
+        # collect all the text content in parts and join it once
+        parts = [self._header_text(doi, title, keywords, abstract, data_availability)]
+        state = self._new_content_state()
         for content in content_list:
-            # check the label of the content
-            if content.tag == f'{{{ns["ce"]}}}label':
-                # if the label can be an integer, then set a section title flag
-                if content.text.isdigit():
-                    section_title_flag = True  
-                # if the label can be a float, then set a subsection title flag
-                elif is_float(content.text):
-                    sub_section_title_flag = True
-                # finally skip
-                continue
+            self._append_content(content, ns, state, parts)
+        label_dict[doi] = "".join(parts).strip()
+        return label_dict
 
-            # if the content is a section title, then store it as title and skip
-            if content.tag == f'{{{ns["ce"]}}}section-title':
-                if section_title_flag:
-                    section_title_flag = False
-                    section_title = re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(content, method="text", encoding="unicode").\
-                        replace("\n", " "))).replace(" .", ".").strip()
-                    continue
-                elif sub_section_title_flag:
-                    sub_section_title_flag = False
-                    sub_section_title = re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(content, method="text", encoding="unicode").\
-                        replace("\n", " "))).replace(" .", ".").strip()
-                    continue
-            if sub_section_title != "":
-                title = section_title + ": " + sub_section_title
-            else:
-                title = section_title
-            # get content and store it to text
-            _text_temp = re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(content, method="text", encoding="unicode").\
-                replace("\n", " "))).replace(" .", ".").strip() 
-            # split the text into chunks and add the title to each chunk when saving to a list
-            _text_temp_chunk_list = self._split_text(_text_temp)
-            _text_temp_chunk_list = [title + ": " + _text_chunk + "\n\n" for _text_chunk in _text_temp_chunk_list]
-            for _text_chunk in _text_temp_chunk_list:
-                text += _text_chunk 
-            # else:
-            #     text += re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(content, method="text", encoding="unicode").\
-            #         replace("\n", " "))).replace(" .", ".").strip() + " " 
-        label_dict[doi] = text.strip()
+    def _iterparse_single_to_simple_dict(self, doc) -> defaultdict:
+        """same as _parse_single_to_simple_dict, but streams doc with _iterparse_document"""
+        label_dict = defaultdict(str)
+        head_fields = None
+        parts = None
+        has_sections = False
+        state = self._new_content_state()
+        for kind, element in self._iterparse_document(doc, _is_body_content):
+            if kind == "root":
+                ns = element.nsmap
+            elif kind == "coredata":
+                doi = element.find("prism:doi", namespaces={"prism":ns["prism"]}).text
+                title = element.find("dc:title", namespaces={"dc":ns["dc"]}).text
+            elif kind == "head":
+                head_fields = self._parse_head(element, ns)
+            elif kind == "body":
+                parts = []
+            elif kind == "sections":
+                has_sections = True
+            elif kind == "capture":
+                self._append_content(element, ns, state, parts)
+        if head_fields is None:
+            raise IndexError(f"{doc} has no head")
+        # if there is no body, then return an empty dictionary
+        if parts is None:
+            self._write_unavailable_paper(title, doi)
+            return label_dict
+        if not has_sections:
+            raise AttributeError(f"{doc} has no ce:sections in its body")
+        label_dict[doi] = (self._header_text(doi, title, *head_fields) + "".join(parts)).strip()
         return label_dict
 
-    def parse_multiple_to_simple_dict(self) -> defaultdict:
+    def parse_single_to_simple_dict(self, doc) -> defaultdict:
+        """Parse a single xml file into a simple dictionary {DOI: paper content}
+
+        Args:
+            doc (str or Path): path to the xml file
+
+        Returns:
+            defaultdict: empty if the paper has no body
+        """
+        return self._cached("parse_single_to_simple_dict", doc, self._parse_doc_to_simple_dict)
+
+    def _parse_doc_to_simple_dict(self, doc) -> defaultdict:
+        if self.iterparse:
+            return self._iterparse_single_to_simple_dict(doc)
+        root = etree.parse(doc).getroot()
+        return self._parse_single_to_simple_dict(root)
+
+    def iter_multiple_to_simple_dict(self, jobs: int = 1, executor: str = "serial",
+                                     shard: Optional[Shard] = None) -> Iterator[Tuple[str, str]]:
+        """same as parse_multiple_to_simple_dict, but yield (DOI, paper content) one paper at a time
+
+        Papers without a body are skipped. Only the papers being parsed are held in memory, so the output can
+        be written (e.g. with save_papers or src.pipeline.sinks) or consumed while the rest is still parsed.
+        """
+        yield from self._iter_multiple("parse_single_to_simple_dict", shard, jobs, executor, desc="Parsing papers")
+
+    def parse_multiple_to_simple_dict(self, jobs: int = 1, executor: str = "serial",
+                                      shard: Optional[Shard] = None) -> defaultdict:
         """use self.doc_list to parse them into JSON
+
+        Args:
+            jobs (int): number of workers. Defaults to 1.
+            executor (str): "serial", "thread", or "process". Defaults to "serial".
+            shard (Optional[Shard]): (i, N) to only parse shard i of N. Defaults to all files.
         """
         # final dictionary
         label_dict_joined = defaultdict(str)
-        
-        for doc in tqdm(self.doc_list, desc="Parsing papers"):
-            root = etree.parse(doc).getroot()
-            label_dict = self._parse_single_to_simple_dict(root)
-            label_dict_joined.update(label_dict)
-            
+        label_dict_joined.update(self.iter_multiple_to_simple_dict(jobs=jobs, executor=executor, shard=shard))
         return label_dict_joined
     
     
@@ -268,18 +747,161 @@ class Parser:
         eid = coredata.find("eid", namespaces={None:ns[None]}).text
         # get abstract
         abstract_root = doc_xml_root.xpath(".//dc:description", namespaces={"dc": ns["dc"]})[0].xpath(".//ce:para", namespaces={"ce": ns["ce"]})[0]
-        abstract_text = re.sub(r'\[.*?\]', '', re.sub(" +", " ", etree.tostring(abstract_root, method="text", encoding="unicode").\
-                replace("\n", " "))).replace(" .", ".").strip() 
+        abstract_text = self._clean_element_text(abstract_root)
         label_dict[eid] = abstract_text
         return label_dict
 
-    def parse_multiple_abstract(self):
+    def parse_single_abstract(self, doc) -> defaultdict:
+        """Parse the abstract of a single xml file into {EID: abstract}"""
+        return self._cached("parse_single_abstract", doc, self._parse_doc_abstract)
+
+    def _parse_doc_abstract(self, doc) -> defaultdict:
+        root = etree.parse(doc).getroot()
+        return self._parse_single_abstract_to_simple_dict(root)
+
+    def iter_multiple_abstract(self, shard: Optional[Shard] = None, jobs: int = 1,
+                               executor: str = "serial") -> Iterator[Tuple[str, str]]:
+        """same as parse_multiple_abstract, but yield (EID, abstract) one paper at a time"""
+        yield from self._iter_multiple("parse_single_abstract", shard, jobs, executor, desc="Parsing abstracts")
+
+    def parse_multiple_abstract(self, shard: Optional[Shard] = None, jobs: int = 1, executor: str = "serial"):
          # final dictionary
         label_dict_joined = defaultdict(str)
-        
-        for doc in tqdm(self.doc_list, desc="Parsing abstracts"):
+        label_dict_joined.update(self.iter_multiple_abstract(shard=shard, jobs=jobs, executor=executor))
+        return label_dict_joined
+
+    def _parse_single_to_views(self, doc_xml_root: lxml.etree._Element, views: Iterable[str]) -> dict:
+        """make the views of a single xml object, reading the coredata, head and body only once
+
+        Each view is what the method in VIEWS returns, except that "nested" is empty instead of an error for
+        papers without a body. "metadata" is {DOI: {doi, eid, title, keywords, abstract, data_availability,
+        has_body}}. "section_index" is {DOI: [[label, start, end], ...]}, the character spans of the "simple"
+        text by section label (see parse_single_section_index).
+        """
+        results = {}
+        ns = doc_xml_root.nsmap
+        coredata = doc_xml_root.find("coredata", namespaces={None:ns[None]})
+        doi = coredata.find("prism:doi", namespaces={"prism":ns["prism"]}).text
+        title = coredata.find("dc:title", namespaces={"dc":ns["dc"]}).text
+        head = _find_head_or_body(doc_xml_root, "head")[0]
+        keywords, abstract, data_availability = self._parse_head(head, ns)
+        body = _find_head_or_body(doc_xml_root, "body")
+        if len(body) > 0:
+            # the same errors as the other parse methods for a body without ce:sections
+            section_element_root = body[0].find("ce:sections", namespaces = {"ce":ns["ce"]}).findall("ce:section", namespaces={"ce": ns["ce"]})
+
+        if "nested" in views:
+            nested_dict = create_nested_defaultdict()
+            if len(body) > 0:
+                # the EID lookup of _parse_single_to_paper
+                eid = _find_eid(coredata, ns).text
+                sections = []
+                for section in section_element_root:
+                    sections.extend(self._section_leaves(section, ns))
+                nested_dict = Paper(eid, title, keywords, abstract, sections).to_nested_dict()
+            results["nested"] = nested_dict
+
+        if "simple" in views or "section_index" in views:
+            simple_dict = defaultdict(str)
+            index_dict = defaultdict(list)
+            if len(body) == 0:
+                if "simple" in views:
+                    self._write_unavailable_paper(title, doi)
+            else:
+                header = self._header_text(doi, title, keywords, abstract, data_availability)
+                parts = []
+                state = self._new_content_state(section_index="section_index" in views)
+                for content in body[0].xpath(".//ce:section-title|.//ce:para|.//ce:label", namespaces={"ce": ns["ce"]}):
+                    self._append_content(content, ns, state, parts)
+                simple_dict[doi] = (header + "".join(parts)).strip()
+                if "section_index" in views:
+                    index_dict[doi] = _section_index(header, parts, state["spans"], len(simple_dict[doi]))
+            if "simple" in views:
+                results["simple"] = simple_dict
+            if "section_index" in views:
+                results["section_index"] = index_dict
+
+        if "abstract" in views:
+            results["abstract"] = self._parse_single_abstract_to_simple_dict(doc_xml_root)
+
+        if "metadata" in views:
+            eid = coredata.find("eid", namespaces={None:ns[None]})
+            results["metadata"] = {doi: {"doi": doi, "eid": eid.text if eid is not None else None, "title": title,
+                                         "keywords": keywords, "abstract": abstract,
+                                         "data_availability": data_availability, "has_body": len(body) > 0}}
+        return results
+
+    def parse_single_views(self, doc, views: Iterable[str] = tuple(VIEWS)) -> Dict[str, dict]:
+        """Parse a single xml file once into several views
+
+        Args:
+            doc (str or Path): path to the xml file
+            views (Iterable[str]): any of "nested", "simple", "abstract", "metadata" and "section_index" (see VIEWS).
+                Defaults to all.
+
+        Returns:
+            Dict[str, dict]: {view: output}, with the same outputs as parse_single_to_nested_dict,
+                parse_single_to_simple_dict and parse_single_abstract, and the metadata as
+                {DOI: {doi, eid, title, keywords, abstract, data_availability, has_body}}.
+                The file is loaded whole, also with iterparse=True. Views found in self.parse_cache are not
+                made again, and the file is not parsed at all if all of them are.
+        """
+        views = list(views)
+        unknown = [view for view in views if view not in VIEWS]
+        if unknown:
+            raise ValueError(f"views must be in {list(VIEWS)}, got {unknown}")
+        results = {}
+        keys = {}
+        if self.parse_cache is not None:
+            content_hash = self.parse_cache.content_hash(doc)
+            for view in views:
+                keys[view] = self.parse_cache.key(doc, VIEWS[view], self._cache_params(VIEWS[view]),
+                                                  content_hash=content_hash)
+                cached = self.parse_cache.get(keys[view])
+                if cached is not None:
+                    results[view] = _restore_cached(VIEWS[view], cached)
+        missing = [view for view in views if view not in results]
+        if missing:
             root = etree.parse(doc).getroot()
-            label_dict = self._parse_single_abstract_to_simple_dict(root)
-            label_dict_joined.update(label_dict)
-            
-        return label_dict_joined
\ No newline at end of file
+            for view, label_dict in self._parse_single_to_views(root, missing).items():
+                # as in _cached, papers without a body are not stored
+                if self.parse_cache is not None and len(label_dict) > 0:
+                    self.parse_cache.put(keys[view], label_dict)
+                results[view] = label_dict
+        return {view: results[view] for view in views}
+
+    def parse_single_section_index(self, doc) -> defaultdict:
+        """Parse a single xml file into {DOI: [[label, start, end], ...]}, the character spans of the paper text of
+        parse_single_to_simple_dict by section label, in document order
+
+        The labels are those of _categorize_section (e.g. "Introduction", "Methodology", "Results", "Others"),
+        with subsections with "result" in their titles as "Results" like in the nested dict. The first span,
+        HEADER_LABEL, covers the DOI, title, keywords, abstract and data availability. text[start:end] of
+        the spans of a label is the part of the paper with that label. Empty if the paper has no body.
+        Use parse_single_views(doc, ["simple", "section_index"]) to get the text and its index in one pass.
+        """
+        return self.parse_single_views(doc, ["section_index"])["section_index"]
+
+    def iter_multiple_views(self, views: Iterable[str] = tuple(VIEWS), shard: Optional[Shard] = None, jobs: int = 1,
+                            executor: str = "serial") -> Iterator[Dict[str, dict]]:
+        """apply parse_single_views to self.doc_list and yield {view: output} one paper at a time"""
+        doc_list = self.docs_in_shard(shard)
+        yield from profile_iter("parse", self._parse_multiple("parse_single_views", doc_list, jobs, executor,
+                                                              desc="Parsing papers",
+                                                              method_kwargs={"views": list(views)}),
+                                items=len(doc_list))
+
+    def parse_multiple_views(self, views: Iterable[str] = tuple(VIEWS), shard: Optional[Shard] = None, jobs: int = 1,
+                             executor: str = "serial") -> Dict[str, defaultdict]:
+        """use self.doc_list to make several views of every paper, parsing each file once
+
+        Returns:
+            Dict[str, defaultdict]: {view: the output of the view for all papers}, e.g. "simple" is the same as
+                parse_multiple_to_simple_dict()
+        """
+        views = list(views)
+        label_dicts_joined = {view: defaultdict(str) for view in views}
+        for results in self.iter_multiple_views(views, shard=shard, jobs=jobs, executor=executor):
+            for view, label_dict in results.items():
+                label_dicts_joined[view].update(label_dict)
+        return label_dicts_joined
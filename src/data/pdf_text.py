@@ -0,0 +1,362 @@
+import io
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.data.parse_cache import ParseCache
+from src.data.util.log_util import get_logger
+from src.pipeline.executor import imap_jobs_fed
+from src.pipeline.profiling import profile_stage
+
+logger = get_logger(__name__)
+
+# bump when a change to the extraction changes its text, so that cached texts are not reused
+EXTRACTOR_VERSION = 2
+# what to run OCR on: the pages whose text is not readable, the whole document if its text is not readable
+# (ocrmypdf with force_ocr on every page, as before per-page OCR), or nothing
+OCR_MODES = ["pages", "document", "none"]
+
+
+def is_text_readable(text, threshold=0.5):
+    """
+    Analyze the text to determine if it's meaningfully readable.
+    Returns True if the text is deemed readable, False otherwise.
+    """
+    # Calculate the proportion of printable to total characters
+    printable_chars = re.sub(r'[^\x20-\x7E]+', '', text)
+    if len(text) == 0: return False
+    readability_ratio = len(printable_chars) / len(text)
+    return readability_ratio > threshold
+
+
+def _import_fitz():
+    # PyMuPDF is slow to import, so it is imported by the functions that open PDFs
+    import fitz
+    # Ensure the version of PyMuPDF is adequate for OCR
+    if tuple(map(int, fitz.VersionBind.split("."))) < (1, 19, 1):
+        raise ValueError("Need at least v1.19.1 of PyMuPDF for OCR support")
+    return fitz
+
+
+def page_count(file_path: Union[str, Path]) -> int:
+    with _import_fitz().open(str(file_path)) as doc:
+        return doc.page_count
+
+
+def extract_page_texts(file_path: Union[str, Path], start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """text of each page from start to stop (excluded, None for the last page) of a PDF, extracted by PyMuPDF"""
+    with _import_fitz().open(str(file_path)) as doc:
+        return [doc[number].get_text() for number in range(start, doc.page_count if stop is None else stop)]
+
+
+def extract_pages(file_path: Union[str, Path], start: int = 0, stop: Optional[int] = None) -> str:
+    """text of pages start to stop (excluded, None for the last page) of a PDF, extracted by PyMuPDF"""
+    return "".join(extract_page_texts(file_path, start, stop))
+
+
+def scanned_pages(file_path: Union[str, Path], page_numbers: List[int], min_coverage: float = 0.5) -> List[int]:
+    """those of page_numbers of a PDF that have images covering at least min_coverage of the page, like a scan"""
+    fitz = _import_fitz()
+    numbers = []
+    with fitz.open(str(file_path)) as doc:
+        for number in page_numbers:
+            page = doc[number]
+            covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+            if covered >= min_coverage * abs(page.rect):
+                numbers.append(number)
+    return numbers
+
+
+def unreadable_pages(page_texts: List[str], file_path: Optional[Union[str, Path]] = None) -> List[int]:
+    """numbers of the pages whose text is not readable (scanned pages have none), which need OCR
+
+    A page without any text is also a blank page or a figure of a native PDF, which OCR gets nothing from. With
+    the file_path of the PDF, such a page is only returned if it looks like a scan (see scanned_pages).
+    """
+    numbers = [number for number, text in enumerate(page_texts) if not is_text_readable(text)]
+    empty = [number for number in numbers if not page_texts[number].strip()]
+    if file_path is None or not empty:
+        return numbers
+    skipped = set(empty) - set(scanned_pages(file_path, empty))
+    return [number for number in numbers if number not in skipped]
+
+
+def ocr_pages(file_path: Union[str, Path], page_numbers: List[int]) -> Dict[int, str]:
+    """{page number: text} of page_numbers of a PDF after running OCR on them only with ocrmypdf
+
+    The pages are copied into a PDF of their own, so ocrmypdf does not rasterize the pages that have a text layer.
+    """
+    import ocrmypdf
+    fitz = _import_fitz()
+    with profile_stage("ocr", items=len(page_numbers)):
+        with fitz.open(str(file_path)) as doc, fitz.open() as subset:
+            for number in page_numbers:
+                subset.insert_pdf(doc, from_page=number, to_page=number)
+            source = io.BytesIO(subset.tobytes())
+        ocrpdf = io.BytesIO()
+        ocrmypdf.ocr(source, ocrpdf, force_ocr=True, output_type="pdf")
+        with fitz.open("pdf", ocrpdf) as doc:
+            return dict(zip(page_numbers, (page.get_text() for page in doc)))
+
+
+def ocr_text(file_path: Union[str, Path]) -> str:
+    """text of a PDF after running OCR on every page with ocrmypdf"""
+    import ocrmypdf
+    fitz = _import_fitz()
+    with profile_stage("ocr", items=1):
+        ocrpdf = io.BytesIO()  # Prepare buffer for OCR-ed PDF
+        ocrmypdf.ocr(str(file_path), ocrpdf, force_ocr=True, output_type="pdf")
+        with fitz.open("pdf", ocrpdf) as doc:
+            return "".join(page.get_text() for page in doc)
+
+
+def _extract_task(task: Tuple[str, int, Optional[int], bool]) -> tuple:
+    # module-level so that process workers can run it. Errors are sent back to be raised for their file only
+    try:
+        return extract_page_texts(*task[:3]), None
+    except Exception as e:
+        return None, e
+
+
+class PdfTextExtractor:
+    """Extract the text of PDFs with a pool of workers, across files and across the pages of long files.
+
+    Extracting text is CPU-bound, so the default "process" executor runs it in parallel despite the GIL. Each file
+    is a task, and a file of more than pages_per_task pages is split into tasks of pages_per_task pages, so that a
+    single long PDF keeps several workers busy. The text is the same as extracting the pages one by one.
+
+    Pages whose text is not readable (scanned pages, broken text layers) are run through OCR in the calling process,
+    and their OCR text replaces theirs in page order. OCR is the most expensive step, so only those pages are
+    rasterized and recognized, not the pages of the same file that have a good text layer, nor the blank and
+    figure-only pages without a scan.
+
+    With an extraction_cache, the text of each PDF (after OCR) is stored under the sha256 of the file together with
+    EXTRACTOR_VERSION, the PyMuPDF version and the ocr mode, and a PDF seen before is not opened again. Asking new
+    questions about the same papers then costs no PDF processing.
+
+    Args:
+        jobs (int): number of workers. Defaults to 1.
+        executor (str): "serial", "thread", or "process". Defaults to "process".
+        pages_per_task (int): pages of a file extracted by one task. Defaults to 50.
+        ocr (str): one of OCR_MODES. "pages" runs OCR on the unreadable pages, "document" on every page of a file
+            whose whole text is not readable. Defaults to "pages".
+        extraction_cache (ParseCache or path): reuse the texts of PDFs extracted before, if their content and the
+            extraction are unchanged, from this cache (or a ParseCache in this folder). Defaults to no cache.
+    """
+
+    def __init__(self, jobs: int = 1, executor: str = "process", pages_per_task: int = 50,
+                 ocr: str = "pages", extraction_cache: Optional[Union[ParseCache, str, Path]] = None) -> None:
+        if ocr not in OCR_MODES:
+            raise ValueError(f"ocr must be one of {OCR_MODES}")
+        self.jobs = jobs
+        self.executor = executor
+        self.pages_per_task = pages_per_task
+        self.ocr = ocr
+        if extraction_cache is not None and not isinstance(extraction_cache, ParseCache):
+            extraction_cache = ParseCache(extraction_cache)
+        self.extraction_cache = extraction_cache
+
+    def _cache_params(self) -> dict:
+        # settings that change the text, part of the cache key. The pages per task and workers do not
+        return {"version": EXTRACTOR_VERSION, "pymupdf": _import_fitz().VersionBind, "ocr": self.ocr}
+
+    def _tasks(self, file_path: str) -> List[Tuple[str, int, Optional[int], bool]]:
+        # (file_path, start, stop, last task of the file)
+        if self.jobs <= 1:
+            return [(file_path, 0, None, True)]
+        try:
+            pages = page_count(file_path)
+        except Exception:
+            # the extraction of the whole file raises the error of the file when its turn comes
+            return [(file_path, 0, None, True)]
+        if pages <= self.pages_per_task:
+            return [(file_path, 0, None, True)]
+        return [(file_path, start, min(start + self.pages_per_task, pages), start + self.pages_per_task >= pages)
+                for start in range(0, pages, self.pages_per_task)]
+
+    def _finish(self, file_path: str, page_texts: List[str]) -> Tuple[str, List[int]]:
+        """the text of the file and the numbers of its pages that went through OCR"""
+        text = "".join(page_texts)
+        if self.ocr == "document":
+            # Check if the extracted text is readable
+            if is_text_readable(text):
+                return text, []
+            return ocr_text(file_path), list(range(len(page_texts)))
+        page_numbers = unreadable_pages(page_texts, file_path) if self.ocr == "pages" else []
+        if not page_numbers:
+            return text, []
+        logger.info(f"OCR of {len(page_numbers)} of {len(page_texts)} pages of {file_path}")
+        page_texts = list(page_texts)
+        for number, page_text in ocr_pages(file_path, page_numbers).items():
+            page_texts[number] = page_text
+        return "".join(page_texts), page_numbers
+
+    def extract(self, file_path: Union[str, Path]) -> str:
+        """text of one PDF"""
+        return next(self.iter_extract([file_path]))[1]
+
+    def _iter_tasks(self, file_paths: Iterable[Union[str, Path]], keys: dict,
+                    cached: dict) -> Iterator[Tuple[str, Optional[int], Optional[int], bool]]:
+        # the tasks of each file, read from file_paths as the workers take them. A file found in the extraction
+        # cache gets a single task without pages, which is not sent to the workers
+        params = self._cache_params() if self.extraction_cache is not None else None
+        for file_path in file_paths:
+            file_path = str(file_path)
+            if self.extraction_cache is not None:
+                try:
+                    keys[file_path] = self.extraction_cache.key(file_path, "extract_text", params)
+                except OSError:
+                    pass  # the extraction raises the error of the file
+                result = self.extraction_cache.get(keys[file_path]) if file_path in keys else None
+                if result is not None:
+                    cached[file_path] = result["text"]
+                    yield file_path, None, None, True
+                    continue
+            yield from self._tasks(file_path)
+
+    def iter_extract(self, file_paths: Iterable[Union[str, Path]],
+                     skip_errors: bool = False) -> Iterator[Tuple[str, Optional[str]]]:
+        """yield (file_path, text) of every PDF of file_paths, in their order
+
+        file_paths is read as the workers take the files, so it may be a generator that waits, e.g. to bound the
+        files extracted ahead. Raises the error of a file when its turn comes, like extracting the files one after
+        another. With skip_errors, the error is logged instead, the text of that file is None and the next files
+        are extracted.
+        """
+        keys = {}
+        cached = {}
+        if self.extraction_cache is not None:
+            self.extraction_cache.reset_counts()
+        parts = []
+        error = None
+        # only the PDFs that are not in the cache are sent to the workers
+        results = imap_jobs_fed(_extract_task, self._iter_tasks(file_paths, keys, cached), jobs=self.jobs,
+                                executor=self.executor, skip=lambda task: task[1] is None)
+        try:
+            for (file_path, _, _, last), result in results:
+                if result is None:
+                    yield file_path, cached.pop(file_path)
+                    continue
+                page_texts, task_error = result
+                error = error or task_error
+                parts.extend(page_texts or [])
+                # the tasks of a file are consecutive
+                if not last:
+                    continue
+                page_texts, parts, file_error, error = parts, [], error, None
+                try:
+                    if file_error is not None:
+                        raise file_error
+                    text, ocr_page_numbers = self._finish(file_path, page_texts)
+                except Exception as e:
+                    if not skip_errors:
+                        raise
+                    logger.error(f"PDF text extraction of {file_path} failed: {e}")
+                    yield file_path, None
+                    continue
+                if file_path in keys:
+                    self.extraction_cache.put(keys[file_path], {"text": text, "ocr_pages": ocr_page_numbers})
+                yield file_path, text
+        finally:
+            results.close()
+        if self.extraction_cache is not None:
+            logger.info(f"PDF text cache: {self.extraction_cache.hits} reused, {self.extraction_cache.misses} "
+                        f"extracted")
+
+
+class PdfTextCache:
+    """Text of PDFs extracted ahead of the stage that reads them.
+
+    prefetch starts a background thread that runs a PdfTextExtractor over the files and stores each text as soon
+    as it is extracted. get waits for the text of a file that is still being extracted, and hands it over (the
+    text is removed from the cache, since each paper is read once). This way the LLM requests of the Q&A stage
+    are sent while the next PDFs are extracted, instead of waiting for each extraction in turn.
+
+    At most max_ahead files are extracted or waiting to be read at a time, so memory does not grow with the
+    number of papers: a file is sent to the workers once it gets one of max_ahead slots, which get gives back.
+    A file that cannot be extracted is logged and skipped, get returns None for it, and the next files are still
+    prefetched. close stops the prefetch, e.g. when the stage reading the texts fails.
+
+    Args:
+        extractor (PdfTextExtractor): extractor run by prefetch
+        max_ahead (int): files extracted ahead of get. Defaults to twice the workers of extractor.
+    """
+
+    def __init__(self, extractor: Optional[PdfTextExtractor] = None, max_ahead: Optional[int] = None) -> None:
+        self.extractor = extractor if extractor is not None else PdfTextExtractor()
+        self.max_ahead = max_ahead if max_ahead is not None else 2 * max(self.extractor.jobs, 1)
+        self._texts: Dict[str, str] = {}
+        self._pending = set()
+        # the files holding one of the max_ahead slots, from their submission until get
+        self._slots = threading.Semaphore(self.max_ahead)
+        self._held = set()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def prefetch(self, file_paths: Iterable[Union[str, Path]]) -> None:
+        """extract the text of file_paths in a background thread"""
+        file_paths = [str(file_path) for file_path in file_paths]
+        with self._condition:
+            self._pending.update(file_paths)
+        self._thread = threading.Thread(target=self._run, args=(file_paths,), name="pdf-prefetch", daemon=True)
+        self._thread.start()
+
+    def _acquire_slots(self, file_paths: List[str]) -> Iterator[str]:
+        # file_paths, each one once it has a slot
+        for file_path in file_paths:
+            self._slots.acquire()
+            with self._condition:
+                if self._closed:
+                    return
+                self._held.add(file_path)
+            yield file_path
+
+    def _run(self, file_paths: List[str]) -> None:
+        done = 0
+        with profile_stage("pdf_extraction", items=len(file_paths)):
+            texts = self.extractor.iter_extract(self._acquire_slots(file_paths), skip_errors=True)
+            try:
+                for file_path, text in texts:
+                    self._store(file_path, text)
+                    done += 1
+                    if self._closed:
+                        break
+            except Exception as e:
+                # get returns None for the files left, so their reader extracts them itself
+                logger.error(f"PDF text extraction failed after {done} of {len(file_paths)} files: {e}")
+            finally:
+                # shut the workers down now, also when closed
+                texts.close()
+        with self._condition:
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _store(self, file_path: str, text: Optional[str]) -> None:
+        with self._condition:
+            if text is not None:
+                self._texts[file_path] = text
+            self._pending.discard(file_path)
+            self._condition.notify_all()
+
+    def get(self, file_path: Union[str, Path]) -> Optional[str]:
+        """text of file_path, or None if it was not prefetched"""
+        file_path = str(file_path)
+        with self._condition:
+            self._condition.wait_for(lambda: file_path not in self._pending)
+            if file_path in self._held:
+                self._held.discard(file_path)
+                self._slots.release()
+            return self._texts.pop(file_path, None)
+
+    def close(self) -> None:
+        """stop the prefetch: the files not extracted yet are not, and the workers are shut down"""
+        with self._condition:
+            self._closed = True
+            self._texts.clear()
+        # wake the prefetch thread if it waits for a slot
+        for _ in range(self.max_ahead):
+            self._slots.release()
+        if self._thread is not None:
+            self._thread.join()
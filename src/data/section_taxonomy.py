@@ -0,0 +1,92 @@
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# (regex, label) pairs, tried in order on the lowercased section title
+DEFAULT_RULES = [
+    (r'.*intro.*|.*background.*|.*problem statement.*|.*research objective.*', 'Introduction'),
+    (r'.*review.*|.*work.*', 'Literature review'),
+    (r'(?!.*result.*)(.*method.*|.*data.*|.*experiment.*|.*model.*|.*pipeline.*|.*evaluation.*|.*design.*|.*materials.*)', 'Methodology'),
+    (r'.*result.*|.*discussion.*|.*conclusion.*|.*summary.*|.*implication.*', 'Results')
+]
+DEFAULT_LABEL = "Others"
+
+
+class SectionTaxonomy:
+    """Map section titles to labels (e.g. "2. Data and methods" -> "Methodology").
+
+    The rules are compiled into one regex with a named group per rule, and the label of every title seen is
+    memoized, so a title that comes up again (most of them do across papers) costs a dict lookup.
+    The label is the one of the first rule whose regex is found anywhere in the lowercased title, as with
+    re.search on each rule in turn, or default_label if none is.
+
+    The rules can be loaded from a JSON file with from_json:
+        {"default": "Others", "rules": [{"label": "Introduction", "pattern": ".*intro.*|.*background.*"}, ...]}
+
+    Args:
+        rules (list): (regex, label) pairs in order of priority. Defaults to DEFAULT_RULES.
+        default_label (str): label of titles that match no rule
+    """
+
+    def __init__(self, rules: Optional[List[Tuple[str, str]]] = None, default_label: str = DEFAULT_LABEL) -> None:
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.default_label = default_label
+        # each rule is a lookahead at the start of the title, so the first rule (not the leftmost match) wins
+        self._matcher = re.compile("|".join(f"(?P<rule{i}>(?=[\\s\\S]*?(?:{pattern})))"
+                                            for i, (pattern, _) in enumerate(self.rules)))
+        self._labels = {f"rule{i}": label for i, (_, label) in enumerate(self.rules)}
+        self._cache: Dict[str, str] = {}
+        self.label_counts = Counter()
+        self.cache_hits = 0
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "SectionTaxonomy":
+        """load the rules from a JSON file (see the class docstring for the format)"""
+        with open(path) as f:
+            config = json.load(f)
+        return cls([(rule["pattern"], rule["label"]) for rule in config["rules"]],
+                   default_label=config.get("default", DEFAULT_LABEL))
+
+    def _match(self, title: str) -> str:
+        match = self._matcher.match(title)
+        return self.default_label if match is None else self._labels[match.lastgroup]
+
+    def categorize(self, title: str, count: bool = True) -> str:
+        """label of a section title
+
+        Args:
+            title (str): section title
+            count (bool): False to leave label_counts and cache_hits as they are (e.g. for a second pass over the
+                same titles)
+        """
+        title = title.lower()
+        label = self._cache.get(title)
+        if label is None:
+            label = self._cache[title] = self._match(title)
+        elif count:
+            self.cache_hits += 1
+        if count:
+            self.label_counts[label] += 1
+        return label
+
+    def reset_counts(self) -> None:
+        """forget the label counts and cache hits, but keep the memoized labels"""
+        self.label_counts = Counter()
+        self.cache_hits = 0
+
+    def add_counts(self, label_counts: dict, cache_hits: int) -> None:
+        """add the counts of another taxonomy with the same rules (e.g. from a worker process)"""
+        self.label_counts.update(label_counts)
+        self.cache_hits += cache_hits
+
+    def stats(self) -> dict:
+        """number of titles categorized, share of memoized lookups, and count and share of each label"""
+        total = sum(self.label_counts.values())
+        return {
+            "titles": total,
+            "cache_hit_rate": self.cache_hits / total if total else 0.0,
+            "labels": {label: {"count": count, "rate": count / total}
+                       for label, count in self.label_counts.most_common()},
+        }
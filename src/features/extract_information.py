@@ -1,13 +1,14 @@
 import json
 import pandas as pd
 from pathlib import Path
-from geopy.geocoders import Nominatim, Photon
-import requests
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-from tqdm import tqdm
-from openai import OpenAI
+from functools import partial
 
-tqdm.pandas()
+from src.pipeline.executor import map_jobs
+from src.pipeline.profiling import profile_stage
+from src.pipeline.tables import read_table, table_path, write_table
+from .util.log_util import get_logger
+
+logger = get_logger(__name__)
 
 
 # Define a function to flatten the dictionary
@@ -22,6 +23,11 @@ def flatten_dict(d):
 
 
 def extract_location(text):
+    # geopy and requests are imported on first use, so that importing this module stays fast
+    import requests
+    from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+    from geopy.geocoders import Nominatim
+
     # remove "not mentioned", "not specified", "not applicable"
     text = text.lower()
     text = (
@@ -94,25 +100,121 @@ def clean_location_with_gpt4(text, client):
         return None
 
 
+def lat_lon_to_country(latitude, longitude, geolocator):
+    try:
+        location = geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True, language = "en")
+    except Exception:
+        try:
+            location = geolocator.reverse(
+                f"{latitude}, {longitude}", exactly_one=True
+            )
+        except Exception as e:
+            print("Got", e, " for ", latitude, longitude)
+            return None
+    if location:
+        address = location.address
+        country = address.split(",")[-1].strip()
+        return country
+    else:
+        return None
+
+
 class ExtractInformation:
+    # tables written by __call__, in output_dir
+    TABLES = [
+        "researcher_location", "paper_details", "study_summary", "built_environment_aspect", "study_area",
+        "extent_scale", "spatial_data_aggregation_unit", "image_data", "sampling_interval_distance",
+        "subjective_perception_data", "other_sensory_data", "research_type_and_method", "analysis_type",
+        "computer_vision_models", "code_availability", "data_availability", "ethical_approval",
+        "study_limitations_and_future_research", "study_area_country_clean", "researcher_location_country_clean",
+    ]
+
     def __init__(
         self,
         json_path: str,
         citation_csv_path: str,
         output_dir: str,
         openai_api_key: str = None,
+        overwrite: bool = False,
+        jobs: int = 1,
+        executor: str = "serial",
+        output_format: str = "parquet",
+        export_csv: bool = True,
     ) -> None:
         self.json_path = json_path
         self.json = self.load_json()
         self.citation_csv_path = citation_csv_path
-        self.citation_df = pd.read_csv(citation_csv_path)
+        self.citation_df = read_table(citation_csv_path)
         self.output_dir = Path(output_dir)
         self.ensure_output_dir_exists()
         self.openai_api_key = openai_api_key
-        if self.openai_api_key is not None:
-            self.client = OpenAI(api_key=self.openai_api_key)
-        else:
-            self.client = None
+        # re-run geocoding steps even if their outputs already exist
+        self.overwrite = overwrite
+        # geocoding and GPT-4 calls are network-bound, so a process pool is swapped for threads
+        self.jobs = jobs
+        if executor == "process":
+            logger.warning("geocoding and GPT-4 calls run with threads instead of processes")
+        self.executor = "thread" if executor == "process" else executor
+        # tables are written as parquet/arrow for the next stages, and as csv for the R scripts
+        self.output_format = output_format
+        self.export_csv = export_csv
+        # the OpenAI client is created on first use, see client
+        self._client = None
+        # set by update() to add rows to the existing tables instead of replacing them
+        self._append = False
+
+    @property
+    def client(self):
+        """OpenAI client of openai_api_key, or None without a key"""
+        if self._client is None and self.openai_api_key is not None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.openai_api_key)
+        return self._client
+
+    def table_path(self, name):
+        return table_path(self.output_dir / name, self.output_format)
+
+    def has_table(self, name):
+        """whether the table name was written by an earlier run
+
+        A table only found as csv (e.g. written before output_format was parquet) is converted to output_format, so
+        that its geocoding and GPT-4 calls are not run again and the next steps can read it.
+        """
+        if self.table_path(name).exists():
+            return True
+        csv_path = table_path(self.output_dir / name, "csv")
+        if not csv_path.exists():
+            return False
+        logger.info(f"Reusing {csv_path} from an earlier run as {self.table_path(name)}")
+        write_table(read_table(csv_path), self.table_path(name))
+        return True
+
+    def reuse_rows(self, df, name, on):
+        """split df into the rows already in the table name of an earlier run and the rows to compute
+
+        Rows match on the columns on, and the reused rows get the other columns of the table (e.g. "lat" and "lon"),
+        so only new or changed rows are sent to geocoding and GPT-4. With overwrite, no row is reused.
+
+        Returns:
+            tuple: (reused rows, rows to compute)
+        """
+        if self.overwrite or not self.has_table(name):
+            return df.iloc[0:0], df
+        existing_df = read_table(self.table_path(name))
+        # empty strings come back as NaN from csv tables
+        existing_df[on] = existing_df[on].fillna("")
+        existing_df = existing_df.drop_duplicates(subset=on)
+        merged = df.merge(existing_df, on=on, how="left", indicator=True)
+        reused = (merged["_merge"] == "both").to_numpy()
+        return merged[reused].drop(columns="_merge"), df[~reused]
+
+    def save_table(self, df, name):
+        if self._append and self.has_table(name):
+            # replace the rows of the updated papers and keep the others
+            existing_df = read_table(self.table_path(name))
+            existing_df = existing_df[~existing_df["filename"].isin(df["filename"])]
+            df = pd.concat([existing_df, df], ignore_index=True)
+        write_table(df, self.table_path(name), export_csv=self.export_csv)
 
     def load_json(self):
         with open(self.json_path, "r") as f:
@@ -142,7 +244,54 @@ class ExtractInformation:
         self.extract_study_limitations_and_future_research()
         self.extract_country_for_study_areas_researcher_location()
 
+    def update(self, file_names):
+        """Extract only the Q&A results of file_names and add them to the existing tables.
+
+        Only the study areas of these papers are geocoded, so a few new papers take seconds
+        instead of a full run. Researcher locations come from the citation table and are not updated.
+
+        Args:
+            file_names (list): keys of the Q&A json (e.g. "10.1016_j.cities.2024.105169.txt")
+        """
+        full_json = self.load_json()
+        self.json = {file_name: full_json[file_name] for file_name in file_names if file_name in full_json}
+        if len(self.json) == 0:
+            self.json = full_json
+            return
+        self._append = True
+        try:
+            self.extract_paper_details()
+            self.extract_study_summary()
+            self.extract_built_environment_aspect()
+            self.extract_extent_scale()
+            self.extract_spatial_data_aggregation_unit()
+            self.extract_image_data()
+            self.extract_sampling_interval_distance()
+            self.extract_subjective_perception_data()
+            self.extract_other_sensory_data()
+            self.extract_research_type_and_method()
+            self.extract_analysis_type()
+            self.extract_computer_vision_models()
+            self.extract_code_availability()
+            self.extract_data_availability()
+            self.extract_ethical_approval()
+            self.extract_study_limitations_and_future_research()
+            # geocode the study areas of the new papers only
+            study_area_df = self.section_to_df("study_area", ["filename", "Country", "City"])
+            study_area_df = self.add_lat_lon(study_area_df)
+            self.save_table(study_area_df, "study_area")
+            study_area_df = study_area_df.dropna(subset=["lat", "lon"])
+            study_area_df["Country_clean"] = self.reverse_geocode(study_area_df, "Reverse geocoding study areas")
+            self.save_table(study_area_df, "study_area_country_clean")
+        finally:
+            self._append = False
+            self.json = full_json
+
     def extract_section(self, section_name, column_names):
+        df = self.section_to_df(section_name, column_names)
+        self.save_table(df, section_name)
+
+    def section_to_df(self, section_name, column_names):
         extracted_list = []
         for key, value in self.json.items():
             filename = key
@@ -172,8 +321,7 @@ class ExtractInformation:
             else:  # Handle cases where the section does not exist in the JSON
                 row = [filename] + ["" for _ in column_names[1:]]
                 extracted_list.append(row)
-        df = pd.DataFrame(extracted_list, columns=column_names)
-        df.to_csv(self.output_dir / f"{section_name}.csv", index=False)
+        return pd.DataFrame(extracted_list, columns=column_names)
 
     # Example for a generic method to extract and save different sections
     def extract_paper_details(self):
@@ -195,22 +343,41 @@ class ExtractInformation:
 
     # Method to extract 'study_area'
     def extract_study_area(self):
-        # dont run twice
-        if (self.output_dir / "study_area.csv").exists():
-            return
-        self.extract_section("study_area", ["filename", "Country", "City"])
-        # load the data
-        df = pd.read_csv(self.output_dir / "study_area.csv")
+        df = self.section_to_df("study_area", ["filename", "Country", "City"])
+        # only geocode the study areas not in the table of an earlier run
+        reused_df, df = self.reuse_rows(df, "study_area", ["filename", "Country", "City"])
+        if len(df) > 0:
+            df = self.add_lat_lon(df.copy())
+        # save the data
+        self.save_table(pd.concat([reused_df, df], ignore_index=True), "study_area")
+
+    def add_lat_lon(self, df: pd.DataFrame) -> pd.DataFrame:
+        """geocode the "Country" and "City" columns of a study_area table into "lat" and "lon" """
         # fill na with ""
         df.fillna("", inplace=True)
         # combine the country and city
         df["location"] = df["Country"] + ", " + df["City"]
         # extract latitute and longitude
-        df[["lat", "lon"]] = df["location"].progress_apply(
-            lambda x: pd.Series(extract_location(x))
+        df[["lat", "lon"]] = self.geocode(df["location"])
+        return df
+
+    def geocode(self, locations: pd.Series) -> pd.DataFrame:
+        """Run extract_location on each location and return "lat" and "lon" columns"""
+        with profile_stage("geocoding", items=len(locations)):
+            lat_lon_list = map_jobs(
+                extract_location,
+                locations.tolist(),
+                jobs=self.jobs,
+                executor=self.executor,
+                desc="Geocoding",
+            )
+        return pd.DataFrame(
+            [
+                lat_lon if lat_lon is not None else (None, None)
+                for lat_lon in lat_lon_list
+            ],
+            index=locations.index,
         )
-        # save the data
-        df.to_csv(self.output_dir / "study_area.csv", index=False)
 
     # Method to extract 'extent_scale'
     def extract_extent_scale(self):
@@ -305,71 +472,53 @@ class ExtractInformation:
 
     # use self.citation_df to extract the location of the authors from "Affiliations" column with extract_location method
     def extract_researcher_location(self):
-        # for this one, don't run twice
-        if (self.output_dir / "researcher_location.csv").exists():
-            return
         # fill na with ""
         self.citation_df.fillna("", inplace=True)
-        # create a new column "fisrt_author_affiliation" by splitting the "Affiliations" column with ";"
-        self.citation_df["first_author_affiliation"] = self.citation_df[
-            "Affiliations"
-        ].apply(lambda x: x.split(";")[0])
-        # clean the location with GPT-4
-        if self.client is not None:
-            self.citation_df["first_author_affiliation"] = self.citation_df[
-                "first_author_affiliation"
-            ].progress_apply(lambda x: clean_location_with_gpt4(x, self.client))
-        # extract latitute and longitude
-        self.citation_df[["lat", "lon"]] = self.citation_df[
-            "first_author_affiliation"
-        ].progress_apply(lambda x: pd.Series(extract_location(x)))
+        # only clean and geocode the papers not in the table of an earlier run
+        reused_df, df = self.reuse_rows(self.citation_df[["0", "Affiliations"]], "researcher_location", ["0"])
+        df = df.copy()
+        if len(df) > 0:
+            # create a new column "fisrt_author_affiliation" by splitting the "Affiliations" column with ";"
+            df["first_author_affiliation"] = df["Affiliations"].apply(lambda x: x.split(";")[0])
+            # clean the location with GPT-4
+            if self.client is not None:
+                df["first_author_affiliation"] = map_jobs(
+                    partial(clean_location_with_gpt4, client=self.client),
+                    df["first_author_affiliation"].tolist(),
+                    jobs=self.jobs,
+                    executor=self.executor,
+                    desc="Cleaning affiliations",
+                )
+            # extract latitute and longitude
+            df[["lat", "lon"]] = self.geocode(df["first_author_affiliation"])
         # only keep "0", "lat", "lon" columns
-        self.citation_df = self.citation_df[["0", "lat", "lon"]]
+        df = pd.concat([reused_df, df], ignore_index=True).reindex(columns=["0", "lat", "lon"])
         # save the data
-        self.citation_df.to_csv(
-            self.output_dir / "researcher_location.csv", index=False
-        )
+        self.save_table(df, "researcher_location")
 
-    def extract_country_for_study_areas_researcher_location(self):
+    def reverse_geocode(self, df: pd.DataFrame, desc: str) -> list:
+        """Run lat_lon_to_country on the "lat" and "lon" columns of df"""
+        from geopy.geocoders import Photon
         geolocator = Photon(user_agent="geoapiExercises", timeout=None)
-
-        def lat_lon_to_country(latitude, longitude):
-            try:
-                location = geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True, language = "en")
-            except Exception:
-                try:
-                    location = geolocator.reverse(
-                        f"{latitude}, {longitude}", exactly_one=True
-                    )
-                except Exception as e:
-                    print("Got", e, " for ", latitude, longitude)
-                    return None
-            if location:
-                address = location.address
-                country = address.split(",")[-1].strip()
-                return country
-            else:
-                return None
-
-        if not (self.output_dir / "study_area_country_clean.csv").exists(): 
-            # load the data (both study_area and researcher_location)
-            study_area_df = pd.read_csv(self.output_dir / "study_area.csv").dropna(subset=["lat", "lon"])
-            # progress_apply to get the country for each row
-            study_area_df["Country_clean"] = study_area_df.progress_apply(
-                lambda x: lat_lon_to_country(x["lat"], x["lon"]), axis=1
-            )
-            # save the data
-            study_area_df.to_csv(
-                self.output_dir / "study_area_country_clean.csv", index=False
+        with profile_stage("geocoding", items=len(df)):
+            return map_jobs(
+                lambda x: lat_lon_to_country(*x, geolocator=geolocator),
+                list(zip(df["lat"], df["lon"])),
+                jobs=self.jobs,
+                executor=self.executor,
+                desc=desc,
             )
 
-        if not (self.output_dir / "researcher_location_country_clean.csv").exists():
-            researcher_location_df = pd.read_csv(
-                self.output_dir / "researcher_location.csv"
-            ).dropna(subset=["lat", "lon"])
-            researcher_location_df["Country_clean"] = researcher_location_df.progress_apply(
-                lambda x: lat_lon_to_country(x["lat"], x["lon"]), axis=1
-            )
-            researcher_location_df.to_csv(
-                self.output_dir / "researcher_location_country_clean.csv", index=False
-            )
+    def add_country_clean(self, name, desc):
+        """reverse geocode the rows of the table name into the table name + "_country_clean", reusing earlier rows"""
+        df = read_table(self.table_path(name)).dropna(subset=["lat", "lon"])
+        reused_df, df = self.reuse_rows(df, name + "_country_clean", list(df.columns))
+        df = df.copy()
+        if len(df) > 0:
+            # get the country for each row
+            df["Country_clean"] = self.reverse_geocode(df, desc)
+        self.save_table(pd.concat([reused_df, df], ignore_index=True), name + "_country_clean")
+
+    def extract_country_for_study_areas_researcher_location(self):
+        self.add_country_clean("study_area", "Reverse geocoding study areas")
+        self.add_country_clean("researcher_location", "Reverse geocoding researcher locations")
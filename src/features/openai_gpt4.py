@@ -1,62 +1,81 @@
-from openai import OpenAI
 from pathlib import Path
 import json
 import csv
 from collections import defaultdict
-from tqdm import tqdm
-import fitz
-from typing import Optional
-import re
-import io
-import ocrmypdf
+from typing import Optional, Union
 
+from src.data.parse_cache import ParseCache
+from src.data.parse_data import section_index_path
+from src.data.pdf_text import PdfTextCache, PdfTextExtractor
+from src.features.question_routing import QuestionRouter
+from src.features.token_reduction import TextReducer
+from src.pipeline.executor import imap_jobs
+from src.pipeline.profiling import profile_stage
+from src.pipeline.sharding import Shard, doi_from_path, in_shard
 from .util.log_util import get_logger
 logger = get_logger(__name__)
 # set level at ERROR to avoid printing too many logs
 logger.setLevel("ERROR")
 
 
-def is_text_readable(text, threshold=0.5):
-    """
-    Analyze the text to determine if it's meaningfully readable.
-    Returns True if the text is deemed readable, False otherwise.
-    """
-    # Calculate the proportion of printable to total characters
-    printable_chars = re.sub(r'[^\x20-\x7E]+', '', text)
-    if len(text) == 0: return False
-    readability_ratio = len(printable_chars) / len(text)
-    return readability_ratio > threshold
+class PaperReviewer:
+    """Answer the questions of question_list_text for papers with the OpenAI API
 
+    With a question_router, each group of questions is asked with only the sections of the paper it needs,
+    found with the section index written next to the paper text (see src.data.parse_data.save_section_indexes).
+    Papers without a section index (e.g. PDFs) get every question with the whole paper, as without a router.
+    With a text_reducer, acknowledgements, captions, repeated headings... are removed from every prompt
+    (see TextReducer), and qa_from_folder reports the tokens saved per paper.
+    qa_from_folder extracts the text of the PDFs ahead of the LLM requests, with pdf_jobs processes (see
+    PdfTextCache), and load_file reads it from self.text_cache. Unreadable pages are run through OCR as set by
+    ocr (see PdfTextExtractor). With an extraction_cache, the text of a PDF extracted in an earlier run is reused.
+    """
 
-class PaperReviewer:
     def __init__(self, question_list_text: str,
-                 openai_api_key: Optional[str] = None):
-        self.client = OpenAI(api_key=openai_api_key)
+                 openai_api_key: Optional[str] = None, question_router: Optional[QuestionRouter] = None,
+                 text_reducer: Optional[TextReducer] = None, ocr: str = "pages",
+                 extraction_cache: Optional[Union[ParseCache, str, Path]] = None):
+        self._openai_api_key = openai_api_key
+        self.question_router = question_router
+        self.text_reducer = text_reducer
+        self.ocr = ocr
+        if extraction_cache is not None and not isinstance(extraction_cache, ParseCache):
+            extraction_cache = ParseCache(extraction_cache)
+        self.extraction_cache = extraction_cache
+        # the OpenAI client is created on first use, see client
+        self._client = None
+        # text of PDFs extracted ahead of the requests, set by qa_from_folder
+        self.text_cache: Optional[PdfTextCache] = None
         with open(question_list_text, "r") as file:
             self._input_question_list = file.read()
 
-    def load_file(self, file_path):
-        # Ensure the version of PyMuPDF is adequate for OCR
-        if tuple(map(int, fitz.VersionBind.split("."))) < (1, 19, 1):
-            raise ValueError(
-                "Need at least v1.19.1 of PyMuPDF for OCR support"
-            )
+    def __getstate__(self):
+        # the OpenAI client cannot be pickled, so process workers create their own
+        state = self.__dict__.copy()
+        state["_client"] = None
+        # the prefetch thread stays in this process. Workers extract their PDFs themselves
+        state["text_cache"] = None
+        return state
+
+    @property
+    def client(self):
+        """OpenAI client, created on first use so that importing and pickling the reviewer stay cheap"""
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self._openai_api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
+    def load_file(self, file_path):
         if file_path.endswith(".pdf"):
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                # First, try to extract text with PyMuPDF
-                page_text = page.get_text()
-                text += page_text
-            # Check if the extracted text is readable
-            if not is_text_readable(text):
-                ocrpdf = io.BytesIO()  # Prepare buffer for OCR-ed PDF
-                ocrmypdf.ocr(file_path, ocrpdf, force_ocr=True, output_type="pdf")
-                doc = fitz.open("pdf", ocrpdf)
-                text = ""
-                for page in doc:
-                    text += page.get_text()
+            text = None if self.text_cache is None else self.text_cache.get(file_path)
+            if text is None:
+                # First, try to extract text with PyMuPDF, then OCR if it is not readable
+                text = PdfTextExtractor(executor="serial", ocr=self.ocr,
+                                        extraction_cache=self.extraction_cache).extract(file_path)
             return text
 
         elif file_path.endswith(".txt"):
@@ -68,14 +87,52 @@ class PaperReviewer:
                 "File format not supported. Please use .txt or .pdf"
             )
 
+    def load_section_index(self, file_path) -> Optional[list]:
+        # written by the parse stage next to the text of each paper
+        index_path = section_index_path(file_path)
+        if not index_path.exists():
+            return None
+        with open(index_path, "r") as file:
+            return json.load(file)
+
     def qa_from_file(self, file_path):
+        return self._qa_from_file_with_stats(file_path)[0]
+
+    def _qa_from_file_with_stats(self, file_path) -> tuple:
+        """the answer for file_path, and the tokens saved by self.text_reducer in its prompts ({} without one)"""
         # because the OpenAI API is broken, I'll just load the file from the local system
         paper_content = self.load_file(file_path)
+        stats = {}
+        if self.question_router is not None:
+            section_index = self.load_section_index(file_path)
+            if section_index is not None:
+                return self.qa_from_routed_text(paper_content, section_index, stats=stats), stats
+        return self.qa_from_text(paper_content, stats=stats), stats
+
+    def qa_from_routed_text(self, paper_content: str, section_index: list, stats: Optional[dict] = None) -> str:
+        """ask each batch of questions of self.question_router with only the sections it needs, and merge the
+        JSON answers into one"""
+        answers = {}
+        for sections, questions in self.question_router.batches():
+            context = self.question_router.select(paper_content, section_index, sections)
+            logger.info(f"asking about {sections or 'the whole paper'} with {len(context)} of {len(paper_content)} characters")
+            answers.update(json.loads(str(self.qa_from_text(context, questions, stats=stats))))
+        return json.dumps(answers)
+
+    def qa_from_text(self, paper_content: str, question_list: Optional[str] = None, stats: Optional[dict] = None):
+        if question_list is None:
+            question_list = self._input_question_list
+        if self.text_reducer is not None:
+            paper_content, reduction = self.text_reducer.reduce_with_stats(paper_content)
+            # summed over the requests of a paper
+            if stats is not None:
+                for key, value in reduction.items():
+                    stats[key] = stats.get(key, 0) + value
         content = f"""Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
         Paper Context:
         {paper_content}
 
-        Question: {self._input_question_list}
+        Question: {question_list}
         
         Important Note:
             - Please answer the question solely based on the Paper Content and follow the specified format.
@@ -99,31 +156,78 @@ class PaperReviewer:
         # print(response.choices[0].message.content)
         return response.choices[0].message.content
     
-    def qa_from_folder(self, input_folder_path: str, output_json_file_path: str) -> None:
+    def qa_from_folder(self, input_folder_path: str, output_json_file_path: str,
+                       jobs: int = 1, executor: str = "serial", shard: Optional[Shard] = None,
+                       pdf_jobs: int = 1) -> None:
         # load a list of text or PDF files
         path = Path(input_folder_path)
         txt_files = list(path.glob("*.txt"))
         pdf_files = list(path.glob("*.pdf"))
-        file_list = txt_files + pdf_files
+        # only keep the papers whose DOI hashes to this shard. Use a separate output json per shard
+        # (see src.pipeline.sharding.shard_path) and merge them afterwards
+        file_list = [file_path for file_path in txt_files + pdf_files if in_shard(doi_from_path(file_path), shard)]
 
         # Load previously processed data if exists
-        if Path(output_json_file_path).exists():
-            with open(output_json_file_path, "r") as infile:
-                output_dict = json.load(infile)
-        else:
-            output_dict = defaultdict(list)
+        output_dict = self.load_output_dict(output_json_file_path)
+
+        # Checkpointing: skip if the result already exists
+        file_list = [input_file_path for input_file_path in file_list if input_file_path.name not in output_dict]
+        token_stats = self.load_token_stats(output_json_file_path)
+        # extract the PDFs with pdf_jobs processes while the questions are asked, in the order they are asked.
+        # Process workers get a copy of the reviewer without the cache, and extract their PDFs themselves
+        if executor != "process":
+            self.text_cache = PdfTextCache(PdfTextExtractor(jobs=pdf_jobs, ocr=self.ocr,
+                                                           extraction_cache=self.extraction_cache))
+            self.text_cache.prefetch(str(file_path) for file_path in file_list if file_path.suffix == ".pdf")
+        try:
+            # loop through them to ask questions
+            with profile_stage("qa", items=len(file_list)):
+                answers = imap_jobs(self._qa_from_file_with_stats,
+                                    [str(input_file_path) for input_file_path in file_list],
+                                    jobs=jobs, executor=executor, desc="running Q&A with papers")
+                for input_file_path, (answer, stats) in zip(file_list, answers):
+                    output_dict[input_file_path.name] = json.loads(str(answer))
+                    logger.info("Ran Q&A for " + str(input_file_path.name))
 
-        # loop through them to ask questions
-        for input_file_path in tqdm(file_list, desc="running Q&A with papers"):
-            # Checkpointing: skip if the result already exists
-            if input_file_path.name not in output_dict:
-                output_dict[input_file_path.name] = json.loads(str(self.qa_from_file(str(input_file_path))))
-                logger.info("Ran Q&A for " + str(input_file_path.name)) 
+                    # save intermediary results as json
+                    with open(output_json_file_path, "w") as outfile:
+                        json.dump(output_dict, outfile)
+                    if self.text_reducer is not None:
+                        token_stats[input_file_path.name] = stats
+                        with open(self.token_stats_path(output_json_file_path), "w") as outfile:
+                            json.dump(token_stats, outfile)
+        finally:
+            # stop the prefetch also if a request fails, so that its workers do not outlive the stage
+            if self.text_cache is not None:
+                self.text_cache.close()
+            self.text_cache = None
 
-                # save intermediary results as json
-                with open(output_json_file_path, "w") as outfile:
-                    json.dump(output_dict, outfile)
+        if token_stats:
+            saved = sum(stats.get("tokens_saved", 0) for stats in token_stats.values())
+            before = sum(stats.get("tokens_before", 0) for stats in token_stats.values())
+            logger.info(f"token reduction saved {saved} of {before} tokens over {len(token_stats)} papers")
+        self.save_as_csv(output_dict, output_json_file_path)
+
+    @staticmethod
+    def token_stats_path(output_json_file_path: str) -> str:
+        # tokens saved by the text reducer per paper, next to the answers
+        return output_json_file_path.replace(".json", "_token_reduction.json")
+
+    def load_token_stats(self, output_json_file_path: str) -> dict:
+        token_stats_path = self.token_stats_path(output_json_file_path)
+        if self.text_reducer is not None and Path(token_stats_path).exists():
+            with open(token_stats_path, "r") as infile:
+                return json.load(infile)
+        return {}
+
+    def load_output_dict(self, output_json_file_path: str) -> dict:
+        # Load previously processed data if exists
+        if Path(output_json_file_path).exists():
+            with open(output_json_file_path, "r") as infile:
+                return json.load(infile)
+        return defaultdict(list)
 
+    def save_as_csv(self, output_dict: dict, output_json_file_path: str) -> None:
         # save as csv with columns: DOI, questions (answers)
         header = ["file_name"]
         header.extend([self._input_question_list])
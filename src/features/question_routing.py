@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from src.data.parse_data import HEADER_LABEL
+
+
+class QuestionRouter:
+    """Route each group of questions to the sections of a paper it needs, so that the prompt only holds those.
+
+    A route is (group, questions, sections): the name of the answer group (e.g. "study_area"), the text of its
+    questions, and the section labels of Parser.parse_single_section_index to answer them from (e.g.
+    ["Methodology"]), or None for the whole paper. The header (DOI, title, keywords, abstract, data availability)
+    is always sent. Groups are asked together when one's sections cover the other's (see batches).
+
+    The routes can be loaded from a JSON file with from_json:
+        {"routes": [{"group": "study_area", "questions": "...", "sections": ["Introduction", "Methodology"]},
+                    {"group": "study_limitations_and_future_research", "questions": "...", "sections": null}, ...]}
+
+    Args:
+        routes (List[Tuple[str, str, Optional[List[str]]]]): (group, questions, sections) in the order of the
+            questions list
+    """
+
+    def __init__(self, routes: List[Tuple[str, str, Optional[List[str]]]]) -> None:
+        self.routes = [(group, questions, None if sections is None else list(sections))
+                       for group, questions, sections in routes]
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "QuestionRouter":
+        """load the routes from a JSON file (see the class docstring for the format)"""
+        with open(path) as f:
+            config = json.load(f)
+        return cls([(route["group"], route["questions"], route.get("sections")) for route in config["routes"]])
+
+    def batches(self) -> List[Tuple[Optional[Tuple[str, ...]], str]]:
+        """(sections, questions) of each request, with the questions joined in their order
+
+        Groups whose sections are all sent for another group anyway are asked in that request, which saves a
+        request without making any prompt longer. With a group that needs the whole paper, every group is asked
+        in one request, as without routing.
+        """
+        keys = []
+        for _, _, sections in self.routes:
+            key = None if sections is None else tuple(sorted(set(sections)))
+            if key not in keys:
+                keys.append(key)
+        # widest sections first, so that each request is merged into the widest one that covers it
+        kept = []
+        for key in sorted(keys, key=lambda key: float("-inf") if key is None else -len(key)):
+            if not any(other is None or (key is not None and set(key) <= set(other)) for other in kept):
+                kept.append(key)
+        batches = {}
+        for _, questions, sections in self.routes:
+            key = None if sections is None else set(sections)
+            target = next(other for other in kept if other is None or (key is not None and key <= set(other)))
+            batches.setdefault(target, []).append(questions)
+        return [(sections, "\n\n".join(questions)) for sections, questions in batches.items()]
+
+    @staticmethod
+    def select(text: str, section_index: Optional[list], sections: Optional[Tuple[str, ...]]) -> str:
+        """the parts of text with the labels in sections (and the header), in document order
+
+        Returns the whole text if sections is None or if there is no section index (e.g. for PDFs).
+        """
+        if sections is None or not section_index:
+            return text
+        return "".join(text[start:end] for label, start, end in section_index
+                       if label == HEADER_LABEL or label in sections)
@@ -0,0 +1,207 @@
+import json
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+try:
+    import tiktoken
+except ImportError:
+    # without tiktoken, tokens are estimated as 4 characters each
+    tiktoken = None
+
+# sentences that match any of these (case-insensitively) are removed, also outside the sections of drop_headings:
+# thanks, funding statements, grant numbers, competing interest declarations and CRediT statements. They are kept
+# specific, since a sentence of a results or limitations paragraph that matches is lost
+DEFAULT_BOILERPLATE = [
+    r"\b(?:we|the authors?) (?:would like to |wish to |also |sincerely |gratefully )*thank\b",
+    r"\b(?:we|the authors?) (?:would like to |wish to |also )*gratefully acknowledge\b",
+    r"\b(?:we|the authors?) (?:would like to |wish to |also )*acknowledge (?:the )?(?:financial )?(?:support|funding)\b",
+    r"\bwe are (?:very |also )?grateful to\b",
+    r"^(?:this|the|our) (?:work|research|study|project|paper) (?:was|is|has been|were) (?:partly |partially |"
+    r"financially |also )?(?:supported|funded) by\b",
+    r"\bgrant (?:no\.|number|agreement)",
+    r"\bdeclare (?:that )?(?:they have |there is |there are )?no (?:known )?(?:competing|conflicts? of)",
+    r"\bconceptuali[sz]ation\b.*\b(?:writing|methodology|supervision)\b",
+]
+# titles of sections to drop: in PDF text, lines that start a part to drop up to the next heading (references up
+# to an appendix), in parsed xml, section titles
+DEFAULT_DROP_HEADINGS = [r"acknowledge?ments?", r"funding(?: sources?| information)?", r"author contributions?",
+                         r"credit authorship contribution statement", r"declaration of competing interests?",
+                         r"conflicts? of interests?", r"competing interests?", r"references", r"bibliography"]
+# figure and table captions, after the section titles of parsed xml text
+_CAPTION = r"(?:fig\.|figure|table)\s*[a-z]?\d+[a-z]?\s*(?:[.:|]|$)"
+# the one or two section titles that start each chunk of parsed xml text ("Section: Subsection: paragraph")
+_TITLES = re.compile(r"(?:(?:(?!\. )[^:\n]){1,200}: ){1,2}")
+# sentence ends, to remove boilerplate sentences from paragraphs
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+
+
+def count_tokens(text: str) -> int:
+    """number of tokens of text for the GPT-4 models (estimated as characters / 4 without tiktoken)"""
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding("cl100k_base").encode(text, disallowed_special=()))
+
+
+class TextReducer:
+    """Strip low-value parts of a paper before it is sent to the LLM.
+
+    Works on the text of parsed xml ("Section title: paragraph" chunks separated by blank lines, see
+    Parser.parse_single_to_simple_dict) and on text extracted from PDFs. It drops
+        - in parsed xml, the sections of acknowledgements, funding, author contributions and competing interests
+          (drop_headings): a section with one of these titles, or the chunks after a chunk holding just one of
+          these titles, since unnumbered sections carry the title of the last numbered section
+        - elsewhere in parsed xml, the sentences that thank, declare funding, grant numbers or competing interests
+          (boilerplate). The rest of their paragraph is kept
+        - in PDF text, the lines under an acknowledgements, funding... or references heading (drop_headings)
+        - figure and table captions (drop_captions)
+        - the section title that parsed xml repeats on every chunk of a section, which is kept once on the first
+          chunk (merge_headings)
+        - runs of spaces (and of blank lines in PDF text)
+    The header of parsed xml (DOI, title, keywords, abstract, data availability) is kept as is.
+
+    The settings can be loaded from a JSON file with from_json:
+        {"boilerplate": ["\\bwe thank\\b", ...], "drop_headings": ["acknowledgements", ...],
+         "drop_captions": true, "merge_headings": true}
+
+    Args:
+        boilerplate (List[str]): regexes of sentences to remove. Defaults to DEFAULT_BOILERPLATE.
+        drop_headings (List[str]): regexes of titles of sections to drop (in PDF text, up to the next heading).
+            Defaults to DEFAULT_DROP_HEADINGS.
+        drop_captions (bool): drop figure and table captions. Defaults to True.
+        merge_headings (bool): write repeated section titles of parsed xml once. Defaults to True.
+    """
+
+    _HEADER_END = "Paper content:\n"
+    _SPACES = re.compile(r"[ \t]{2,}")
+    _BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+    # headings of PDF text: numbered ("4. Discussion", "2.1 Study area") or a few capitalized words without a
+    # period ("Data availability"). Taking a wrapped line for a heading only keeps more text
+    _HEADING = re.compile(r"\d+(?:\.\d+)*\.?\s+[A-Z][^.]{0,80}|[A-Z][^.:]{0,50}(?<!\.)")
+
+    def __init__(self, boilerplate: Optional[List[str]] = None, drop_headings: Optional[List[str]] = None,
+                 drop_captions: bool = True, merge_headings: bool = True) -> None:
+        self.boilerplate = list(DEFAULT_BOILERPLATE if boilerplate is None else boilerplate)
+        self.drop_headings = list(DEFAULT_DROP_HEADINGS if drop_headings is None else drop_headings)
+        self.drop_captions = drop_captions
+        self.merge_headings = merge_headings
+        self._boilerplate = re.compile("|".join(self.boilerplate), re.IGNORECASE) if self.boilerplate else None
+        self._drop_heading = re.compile(rf"(?:\d+(?:\.\d+)*\.?\s*)?(?:{'|'.join(self.drop_headings)})\s*:?",
+                                        re.IGNORECASE) if self.drop_headings else None
+        # parsed xml chunks start with one or two section titles
+        self._caption = re.compile(rf"(?:[^:\n]{{1,200}}: ){{0,2}}{_CAPTION}", re.IGNORECASE)
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "TextReducer":
+        """load the settings from a JSON file (see the class docstring for the format)"""
+        with open(path) as f:
+            config = json.load(f)
+        return cls(boilerplate=config.get("boilerplate"), drop_headings=config.get("drop_headings"),
+                   drop_captions=config.get("drop_captions", True), merge_headings=config.get("merge_headings", True))
+
+    def _is_drop_heading(self, title: str) -> bool:
+        return self._drop_heading is not None and self._drop_heading.fullmatch(title.strip()) is not None
+
+    def _remove_boilerplate(self, paragraph: str) -> str:
+        """paragraph without its boilerplate sentences"""
+        if self._boilerplate is None or self._boilerplate.search(paragraph) is None:
+            return paragraph
+        return " ".join(sentence for sentence in _SENTENCE_END.split(paragraph)
+                        if self._boilerplate.search(sentence) is None)
+
+    def _reduce_chunks(self, chunks: List[str]) -> List[str]:
+        """drop the sections of drop_headings, the captions and the boilerplate sentences of parsed xml chunks"""
+        kept = []
+        # titles of the chunks of the section being dropped
+        dropping = None
+        for chunk in chunks:
+            titles = _TITLES.match(chunk)
+            prefix = titles.group() if titles is not None else ""
+            body = chunk[len(prefix):]
+            # titles of unnumbered sections are chunks of their own, after the title of the last numbered section
+            if len(body) < 300 and self._is_drop_heading(body):
+                dropping = prefix
+                continue
+            if dropping is not None:
+                # the section goes on up to the next title chunk, or the next section
+                if prefix == dropping and not self._is_heading(body):
+                    continue
+                dropping = None
+            if any(self._is_drop_heading(title) for title in prefix.split(": ")[:-1]):
+                continue
+            if self.drop_captions and self._caption.match(chunk):
+                continue
+            body = self._remove_boilerplate(body)
+            if body:
+                kept.append(prefix + body)
+        return kept
+
+    def _is_heading(self, line: str) -> bool:
+        return (self._HEADING.fullmatch(line) is not None and len(line.split()) <= 8) or \
+            line.lower().startswith(("appendix", "supplementary"))
+
+    def _reduce_lines(self, text: str) -> str:
+        """drop the parts of PDF text under the drop headings and the captions, line by line"""
+        kept = []
+        dropping = None
+        caption = False
+        for line in text.split("\n"):
+            stripped = line.strip()
+            if self._drop_heading is not None and self._drop_heading.fullmatch(stripped):
+                dropping = re.sub(r"[^a-z]", "", stripped.lower())
+                continue
+            if dropping is not None:
+                # the references run up to an appendix, since numbered references look like headings
+                if dropping in ("references", "bibliography"):
+                    if not stripped.lower().startswith(("appendix", "supplementary")):
+                        continue
+                elif not self._is_heading(stripped):
+                    continue
+                dropping = None
+            if caption:
+                # a caption goes on up to the line that ends a sentence (or an empty line)
+                caption = stripped != "" and not stripped.endswith(".")
+                continue
+            if self.drop_captions and self._caption.match(stripped):
+                caption = not stripped.endswith(".")
+                continue
+            kept.append(line)
+        return "\n".join(kept)
+
+    def _split_heading(self, chunk: str, next_chunk: str) -> Optional[str]:
+        """the longest "title: " prefix that chunk shares with next_chunk, without ": " (None if there is none)"""
+        end = chunk.rfind(": ", 0, 300)
+        while end > 0:
+            if next_chunk.startswith(chunk[:end + 2]):
+                return chunk[:end]
+            end = chunk.rfind(": ", 0, end)
+        return None
+
+    def _merge_headings(self, chunks: List[str]) -> List[str]:
+        merged = []
+        heading = None
+        for i, chunk in enumerate(chunks):
+            if heading is not None and chunk.startswith(heading + ": "):
+                merged.append(chunk[len(heading) + 2:])
+                continue
+            heading = self._split_heading(chunk, chunks[i + 1]) if i + 1 < len(chunks) else None
+            merged.append(chunk)
+        return merged
+
+    def reduce(self, text: str) -> str:
+        """the text without its low-value parts"""
+        if self._HEADER_END not in text:
+            # PDF text has no reliable paragraphs, so it is reduced by headings and captions only
+            return self._SPACES.sub(" ", self._BLANK_LINES.sub("\n\n", self._reduce_lines(text))).strip()
+        # parsed xml: keep the header, and work on the chunks of the paper content
+        header, _, text = text.partition(self._HEADER_END)
+        paragraphs = self._reduce_chunks([paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()])
+        if self.merge_headings:
+            paragraphs = self._merge_headings(paragraphs)
+        return header + self._HEADER_END + self._SPACES.sub(" ", "\n\n".join(paragraphs))
+
+    def reduce_with_stats(self, text: str) -> Tuple[str, dict]:
+        """the reduced text and {"tokens_before", "tokens_after", "tokens_saved"}"""
+        reduced = self.reduce(text)
+        before, after = count_tokens(text), count_tokens(reduced)
+        return reduced, {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
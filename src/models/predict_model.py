@@ -1,21 +1,27 @@
-import polars as pl
 from typing import List, Union
 from dotenv import find_dotenv, load_dotenv
 import os
-import nltk
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-from nltk.tokenize import word_tokenize
 import pandas as pd
 from pathlib import Path
 import unidecode
+from functools import lru_cache, partial
 
-from src.models.write_review import ReviewWriter
-from src.models.recalibrate import Recalibrator
+from src.pipeline.executor import map_jobs
+from src.pipeline.profiling import profile_stage
+from src.pipeline.tables import read_table
+
+@lru_cache(maxsize=None)
+def _load_nltk():
+    # nltk and its models are only needed for the citation abbreviations, so they are loaded on first use
+    import nltk
+    nltk.download('punkt')
+    nltk.download('averaged_perceptron_tagger')
+    return nltk
 
 def remove_articles_and_prepositions(text):
+    nltk = _load_nltk()
     # Tokenize the text into individual words
-    words = word_tokenize(text)
+    words = nltk.word_tokenize(text)
 
     # Perform POS tagging to identify the parts of speech for each word
     tagged_words = nltk.pos_tag(words)
@@ -67,13 +73,19 @@ def combine_cols(row, citation_style):
 def recombine_cols(list_):
     return "".join(list_)
 
-def main(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_opportunity_csv, output_csv_file_path, openai_api_key, citation_style="latex"):
+def write_review(text, openai_api_key, citation_style):
+    from src.models.write_review import ReviewWriter
+    return ReviewWriter(openai_api_key, text, citation_style=citation_style).execute()
+
+def main(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_opportunity_csv, output_csv_file_path, openai_api_key, citation_style="latex",
+         jobs=1, executor="serial"):
     # load csv files
-    citation_df = pd.read_csv(citation_csv)
+    # csv, parquet, or arrow files are read based on their suffix
+    citation_df = read_table(citation_csv)
     complementary_df = pd.read_excel(complementary_excel)
-    aspect_df = pd.read_csv(aspect_csv)
-    summary_df = pd.read_csv(summary_csv)
-    limitation_opportunity_df = pd.read_csv(limitation_opportunity_csv)
+    aspect_df = read_table(aspect_csv)
+    summary_df = read_table(summary_csv)
+    limitation_opportunity_df = read_table(limitation_opportunity_csv)
     
     # convert aspect to lowercase
     aspect_df = aspect_df[['0', 'improved_aspect']]
@@ -119,8 +131,10 @@ def main(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_
     grouped_df = grouped_df.groupby("aspect").agg(combined_col_list=('combined_col_list', list)).reset_index()
     grouped_df['combined_col_list'] = grouped_df['combined_col_list'].apply(lambda x: ' '.join(map(str, x)))
     
-    output_series = grouped_df['combined_col_list'].apply(lambda x: ReviewWriter(openai_api_key, x, citation_style=citation_style).execute())
-    grouped_df['first_run_output'], grouped_df['final_output'] = zip(*output_series)
+    with profile_stage("review_writing", items=len(grouped_df)):
+        output_list = map_jobs(partial(write_review, openai_api_key=openai_api_key, citation_style=citation_style),
+                               grouped_df['combined_col_list'].tolist(), jobs=jobs, executor=executor, desc="Writing reviews")
+    grouped_df['first_run_output'], grouped_df['final_output'] = zip(*output_list)
 
     # write the output csv file
     grouped_df.to_csv(output_csv_file_path)
@@ -128,15 +142,17 @@ def main(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_
     citation_df_no_filename.to_csv(os.path.join(os.path.dirname(output_csv_file_path), "citation_df_no_filename.csv"))
 
 def reclibrate(openai_api_key, aspect_csv, summary_csv,
-            image_data_type_csv
+            image_data_type_csv, overwrite=False, jobs=1, executor="serial"
             ):
-    recalibrated_aspect_csv = Path(aspect_csv).parent / "recalibrated_aspect.csv"
-    recalibrated_image_data_type_csv = Path(image_data_type_csv).parent / "recalibrated_image_data_type.csv"
+    from src.models.recalibrate import Recalibrator
+    # recalibrated files are saved in the same format as the input files
+    recalibrated_aspect_csv = Path(aspect_csv).parent / ("recalibrated_aspect" + Path(aspect_csv).suffix)
+    recalibrated_image_data_type_csv = Path(image_data_type_csv).parent / ("recalibrated_image_data_type" + Path(image_data_type_csv).suffix)
     recalibrator = Recalibrator(openai_api_key)
-    if not Path(recalibrated_aspect_csv).exists():
-        recalibrator.improve_aspect(aspect_csv, recalibrated_aspect_csv, summary_csv)
-    if not Path(recalibrated_image_data_type_csv).exists():
-        recalibrator.improve_image_data_type(image_data_type_csv, recalibrated_image_data_type_csv)
+    if not Path(recalibrated_aspect_csv).exists() or overwrite:
+        recalibrator.improve_aspect(aspect_csv, recalibrated_aspect_csv, summary_csv, jobs=jobs, executor=executor)
+    if not Path(recalibrated_image_data_type_csv).exists() or overwrite:
+        recalibrator.improve_image_data_type(image_data_type_csv, recalibrated_image_data_type_csv, jobs=jobs, executor=executor)
     
 if __name__ == "__main__":
     # input and output path
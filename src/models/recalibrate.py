@@ -8,15 +8,24 @@ from langchain.prompts.chat import (
 from langchain import PromptTemplate, LLMChain
 import os 
 import pandas as pd
-from tqdm import tqdm
 import time 
 
+from src.pipeline.executor import map_jobs
+from src.pipeline.profiling import profile_stage
+from src.pipeline.tables import read_table, write_table
+
 class Recalibrator:
     """
     class to reclibrate the review
     """
     def __init__(self, openai_api_key: str):
+        self.openai_api_key = openai_api_key
         os.environ['OPENAI_API_KEY'] = openai_api_key
+
+    def __setstate__(self, state):
+        # the langchain clients are created per row and read the key from the environment, also in process workers
+        self.__dict__.update(state)
+        os.environ['OPENAI_API_KEY'] = self.openai_api_key
         
     def improve_aspect_row(self, row):
         aspect = row["aspect"]
@@ -42,29 +51,28 @@ class Recalibrator:
         output = chain.run(aspect=aspect, summary=summary)
         return output
             
-    def improve_aspect(self, input_csv_path, output_csv_path, summary_csv_path):
+    def improve_aspect(self, input_csv_path, output_csv_path, summary_csv_path, jobs=1, executor="serial"):
         # read input_csv_path
-        input_df = pd.read_csv(input_csv_path)
+        input_df = read_table(input_csv_path)
         # read summary_csv_path
-        summary_df = pd.read_csv(summary_csv_path)
+        summary_df = read_table(summary_csv_path)
         # join input_df and summary_df on "0"
         df = pd.merge(input_df, summary_df, on="0")
         
-        # initialize an empty list to hold improved aspects
-        improved_aspects = []
-        
-        # use tqdm for loop to show progress bar
-        for _, row in tqdm(df.iterrows(), total=df.shape[0]):
-            improved_aspect = self.improve_aspect_row(row)
-            improved_aspects.append(improved_aspect)
+        # improve aspects row by row and show progress bar
+        rows = [row for _, row in df.iterrows()]
+        with profile_stage("recalibration", items=len(rows)):
+            improved_aspects = map_jobs(self.improve_aspect_row, rows, jobs=jobs, executor=executor, desc="Improving aspects")
         
         # assign the list to the dataframe column
         df["improved_aspect"] = improved_aspects
         
-        # save the output to output_csv_path
-        df.to_csv(output_csv_path, index=False)
+        # save the output to output_csv_path (csv, parquet, or arrow depending on the suffix)
+        write_table(df, output_csv_path)
         
     def improve_image_data_type_row(self, row):
+        # sleep for 1 second to avoid openai api limit
+        time.sleep(1)
         image_data_type = row["0.1"]
         system_template=f"""Instructions:
         - You will get categorized image data types.
@@ -88,22 +96,17 @@ class Recalibrator:
         print(output)
         return output
             
-    def improve_image_data_type(self, input_csv_path, output_csv_path):
+    def improve_image_data_type(self, input_csv_path, output_csv_path, jobs=1, executor="serial"):
         # read input_csv_path
-        input_df = pd.read_csv(input_csv_path)
+        input_df = read_table(input_csv_path)
 
-        # initialize an empty list to hold improved image_data_types
-        improved_image_data_types = []
-        
-        # use tqdm for loop to show progress bar
-        for _, row in tqdm(input_df.iterrows(), total=input_df.shape[0]):
-            # sleep for 1 second to avoid openai api limit
-            time.sleep(1)
-            improved_image_data_type = self.improve_image_data_type_row(row)
-            improved_image_data_types.append(improved_image_data_type)
+        # improve image data types row by row and show progress bar
+        rows = [row for _, row in input_df.iterrows()]
+        with profile_stage("recalibration", items=len(rows)):
+            improved_image_data_types = map_jobs(self.improve_image_data_type_row, rows, jobs=jobs, executor=executor, desc="Improving image data types")
         
         # assign the list to the dataframe column
         input_df["improved_image_data_type"] = improved_image_data_types
         
-        # save the output to output_csv_path
-        input_df.to_csv(output_csv_path, index=False)
\ No newline at end of file
+        # save the output to output_csv_path (csv, parquet, or arrow depending on the suffix)
+        write_table(input_df, output_csv_path)
\ No newline at end of file
@@ -0,0 +1,319 @@
+import os
+from pathlib import Path
+
+import click
+from dotenv import find_dotenv, load_dotenv
+
+from src.data.pdf_text import OCR_MODES
+from src.pipeline.executor import EXECUTORS
+from src.pipeline.profiling import PROFILERS, RunProfiler
+from src.pipeline.sharding import parse_shard, shard_path
+
+
+def parallel_options(func):
+    """add --jobs and --executor to a subcommand"""
+    func = click.option("--executor", type=click.Choice(EXECUTORS), default="serial", show_default=True,
+                        help="How to run the workers: thread for network-bound work, process for CPU-bound work.")(func)
+    func = click.option("--jobs", "-j", type=int, default=1, show_default=True,
+                        help="Number of workers.")(func)
+    return func
+
+
+def _parse_shard_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def shard_option(func):
+    """add --shard i/N to a subcommand"""
+    return click.option("--shard", callback=_parse_shard_option, default=None, metavar="i/N",
+                        help="Only process the papers whose DOI hashes to shard i of N (0-based). "
+                             "Outputs get a .shard-i-of-N suffix; combine them with the merge command.")(func)
+
+
+@click.group()
+@click.option("--profile-report", type=click.Path(), default=None,
+              help="Write wall time, CPU time, peak RSS and item counts of each stage to this JSON file.")
+@click.option("--profiler", type=click.Choice(PROFILERS), default=None,
+              help="Also profile each stage with cProfile or pyinstrument. Requires --profile-report.")
+@click.pass_context
+def cli(ctx, profile_report, profiler):
+    """Run the stages of the review pipeline."""
+    # find .env automagically by walking up directories until it's found, then
+    # load up the .env entries as environment variables
+    load_dotenv(find_dotenv())
+    if profiler is not None and profile_report is None:
+        raise click.UsageError("--profiler requires --profile-report")
+    if profile_report is not None:
+        run_profiler = RunProfiler(profile_report, profiler=profiler)
+        run_profiler.__enter__()
+        ctx.call_on_close(lambda: run_profiler.__exit__(None, None, None))
+
+
+@cli.command()
+@click.option("--input-file", type=click.Path(exists=True), show_default=True,
+              default="data/external/asreview_dataset_all_visual-urban-perception-2023-07-09-2023-07-17.xlsx",
+              help="ASReview export (.csv or .xlsx) with the included papers.")
+@click.option("--output-path", type=click.Path(), default="data/raw/", show_default=True)
+@parallel_options
+@shard_option
+def download(input_file, output_path, jobs, executor, shard):
+    """Download full texts of the included papers to OUTPUT_PATH/xml and OUTPUT_PATH/pdf."""
+    from src.data.download_paper import PaperDownloader
+    from src.data.filter_paper import PaperFilter
+
+    xml_output_folder = Path(output_path) / "xml"
+    xml_output_folder.mkdir(parents=True, exist_ok=True)
+    pdf_output_folder = Path(output_path) / "pdf"
+    pdf_output_folder.mkdir(parents=True, exist_ok=True)
+    paper_downloader = PaperDownloader(os.getenv('ELSEVIER_API_KEY'), os.getenv('INST_TOKEN'),
+                                       str(shard_path(Path(output_path) / "unavailable_papers.csv", shard)))
+    input_paper_df = PaperFilter(input_file).filter_paper()
+    paper_downloader.fulldoc_download(input_paper_df.select(["DOI", "Link", "Title"]),
+                                      str(xml_output_folder), str(pdf_output_folder),
+                                      jobs=jobs, executor=executor, shard=shard)
+
+
+@cli.command()
+@click.option("--xml-folder", type=click.Path(exists=True), default="data/raw/xml", show_default=True)
+@click.option("--output-folder", type=click.Path(), default="data/raw/papers", show_default=True)
+@click.option("--unavailable-papers-csv", type=click.Path(), default="data/raw/unavailable_papers.csv", show_default=True)
+@click.option("--iterparse", is_flag=True,
+              help="Stream each XML file instead of loading it whole. Same output with less memory per worker.")
+@click.option("--format", "output_format", type=click.Choice(["txt", "jsonl", "parquet"]), default="txt",
+              show_default=True,
+              help="txt: one text file per paper. jsonl/parquet: one papers.jsonl/papers.parquet file "
+                   "with doi and text of every paper.")
+@click.option("--parse-cache", type=click.Path(), default="data/interim/parse_cache", show_default=True,
+              help="Folder of parsed outputs keyed by XML content hash. Unchanged files are not parsed again.")
+@click.option("--no-parse-cache", is_flag=True, help="Parse every file, without reading or writing the cache.")
+@click.option("--section-index", is_flag=True,
+              help="Also write the character spans of each section label of every paper, for `qa --routes`. "
+                   "Files are loaded whole, also with --iterparse.")
+@parallel_options
+@shard_option
+def parse(xml_folder, output_folder, unavailable_papers_csv, iterparse, output_format, parse_cache, no_parse_cache,
+          section_index, jobs, executor, shard):
+    """Parse downloaded XML files into text files in OUTPUT_FOLDER.
+
+    Each paper is written as soon as it is parsed, so memory does not grow with the number of papers."""
+    from src.data.parse_data import Parser, save_papers, save_section_indexes
+    from src.pipeline.sinks import SINK_FORMATS, open_sink
+
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    parser = Parser(sorted(Path(xml_folder).glob("*.xml")), str(shard_path(unavailable_papers_csv, shard)),
+                    iterparse=iterparse, parse_cache=None if no_parse_cache else parse_cache)
+    if not section_index:
+        papers = parser.iter_multiple_to_simple_dict(jobs=jobs, executor=executor, shard=shard)
+        if output_format == "txt":
+            save_papers(papers, output_folder)
+        else:
+            with open_sink(shard_path(Path(output_folder) / f"papers{SINK_FORMATS[output_format]}", shard)) as sink:
+                sink.write_all(papers)
+        return
+
+    results = parser.iter_multiple_views(["simple", "section_index"], jobs=jobs, executor=executor, shard=shard)
+    if output_format == "txt":
+        for result in results:
+            save_papers(result["simple"], output_folder)
+            save_section_indexes(result["section_index"], output_folder)
+    else:
+        suffix = SINK_FORMATS[output_format]
+        with open_sink(shard_path(Path(output_folder) / f"papers{suffix}", shard)) as sink, \
+                open_sink(shard_path(Path(output_folder) / f"section_index{suffix}", shard),
+                          value_name="sections") as index_sink:
+            for result in results:
+                sink.write_all(result["simple"].items())
+                index_sink.write_all(result["section_index"].items())
+
+
+@cli.command()
+@click.option("--question-list", type=click.Path(exists=True), show_default=True,
+              default="data/external/question_list_text_4th_run_combined.txt")
+@click.option("--input-folder", type=click.Path(exists=True), default="data/raw/all_papers", show_default=True,
+              help="Folder with .txt and .pdf papers.")
+@click.option("--output-json", type=click.Path(), default="data/interim/qa_result.json", show_default=True)
+@click.option("--routes", type=click.Path(exists=True), default=None,
+              help="JSON file of question groups and the section labels they need (see QuestionRouter). Papers with "
+                   "a section index (`parse --section-index`) are then sent only those sections per group.")
+@click.option("--reduce-tokens", is_flag=True,
+              help="Remove acknowledgements, captions, repeated headings, references... from the prompts, and write "
+                   "the tokens saved per paper next to OUTPUT_JSON (*_token_reduction.json).")
+@click.option("--reduction-config", type=click.Path(exists=True), default=None,
+              help="JSON file of TextReducer settings for --reduce-tokens. Defaults to the built-in rules.")
+@click.option("--pdf-jobs", type=int, default=1, show_default=True,
+              help="Processes extracting the text of PDFs (across files and pages of long files) ahead of the "
+                   "LLM requests.")
+@click.option("--ocr", type=click.Choice(OCR_MODES), default="pages", show_default=True,
+              help="OCR of PDFs: only the pages without readable text, every page of a PDF without readable text, "
+                   "or none.")
+@click.option("--pdf-cache", type=click.Path(), default="data/interim/pdf_text_cache", show_default=True,
+              help="Folder of extracted (and OCRed) PDF text keyed by PDF content hash. Unchanged PDFs are not "
+                   "extracted again, e.g. when asking new questions.")
+@click.option("--no-pdf-cache", is_flag=True, help="Extract every PDF, without reading or writing the cache.")
+@parallel_options
+@shard_option
+def qa(question_list, input_folder, output_json, routes, reduce_tokens, reduction_config, pdf_jobs, ocr, pdf_cache,
+       no_pdf_cache, jobs, executor, shard):
+    """Answer the questions in QUESTION_LIST for every paper in INPUT_FOLDER."""
+    from src.features.openai_gpt4 import PaperReviewer
+    from src.features.question_routing import QuestionRouter
+    from src.features.token_reduction import TextReducer
+
+    text_reducer = None
+    if reduce_tokens or reduction_config is not None:
+        text_reducer = TextReducer() if reduction_config is None else TextReducer.from_json(reduction_config)
+    reviewer = PaperReviewer(question_list, openai_api_key=os.getenv('OPENAI_API_KEY'),
+                             question_router=None if routes is None else QuestionRouter.from_json(routes),
+                             text_reducer=text_reducer, ocr=ocr,
+                             extraction_cache=None if no_pdf_cache else pdf_cache)
+    reviewer.qa_from_folder(input_folder, str(shard_path(output_json, shard)), jobs=jobs, executor=executor,
+                            shard=shard, pdf_jobs=pdf_jobs)
+
+
+@cli.command()
+@click.option("--output-json", type=click.Path(), default="data/interim/qa_result.json", show_default=True)
+@click.option("--unavailable-papers-csv", type=click.Path(), default="data/raw/unavailable_papers.csv",
+              show_default=True)
+@click.option("--papers-folder", type=click.Path(), default="data/raw/papers", show_default=True,
+              help="OUTPUT_FOLDER of `parse --format jsonl/parquet`. Text files of `--format txt` need no merge.")
+def merge(output_json, unavailable_papers_csv, papers_folder):
+    """Merge the .shard-i-of-N outputs of download, parse and qa into the canonical files.
+
+    These are the Q&A json (and csv), the unavailable-paper csv, and the papers and section_index jsonl/parquet
+    files of `parse`."""
+    from src.pipeline.sharding import find_shard_paths, merge_qa_json, merge_sink_shards, merge_unavailable_papers
+    from src.pipeline.sinks import SINK_FORMATS
+    qa_shard_paths = find_shard_paths(output_json)
+    if qa_shard_paths:
+        merge_qa_json(output_json, qa_shard_paths)
+    unavailable_shard_paths = find_shard_paths(unavailable_papers_csv)
+    if unavailable_shard_paths:
+        merge_unavailable_papers(unavailable_papers_csv, unavailable_shard_paths)
+    parse_shard_count = 0
+    for suffix in SINK_FORMATS.values():
+        for name, value_name in (("papers", "text"), ("section_index", "sections")):
+            sink_path = Path(papers_folder) / f"{name}{suffix}"
+            sink_shard_paths = find_shard_paths(sink_path)
+            if sink_shard_paths:
+                merge_sink_shards(sink_path, sink_shard_paths, value_name=value_name)
+                parse_shard_count += len(sink_shard_paths)
+    click.echo(f"Merged {len(qa_shard_paths)} Q&A shards, {len(unavailable_shard_paths)} unavailable-paper shards "
+               f"and {parse_shard_count} parse output shards.")
+
+
+@cli.command()
+@click.option("--qa-json", type=click.Path(exists=True), default="data/interim/qa_result.json", show_default=True)
+@click.option("--citation-csv", type=click.Path(exists=True), default="data/processed/4th_run/citation_df.csv",
+              show_default=True)
+@click.option("--output-dir", type=click.Path(), default="data/processed/4th_run", show_default=True)
+@click.option("--overwrite", is_flag=True, help="Re-run geocoding even if its outputs exist.")
+@click.option("--format", "table_format", type=click.Choice(["parquet", "arrow", "csv"]), default="parquet",
+              show_default=True, help="Format of the extracted tables.")
+@click.option("--export-csv/--no-export-csv", default=True, show_default=True,
+              help="Also write a csv copy of each table (used by the R scripts).")
+@parallel_options
+def extract(qa_json, citation_csv, output_dir, overwrite, table_format, export_csv, jobs, executor):
+    """Extract the Q&A answers into one csv file per section."""
+    from src.features.extract_information import ExtractInformation
+
+    extract_information = ExtractInformation(qa_json, citation_csv, output_dir,
+                                             openai_api_key=os.getenv('OPENAI_API_KEY'),
+                                             overwrite=overwrite, jobs=jobs, executor=executor,
+                                             output_format=table_format, export_csv=export_csv)
+    extract_information()
+
+
+@cli.command()
+@click.option("--question-list", type=click.Path(exists=True), show_default=True,
+              default="data/external/question_list_text_4th_run_combined.txt")
+@click.option("--raw-path", type=click.Path(), default="data/raw/", show_default=True,
+              help="Folder with xml/ and pdf/ to watch. Parsed papers go to RAW_PATH/papers.")
+@click.option("--export-folder", type=click.Path(), default=None,
+              help="Also watch this folder for new Scopus/ASReview exports and download their papers.")
+@click.option("--output-json", type=click.Path(), default="data/interim/qa_result.json", show_default=True)
+@click.option("--citation-csv", type=click.Path(), default=None,
+              help="If given with --output-dir, add the answers of new papers to the extracted tables.")
+@click.option("--output-dir", type=click.Path(), default=None)
+@click.option("--format", "table_format", type=click.Choice(["parquet", "arrow", "csv"]), default="parquet",
+              show_default=True, help="Format of the extracted tables.")
+@click.option("--interval", type=float, default=1.0, show_default=True, help="Seconds between polls.")
+@click.option("--state-path", type=click.Path(), default="data/interim/watch_state.json", show_default=True,
+              help="Where to keep the list of processed files.")
+@click.option("--max-attempts", type=int, default=3, show_default=True,
+              help="Times a failing file (e.g. API rate limit or timeout) is tried on later polls before giving up.")
+def watch(question_list, raw_path, export_folder, output_json, citation_csv, output_dir, table_format, interval,
+          state_path, max_attempts):
+    """Watch the raw folders and parse, answer and extract new papers as they land."""
+    from src.data.download_paper import PaperDownloader
+    from src.data.parse_data import Parser
+    from src.features.openai_gpt4 import PaperReviewer
+    from src.pipeline.watch import WatchDaemon
+
+    unavailable_papers_csv = str(Path(raw_path) / "unavailable_papers.csv")
+    paper_downloader = None
+    if export_folder is not None:
+        paper_downloader = PaperDownloader(os.getenv('ELSEVIER_API_KEY'), os.getenv('INST_TOKEN'),
+                                           unavailable_papers_csv)
+    extractor = None
+    if citation_csv is not None and output_dir is not None:
+        from src.features.extract_information import ExtractInformation
+        if not Path(output_json).exists():
+            raise click.UsageError("--output-json must exist to extract into --output-dir")
+        extractor = ExtractInformation(output_json, citation_csv, output_dir,
+                                       openai_api_key=os.getenv('OPENAI_API_KEY'), output_format=table_format)
+    daemon = WatchDaemon(Parser([], unavailable_papers_csv),
+                         PaperReviewer(question_list, openai_api_key=os.getenv('OPENAI_API_KEY')),
+                         str(Path(raw_path) / "xml"), str(Path(raw_path) / "pdf"), str(Path(raw_path) / "papers"),
+                         output_json, export_folder=export_folder, paper_downloader=paper_downloader,
+                         extractor=extractor, interval=interval, state_path=state_path, max_attempts=max_attempts)
+    daemon.run()
+
+
+@cli.command()
+@click.option("--aspect-csv", type=click.Path(exists=True), default="data/processed/2nd_run/aspect.csv",
+              show_default=True)
+@click.option("--summary-csv", type=click.Path(exists=True), default="data/processed/2nd_run/summary.csv",
+              show_default=True)
+@click.option("--image-data-type-csv", type=click.Path(exists=True),
+              default="data/processed/2nd_run/image_data_type.csv", show_default=True)
+@click.option("--overwrite", is_flag=True, help="Re-run even if the recalibrated files exist.")
+@parallel_options
+def recalibrate(aspect_csv, summary_csv, image_data_type_csv, overwrite, jobs, executor):
+    """Reclassify aspects and image data types with GPT-4."""
+    from src.models.predict_model import reclibrate
+
+    reclibrate(str(os.getenv('OPENAI_API_KEY')), aspect_csv, summary_csv, image_data_type_csv,
+               overwrite=overwrite, jobs=jobs, executor=executor)
+
+
+@cli.command()
+@click.option("--citation-csv", type=click.Path(exists=True), show_default=True,
+              default="data/external/asreview_dataset_all_visual-urban-perception-2023-07-09-2023-07-17.csv")
+@click.option("--complementary-excel", type=click.Path(exists=True), show_default=True,
+              default="data/processed/2nd_run/input_df_with_title_doi_edited.xlsx")
+@click.option("--aspect-csv", type=click.Path(exists=True), default="data/processed/2nd_run/recalibrated_aspect.csv",
+              show_default=True)
+@click.option("--summary-csv", type=click.Path(exists=True), default="data/processed/2nd_run/summary.csv",
+              show_default=True)
+@click.option("--limitation-opportunity-csv", type=click.Path(exists=True), show_default=True,
+              default="data/processed/2nd_run/limitation_future_opportunity.csv")
+@click.option("--output-csv", type=click.Path(), default="data/processed/2nd_run/review_by_aspect.csv",
+              show_default=True)
+@click.option("--citation-style", type=click.Choice(["plain", "latex"]), default="latex", show_default=True)
+@parallel_options
+def review(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_opportunity_csv, output_csv,
+           citation_style, jobs, executor):
+    """Write a literature review for each aspect."""
+    from src.models.predict_model import main
+
+    main(citation_csv, complementary_excel, aspect_csv, summary_csv, limitation_opportunity_csv, output_csv,
+         str(os.getenv('OPENAI_API_KEY')), citation_style=citation_style, jobs=jobs, executor=executor)
+
+
+if __name__ == "__main__":
+    cli()
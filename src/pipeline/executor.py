@@ -0,0 +1,127 @@
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from tqdm import tqdm
+
+# "thread" suits network-bound stages (downloads, LLM calls, geocoding),
+# "process" suits CPU-bound stages (parsing, PDF text extraction)
+EXECUTORS = ["serial", "thread", "process"]
+
+
+def imap_jobs(func: Callable[[Any], Any], items: Iterable, jobs: int = 1, executor: str = "serial",
+              desc: str = None, total: int = None, chunksize: int = 1) -> Iterator:
+    """Apply func to every item and yield the results in the order of items.
+
+    Args:
+        func (Callable): function to apply. With executor="process", it has to be picklable
+            (a module-level function or a bound method of a picklable object).
+        items (Iterable): inputs to func
+        jobs (int): number of workers. Defaults to 1.
+        executor (str): "serial", "thread", or "process". Defaults to "serial".
+        desc (str): description for the progress bar. No progress bar if None.
+        total (int): number of items for the progress bar
+        chunksize (int): number of items sent to a process at a time. Only used with executor="process".
+
+    Yields:
+        results of func, in the same order as items
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}")
+    if desc is not None:
+        if total is None and hasattr(items, "__len__"):
+            total = len(items)
+        progress = tqdm(total=total, desc=desc)
+    else:
+        progress = None
+
+    if executor == "serial" or jobs <= 1:
+        results = map(func, items)
+        pool = None
+    elif executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=jobs)
+        results = pool.map(func, items)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(func, items, chunksize=chunksize)
+    try:
+        for result in results:
+            if progress is not None:
+                progress.update(1)
+            yield result
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if progress is not None:
+            progress.close()
+
+
+def map_jobs(func: Callable[[Any], Any], items: Iterable, jobs: int = 1, executor: str = "serial",
+             desc: str = None, total: int = None, chunksize: int = 1) -> list:
+    """same as imap_jobs but returns a list"""
+    return list(imap_jobs(func, items, jobs=jobs, executor=executor, desc=desc, total=total, chunksize=chunksize))
+
+
+def imap_jobs_fed(func: Callable[[Any], Any], items: Iterable, jobs: int = 1, executor: str = "serial",
+                  skip: Optional[Callable[[Any], bool]] = None) -> Iterator[Tuple[Any, Any]]:
+    """Apply func to every item as soon as it is read from items, and yield (item, result) in the order of items.
+
+    Unlike imap_jobs, which submits every item at once, a background thread reads items and submits each one as it
+    comes, so reading items may block (e.g. to bound the work done ahead of the consumer) without holding back
+    the results that are done. When the generator is closed, the items not started yet are cancelled and the
+    workers are shut down.
+
+    Args:
+        func (Callable): function to apply, picklable with executor="process"
+        items (Iterable): inputs to func, read once
+        jobs (int): number of workers. Defaults to 1.
+        executor (str): "serial", "thread", or "process". Defaults to "serial".
+        skip (Callable): items for which skip(item) is true are not sent to func, and their result is None
+
+    Yields:
+        (item, result of func), in the same order as items
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}")
+    if executor == "serial" or jobs <= 1:
+        for item in items:
+            yield item, None if skip is not None and skip(item) else func(item)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=jobs) if executor == "thread" else ProcessPoolExecutor(max_workers=jobs)
+    submitted = queue.Queue()
+    stop = threading.Event()
+
+    def feed():
+        # an error reading items is raised by the consumer, after the items before it
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                submitted.put((item, None if skip is not None and skip(item) else pool.submit(func, item)))
+        except Exception as e:
+            submitted.put(e)
+        finally:
+            submitted.put(None)
+
+    threading.Thread(target=feed, name="imap-feed", daemon=True).start()
+    try:
+        while True:
+            entry = submitted.get()
+            if entry is None:
+                break
+            if isinstance(entry, Exception):
+                raise entry
+            item, future = entry
+            yield item, None if future is None else future.result()
+    finally:
+        stop.set()
+        while True:
+            try:
+                entry = submitted.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(entry, tuple) and entry[1] is not None:
+                entry[1].cancel()
+        pool.shutdown(wait=True)
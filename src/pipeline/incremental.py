@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from dotenv import find_dotenv, load_dotenv
+
+from src.pipeline.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+
+class Stage:
+    """A pipeline stage with declared input and output files or folders.
+
+    Args:
+        name (str): name of the stage
+        func (Callable[[List[str]], None]): function that runs the stage and writes its outputs. It receives the inputs that changed since the last run.
+        inputs (List[str]): files or folders the stage reads
+        outputs (List[str]): files or folders the stage writes
+        params (dict): settings that change the outputs (e.g. model names). They are fingerprinted with the inputs.
+    """
+
+    def __init__(self, name: str, func: Callable[[List[str]], None], inputs: List[str], outputs: List[str],
+                 params: Optional[dict] = None) -> None:
+        self.name = name
+        self.func = func
+        self.inputs = [str(Path(path)) for path in inputs]
+        self.outputs = [str(Path(path)) for path in outputs]
+        self.params = params if params is not None else {}
+
+
+class IncrementalRunner:
+    """Run a DAG of stages and re-execute only the stages whose inputs changed.
+
+    Inputs are fingerprinted by content hash (sha256). The last fingerprint of each stage is kept
+    in a JSON manifest together with a (size, mtime) -> hash cache, so unchanged files are not re-read.
+    A stage runs when
+        - it has never run,
+        - one of its outputs is missing,
+        - the hash of its inputs or params differs from the manifest.
+    Stages are ordered by matching the outputs of one stage to the inputs of another, so a changed
+    upstream output makes the downstream stages run as well.
+    """
+
+    def __init__(self, stages: List[Stage], manifest_path: str = "data/interim/pipeline_manifest.json") -> None:
+        self.stages = self._sort_stages(stages)
+        self.manifest_path = Path(manifest_path)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        return {"files": {}, "stages": {}}
+
+    def _save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+    @staticmethod
+    def _depends_on(stage: Stage, upstream: Stage) -> bool:
+        # a stage depends on another if one of its inputs is (inside) an output of the other, or vice versa
+        for input_path in stage.inputs:
+            for output_path in upstream.outputs:
+                if input_path == output_path or input_path.startswith(output_path + os.sep) \
+                        or output_path.startswith(input_path + os.sep):
+                    return True
+        return False
+
+    def _sort_stages(self, stages: List[Stage]) -> List[Stage]:
+        """topologically sort stages, keeping the declared order where there is no dependency
+        """
+        sorted_stages = []
+        remaining = list(stages)
+        while remaining:
+            for stage in remaining:
+                upstream_stages = [other for other in remaining if other is not stage and self._depends_on(stage, other)]
+                if len(upstream_stages) == 0:
+                    sorted_stages.append(stage)
+                    remaining.remove(stage)
+                    break
+            else:
+                raise ValueError("Stages have a circular dependency: " + ", ".join(stage.name for stage in remaining))
+        return sorted_stages
+
+    def _hash_file(self, path: Path) -> str:
+        stat = path.stat()
+        cached = self.manifest["files"].get(str(path))
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self.manifest["files"][str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, path: str) -> str:
+        """content hash of a file, or of all the files in a folder (including their relative paths)
+        """
+        path = Path(path)
+        if path.is_file():
+            return self._hash_file(path)
+        if path.is_dir():
+            sha = hashlib.sha256()
+            for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+                sha.update(str(file_path.relative_to(path)).encode())
+                sha.update(self._hash_file(file_path).encode())
+            return sha.hexdigest()
+        return "missing"
+
+    def _stage_fingerprint(self, stage: Stage) -> dict:
+        fingerprint = {path: self.fingerprint(path) for path in stage.inputs}
+        fingerprint["params"] = hashlib.sha256(json.dumps(stage.params, sort_keys=True).encode()).hexdigest()
+        return fingerprint
+
+    def changed_inputs(self, stage: Stage) -> List[str]:
+        """inputs (and "params") whose fingerprint differs from the last run of the stage
+        """
+        previous = self.manifest["stages"].get(stage.name, {})
+        current = self._stage_fingerprint(stage)
+        return [key for key, digest in current.items() if previous.get(key) != digest]
+
+    def is_stale(self, stage: Stage) -> bool:
+        if any(not Path(path).exists() for path in stage.outputs):
+            return True
+        return len(self.changed_inputs(stage)) > 0
+
+    def run(self, targets: Optional[List[str]] = None, force: bool = False) -> List[str]:
+        """run stale stages in dependency order
+
+        Args:
+            targets (Optional[List[str]]): names of stages to consider. Defaults to all stages.
+            force (bool): run the stages even if they are up to date.
+
+        Returns:
+            List[str]: names of the stages that were executed
+        """
+        executed = []
+        for stage in self.stages:
+            if targets is not None and stage.name not in targets:
+                continue
+            if not force and not self.is_stale(stage):
+                logger.info(f"Skipping {stage.name}: up to date")
+                continue
+            changed_inputs = self.changed_inputs(stage)
+            logger.info(f"Running {stage.name} (changed: {', '.join(changed_inputs)})")
+            # fingerprint before running so that inputs modified during the run are picked up next time
+            fingerprint = self._stage_fingerprint(stage)
+            stage.func(changed_inputs)
+            self.manifest["stages"][stage.name] = fingerprint
+            self._save_manifest()
+            executed.append(stage.name)
+        self._save_manifest()
+        return executed
+
+
+def build_review_stages(config: dict) -> List[Stage]:
+    """declare the stages of the review pipeline
+
+    Args:
+        config (dict): paths and api keys. See the __main__ block for the keys.
+
+    Returns:
+        List[Stage]: make_dataset, qa, extract, recalibrate, and review stages
+    """
+    from src.features.extract_information import ExtractInformation
+    from src.pipeline.tables import table_path
+
+    raw_path = Path(config["raw_path"])
+
+    def run_make_dataset(changed_inputs):
+        from src.data.make_dataset import main
+        main(config["raw_path"], config["elsevier_api_key"], config["inst_token"],
+             initial_input_folder=config["initial_input_folder"],
+             abstract_filtered_input_filepath=config["abstract_filtered_input_filepath"],
+             ris_filepath=config["ris_filepath"])
+
+    def run_qa(changed_inputs):
+        from src.features.openai_gpt4 import PaperReviewer
+        reviewer = PaperReviewer(config["question_list_text"], openai_api_key=config["openai_api_key"])
+        # results are checkpointed by file name, so only new papers are asked unless the questions changed
+        if str(Path(config["question_list_text"])) in changed_inputs and Path(config["qa_json"]).exists():
+            os.remove(config["qa_json"])
+        reviewer.qa_from_folder(config["paper_folder"], config["qa_json"])
+
+    def run_extract(changed_inputs):
+        from src.features.extract_information import ExtractInformation
+        extract_information = ExtractInformation(config["qa_json"], config["citation_csv"], config["extract_dir"],
+                                                 openai_api_key=config["openai_api_key"])
+        # rows geocoded by an earlier run are reused, so only new papers and affiliations are geocoded
+        extract_information()
+
+    def run_recalibrate(changed_inputs):
+        from src.models.predict_model import reclibrate
+        reclibrate(config["openai_api_key"], config["aspect_csv"], config["summary_csv"],
+                   config["image_data_type_csv"], overwrite=True)
+
+    def run_review(changed_inputs):
+        from src.models.predict_model import main
+        main(config["citation_csv"], config["complementary_excel"], config["recalibrated_aspect_csv"],
+             config["summary_csv"], config["limitation_opportunity_csv"], config["review_csv"],
+             config["openai_api_key"])
+
+    return [
+        Stage("make_dataset", run_make_dataset,
+              inputs=[config["initial_input_folder"], config["abstract_filtered_input_filepath"]],
+              outputs=[str(raw_path / "papers"), str(raw_path / "unavailable_papers.csv")]),
+        Stage("qa", run_qa,
+              inputs=[config["question_list_text"], config["paper_folder"]],
+              outputs=[config["qa_json"]],
+              params={"model": "gpt-4-turbo-preview"}),
+        Stage("extract", run_extract,
+              inputs=[config["qa_json"], config["citation_csv"]],
+              outputs=[str(table_path(Path(config["extract_dir"]) / name, "parquet"))
+                       for name in ExtractInformation.TABLES]),
+        Stage("recalibrate", run_recalibrate,
+              inputs=[config["aspect_csv"], config["summary_csv"], config["image_data_type_csv"]],
+              outputs=[config["recalibrated_aspect_csv"],
+                       str(Path(config["image_data_type_csv"]).parent
+                           / ("recalibrated_image_data_type" + Path(config["image_data_type_csv"]).suffix))],
+              params={"model": "gpt-4"}),
+        Stage("review", run_review,
+              inputs=[config["citation_csv"], config["complementary_excel"], config["recalibrated_aspect_csv"],
+                      config["summary_csv"], config["limitation_opportunity_csv"]],
+              outputs=[config["review_csv"]],
+              params={"model": "gpt-3.5-turbo-16k"}),
+    ]
+
+
+if __name__ == "__main__":
+    # find .env automagically by walking up directories until it's found, then
+    # load up the .env entries as environment variables
+    load_dotenv(find_dotenv())
+    config = {
+        "elsevier_api_key": os.getenv('ELSEVIER_API_KEY'),
+        "inst_token": os.getenv('INST_TOKEN'),
+        "openai_api_key": os.getenv('OPENAI_API_KEY'),
+        "initial_input_folder": "data/external/scopus/",
+        "abstract_filtered_input_filepath": "data/external/asreview_dataset_all_visual-urban-perception-2023-07-09-2023-07-17.xlsx",
+        "ris_filepath": "data/external/scopus_filtered.ris",
+        "raw_path": "data/raw/",
+        "paper_folder": "data/raw/papers",
+        "question_list_text": "data/external/question_list_text_4th_run_combined.txt",
+        "qa_json": "data/interim/qa_result.json",
+        "citation_csv": "data/processed/4th_run/citation_df.csv",
+        "extract_dir": "data/processed/4th_run",
+        "complementary_excel": "data/processed/2nd_run/input_df_with_title_doi_edited.xlsx",
+        "aspect_csv": "data/processed/2nd_run/aspect.csv",
+        "recalibrated_aspect_csv": "data/processed/2nd_run/recalibrated_aspect.csv",
+        "summary_csv": "data/processed/2nd_run/summary.csv",
+        "limitation_opportunity_csv": "data/processed/2nd_run/limitation_future_opportunity.csv",
+        "image_data_type_csv": "data/processed/2nd_run/image_data_type.csv",
+        "review_csv": "data/processed/2nd_run/review_by_aspect.csv",
+    }
+    runner = IncrementalRunner(build_review_stages(config))
+    runner.run()
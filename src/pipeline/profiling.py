@@ -0,0 +1,347 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+try:
+    import psutil
+except ImportError:
+    # without psutil, stages have no peak RSS and the report has the peak of the whole process
+    psutil = None
+    import resource
+
+from src.pipeline.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+# the profiler of the current run. profile_stage() is a no-op when it is None
+_active_profiler = None
+
+PROFILERS = ["cprofile", "pyinstrument"]
+
+
+def _cpu_time() -> float:
+    # includes finished child processes (e.g. process pools and ocrmypdf)
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _process_peak_rss() -> int:
+    """peak RSS of this process since it started, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _rss() -> Optional[int]:
+    """current RSS of this process and its children in bytes, None without psutil"""
+    if psutil is None:
+        return None
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss
+
+
+class _MemorySampler:
+    """poll RSS in a background thread and keep the peak"""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        # nothing to sample without psutil
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.peak is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, _rss())
+
+
+class StageRecord:
+    """Counters of one stage, accumulated over all the times the stage runs."""
+
+    def __init__(self, name: str, parent: Optional[str]) -> None:
+        self.name = name
+        self.parent = parent
+        self.calls = 0
+        self.items = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        # None if it cannot be measured (without psutil)
+        self.peak_rss = None
+        self.profile_path = None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "calls": self.calls,
+            "items": self.items,
+            "wall_time_s": round(self.wall_time, 4),
+            "cpu_time_s": round(self.cpu_time, 4),
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 2) if self.peak_rss is not None else None,
+            "items_per_s": round(self.items / self.wall_time, 4) if self.wall_time > 0 else None,
+            "profile_path": self.profile_path,
+        }
+
+
+class RunProfiler:
+    """Record wall time, CPU time, peak RSS and item counts of each pipeline stage.
+
+    Use as a context manager around a run. Code wrapped in profile_stage(name), and the items produced by an
+    iterator wrapped in profile_iter(name, ...), are recorded, and a JSON report is written to report_path on exit
+    so that runs can be compared. Stages can be nested (e.g. "ocr" inside "qa"); nested stages keep the name of
+    their parent. Stage peak RSS needs psutil, without it only the peak of the whole process is reported.
+
+    Args:
+        report_path (str): path to the JSON report
+        profiler (Optional[str]): "cprofile" or "pyinstrument" to also profile the outermost stages.
+            Profiles are saved next to the report. Only the thread that runs the stage is profiled.
+    """
+
+    def __init__(self, report_path: str, profiler: Optional[str] = None) -> None:
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {PROFILERS}")
+        self.report_path = Path(report_path)
+        self.profiler = profiler
+        self.records = {}
+        self._profilers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        global _active_profiler
+        self._started_at = datetime.now().isoformat()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = _cpu_time()
+        _active_profiler = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active_profiler
+        _active_profiler = None
+        self.write_report()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _push(self, name: str) -> "_Frame":
+        frame = _Frame(name)
+        self._stack().append(frame)
+        return frame
+
+    def _pop(self, frame: "_Frame") -> None:
+        # by identity: a generator abandoned or resumed out of order must not pop the frame of another stage
+        stack = self._stack()
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is frame:
+                del stack[index]
+                return
+
+    def _parent(self) -> Optional[str]:
+        stack = self._stack()
+        return stack[-1].name if stack else None
+
+    def _record(self, name: str, parent: Optional[str], wall_time: float, cpu_time: float, items: int,
+                peak_rss: Optional[int]) -> None:
+        with self._lock:
+            if name not in self.records:
+                self.records[name] = StageRecord(name, parent)
+            record = self.records[name]
+            record.calls += 1
+            record.items += items
+            record.wall_time += wall_time
+            record.cpu_time += cpu_time
+            if peak_rss is not None:
+                record.peak_rss = max(record.peak_rss or 0, peak_rss)
+        logger.info(f"{name}: {wall_time:.2f}s wall, {cpu_time:.2f}s CPU, {items} items")
+
+    def _start_profiler(self, name: str):
+        if name not in self._profilers:
+            if self.profiler == "cprofile":
+                import cProfile
+                self._profilers[name] = cProfile.Profile()
+            else:
+                from pyinstrument import Profiler
+                self._profilers[name] = Profiler()
+        profiler = self._profilers[name]
+        if self.profiler == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+        return profiler
+
+    def _stop_profiler(self, profiler) -> None:
+        if self.profiler == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        parent = self._parent()
+        # profile only the outermost stage of the main thread, as profilers cannot be nested
+        profiler = None
+        if self.profiler is not None and parent is None and threading.current_thread() is threading.main_thread():
+            profiler = self._start_profiler(name)
+        frame = self._push(name)
+        counter = _ItemCounter(items)
+        start_wall = time.perf_counter()
+        start_cpu = _cpu_time()
+        try:
+            with _MemorySampler() as sampler:
+                yield counter
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = _cpu_time() - start_cpu
+            self._pop(frame)
+            if profiler is not None:
+                self._stop_profiler(profiler)
+            self._record(name, parent, wall_time, cpu_time, counter.items, sampler.peak)
+
+    def iter_stage(self, name: str, iterable: Iterable, items: int = 0) -> Iterator:
+        """yield the items of iterable, and record the time spent producing them as the stage name
+
+        The time the consumer spends between items is not counted. The stage is recorded once, when iterable is
+        exhausted or the iteration is abandoned.
+        """
+        iterator = iter(iterable)
+        parent = None
+        wall_time = 0.0
+        cpu_time = 0.0
+        peak_rss = None
+        started = False
+        try:
+            while True:
+                if not started:
+                    parent = self._parent()
+                    started = True
+                frame = self._push(name)
+                start_wall = time.perf_counter()
+                start_cpu = _cpu_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall_time += time.perf_counter() - start_wall
+                    cpu_time += _cpu_time() - start_cpu
+                    self._pop(frame)
+                    rss = _rss()
+                    if rss is not None:
+                        peak_rss = max(peak_rss or 0, rss)
+                yield item
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+            if started:
+                self._record(name, parent, wall_time, cpu_time, items, peak_rss)
+
+    def _save_profiles(self) -> None:
+        for name, profiler in self._profilers.items():
+            if self.profiler == "cprofile":
+                profile_path = self.report_path.with_name(f"{self.report_path.stem}_{name}.prof")
+                profiler.dump_stats(str(profile_path))
+            else:
+                profile_path = self.report_path.with_name(f"{self.report_path.stem}_{name}.html")
+                profile_path.write_text(profiler.output_html())
+            self.records[name].profile_path = str(profile_path)
+
+    def _peak_rss(self) -> int:
+        if psutil is None:
+            return _process_peak_rss()
+        return max([record.peak_rss for record in self.records.values() if record.peak_rss is not None] + [_rss()])
+
+    def write_report(self) -> dict:
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self._save_profiles()
+        report = {
+            "started_at": self._started_at,
+            "argv": sys.argv,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "wall_time_s": round(time.perf_counter() - self._start_wall, 4),
+            "cpu_time_s": round(_cpu_time() - self._start_cpu, 4),
+            "peak_rss_mb": round(self._peak_rss() / 2 ** 20, 2),
+            "stages": [record.to_dict() for record in self.records.values()],
+        }
+        with open(self.report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Wrote profiling report to " + str(self.report_path))
+        return report
+
+
+class _Frame:
+    """an entry of the stack of running stages of a thread, removed by identity"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class _ItemCounter:
+    """number of items processed by a stage. Set or increase .items inside profile_stage()"""
+
+    def __init__(self, items: int = 0) -> None:
+        self.items = items
+
+
+@contextmanager
+def profile_stage(name: str, items: int = 0):
+    """Record a pipeline stage in the active RunProfiler, if any.
+
+    Args:
+        name (str): name of the stage (e.g. "download", "parse", "ocr", "qa")
+        items (int): number of items processed. Can also be updated with the yielded counter.
+
+    Yields:
+        counter with an .items attribute
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        yield _ItemCounter(items)
+        return
+    with profiler.stage(name, items=items) as counter:
+        yield counter
+
+
+def profile_iter(name: str, iterable: Iterable, items: int = 0) -> Iterator:
+    """Yield the items of iterable, and record the time spent producing them as a stage of the active RunProfiler.
+
+    Use it instead of wrapping the body of a generator in profile_stage, which would also count what the consumer
+    does between items (e.g. writing the results, or Q&A).
+
+    Args:
+        name (str): name of the stage
+        iterable (Iterable): e.g. a generator doing the work of the stage
+        items (int): number of items processed
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        yield from iterable
+        return
+    yield from profiler.iter_stage(name, iterable, items=items)
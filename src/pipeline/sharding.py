@@ -0,0 +1,200 @@
+import csv
+import hashlib
+import json
+import re
+import threading
+import urllib.parse
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from src.pipeline.util.log_util import get_logger
+
+if TYPE_CHECKING:
+    # polars is slow to import and only needed to merge the unavailable-paper lists, so it is imported there
+    import polars as pl
+
+logger = get_logger(__name__)
+
+# a shard is (index, count) with 0 <= index < count. None means "all papers"
+Shard = Tuple[int, int]
+
+_SHARD_SUFFIX = re.compile(r"\.shard-(\d+)-of-(\d+)$")
+# the download and parse stages may append to the same unavailable-paper csv from several threads
+_unavailable_papers_lock = threading.Lock()
+
+
+def parse_shard(spec: str) -> Shard:
+    """parse "i/N" (e.g. "0/4") into (i, N)"""
+    try:
+        index, count = [int(value) for value in spec.split("/")]
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, e.g. 0/4, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be between 0 and N-1, got {spec!r}")
+    return index, count
+
+
+def normalize_doi(doi: Optional[str]) -> str:
+    # DOIs are case-insensitive and sometimes come as links
+    doi = (doi or "").strip().lower()
+    for prefix in ["https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"]:
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi
+
+
+def shard_of(doi: Optional[str], count: int) -> int:
+    """index of the shard that doi belongs to. Stable across machines and Python runs"""
+    digest = hashlib.sha1(normalize_doi(doi).encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) % count
+
+
+def in_shard(doi: Optional[str], shard: Optional[Shard]) -> bool:
+    if shard is None:
+        return True
+    index, count = shard
+    return shard_of(doi, count) == index
+
+
+def doi_from_path(path: Union[str, Path]) -> str:
+    """recover the DOI from the name of a downloaded or parsed paper
+
+    - xml/<quote_plus("https://api.elsevier.com/content/article/doi/<DOI>")>.xml
+    - papers/<DOI with "/" replaced by "_">.txt
+    - pdf/<DOI>.pdf, i.e. pdf/<prefix>/<suffix>.pdf
+    Other names are returned as they are, so that they still get a stable shard.
+    """
+    path = Path(path)
+    stem = urllib.parse.unquote_plus(path.stem)
+    if "/doi/" in stem:
+        return stem.split("/doi/", 1)[1]
+    if stem.startswith("10.") and "_" in stem and "/" not in stem:
+        # DOI prefixes ("10.1016") have no underscores, so the first one is the "/"
+        return stem.replace("_", "/", 1)
+    if path.suffix == ".pdf" and path.parent.name.startswith("10."):
+        return path.parent.name + "/" + stem
+    return stem
+
+
+def shard_path(path: Union[str, Path], shard: Optional[Shard]) -> Path:
+    """path of the output of one shard, e.g. qa_result.json -> qa_result.shard-0-of-4.json"""
+    path = Path(path)
+    if shard is None:
+        return path
+    index, count = shard
+    return path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}")
+
+
+def find_shard_paths(path: Union[str, Path]) -> List[Path]:
+    """per-shard outputs of path, sorted by shard index. Warns if some shards are missing"""
+    path = Path(path)
+    found = {}
+    for candidate in path.parent.glob(f"{path.stem}.shard-*-of-*{path.suffix}"):
+        match = _SHARD_SUFFIX.search(candidate.name[:len(candidate.name) - len(path.suffix)])
+        if match:
+            found[(int(match.group(1)), int(match.group(2)))] = candidate
+    counts = {count for _, count in found}
+    if len(counts) > 1:
+        raise ValueError(f"{path} has shards from runs with different shard counts: {sorted(counts)}")
+    for count in counts:
+        missing = sorted(set(range(count)) - {index for index, _ in found})
+        if missing:
+            logger.warning(f"{path}: shards {missing} of {count} are missing")
+    return [found[key] for key in sorted(found)]
+
+
+def merge_qa_json(output_json_file_path: str, shard_paths: Optional[List[Path]] = None) -> dict:
+    """merge the Q&A json files of all shards into output_json_file_path, and the csv files next to them
+
+    Results already in output_json_file_path are kept, so merging twice is safe.
+    """
+    if shard_paths is None:
+        shard_paths = find_shard_paths(output_json_file_path)
+    output_dict = {}
+    if Path(output_json_file_path).exists():
+        with open(output_json_file_path, "r") as infile:
+            output_dict = json.load(infile)
+    for path in shard_paths:
+        with open(path, "r") as infile:
+            output_dict.update(json.load(infile))
+    with open(output_json_file_path, "w") as outfile:
+        json.dump(output_dict, outfile)
+
+    # the csv files have the question list as header, so take it from the shards
+    csv_paths = [path.with_suffix(".csv") for path in shard_paths if path.with_suffix(".csv").exists()]
+    if csv_paths:
+        with open(csv_paths[0], "r", newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+        rows = [header] + [[file_name, json.dumps(answers)] for file_name, answers in output_dict.items()]
+        with open(output_json_file_path.replace(".json", ".csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+    logger.info(f"Merged {len(shard_paths)} shards into {output_json_file_path}")
+    return output_dict
+
+
+def merge_sink_shards(path: Union[str, Path], shard_paths: Optional[List[Path]] = None,
+                      value_name: str = "text") -> int:
+    """concatenate the jsonl or parquet sink files of all shards (e.g. papers.shard-i-of-N.jsonl) into path
+
+    Records are streamed, so memory does not grow with the number of papers. Records already in path are kept
+    unless a shard has the same key, so merging twice is safe. Returns the number of records written.
+    """
+    # pyarrow is only needed for parquet sinks, so the sinks are imported here
+    from src.pipeline.sinks import iter_records, open_sink
+    path = Path(path)
+    if shard_paths is None:
+        shard_paths = find_shard_paths(path)
+    previous = None
+    if path.exists():
+        previous = path.with_name(f"{path.stem}.previous{path.suffix}")
+        path.replace(previous)
+    seen = set()
+    with open_sink(path, value_name=value_name) as sink:
+        for shard in shard_paths:
+            for key, value in iter_records(shard, value_name=value_name):
+                seen.add(key)
+                sink.write(key, value)
+        if previous is not None:
+            sink.write_all((key, value) for key, value in iter_records(previous, value_name=value_name)
+                           if key not in seen)
+    if previous is not None:
+        previous.unlink()
+    logger.info(f"Merged {len(shard_paths)} shards into {path}")
+    return sink.count
+
+
+def append_unavailable_paper(unavailable_papers_csv_path: Union[str, Path], title: str, doi: Optional[str],
+                             link: Optional[str]) -> None:
+    """append a paper to an unavailable-paper csv (Title,DOI,Link). Appends from several threads do not interleave"""
+    # commas are removed from the title, as the csv is not quoted
+    line = f"{title.replace(',', '')},{doi or ''},{link or ''}\n"
+    with _unavailable_papers_lock:
+        with open(unavailable_papers_csv_path, "a") as file:
+            file.write(line)
+
+
+def _read_unavailable_papers(path: Path) -> Optional["pl.DataFrame"]:
+    import polars as pl
+    # PaperDownloader writes a header, but Parser only appends lines, so the header may be missing
+    if path.stat().st_size == 0:
+        return None
+    with open(path, "r") as f:
+        has_header = f.readline().strip() == "Title,DOI,Link"
+    # read everything as strings
+    return pl.read_csv(path, has_header=has_header, infer_schema_length=0, new_columns=["Title", "DOI", "Link"])
+
+
+def merge_unavailable_papers(unavailable_papers_csv_path: str, shard_paths: Optional[List[Path]] = None) -> "pl.DataFrame":
+    """concatenate the unavailable-paper lists of all shards into unavailable_papers_csv_path"""
+    import polars as pl
+    if shard_paths is None:
+        shard_paths = find_shard_paths(unavailable_papers_csv_path)
+    frames = [_read_unavailable_papers(path) for path in shard_paths]
+    frames = [frame for frame in frames if frame is not None and frame.height > 0]
+    if frames:
+        unavailable_papers_df = pl.concat(frames).unique(subset=["DOI", "Title"], keep="first", maintain_order=True)
+    else:
+        unavailable_papers_df = pl.DataFrame({"Title": [], "DOI": [], "Link": []}, schema={"Title": pl.Utf8, "DOI": pl.Utf8, "Link": pl.Utf8})
+    unavailable_papers_df.write_csv(unavailable_papers_csv_path)
+    logger.info(f"Merged {len(shard_paths)} shards into {unavailable_papers_csv_path}")
+    return unavailable_papers_df
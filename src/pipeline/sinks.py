@@ -0,0 +1,128 @@
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.pipeline.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+SINK_FORMATS = {"jsonl": ".jsonl", "parquet": ".parquet"}
+
+
+def _encode(value) -> str:
+    # nested dicts (e.g. from Parser.iter_multiple_to_nested_dict) are stored as JSON strings in parquet
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+class JsonlSink:
+    """Write (key, value) pairs as they come to a JSON Lines file, one {key_name: key, value_name: value} per line.
+
+    Use it as a context manager:
+        with JsonlSink("data/raw/papers.jsonl") as sink:
+            sink.write_all(parser.iter_multiple_to_simple_dict())
+
+    Args:
+        path (Union[str, Path]): output file. It is overwritten.
+        key_name (str): name of the key field. Defaults to "doi".
+        value_name (str): name of the value field. Defaults to "text".
+    """
+
+    def __init__(self, path: Union[str, Path], key_name: str = "doi", value_name: str = "text") -> None:
+        self.path = Path(path)
+        self.key_name = key_name
+        self.value_name = value_name
+        self.count = 0
+        self._file = None
+
+    def __enter__(self) -> "JsonlSink":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        return self
+
+    def write(self, key: str, value) -> None:
+        self._file.write(json.dumps({self.key_name: key, self.value_name: value}, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def write_all(self, items: Iterable[Tuple[str, object]]) -> int:
+        """write every (key, value) pair of items and return the number written"""
+        for key, value in items:
+            self.write(key, value)
+        return self.count
+
+    def __exit__(self, *exc) -> None:
+        self._file.close()
+        logger.info(f"wrote {self.count} records to {self.path}")
+
+
+class ParquetSink(JsonlSink):
+    """Write (key, value) pairs to a parquet file with two string columns, one row group per batch_size rows.
+
+    Only the current batch is held in memory. Values that are not strings are stored as JSON.
+
+    Args:
+        path (Union[str, Path]): output file. It is overwritten.
+        key_name (str): name of the key column. Defaults to "doi".
+        value_name (str): name of the value column. Defaults to "text".
+        batch_size (int): rows per row group. Defaults to 256.
+    """
+
+    def __init__(self, path: Union[str, Path], key_name: str = "doi", value_name: str = "text",
+                 batch_size: int = 256) -> None:
+        super().__init__(path, key_name=key_name, value_name=value_name)
+        self.batch_size = batch_size
+        self.schema = pa.schema([(key_name, pa.string()), (value_name, pa.string())])
+        self._keys = []
+        self._values = []
+
+    def __enter__(self) -> "ParquetSink":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = pq.ParquetWriter(str(self.path), self.schema, compression="zstd")
+        return self
+
+    def _flush(self) -> None:
+        if self._keys:
+            self._file.write_table(pa.Table.from_arrays([pa.array(self._keys, pa.string()),
+                                                         pa.array(self._values, pa.string())], schema=self.schema))
+            self._keys, self._values = [], []
+
+    def write(self, key: str, value) -> None:
+        self._keys.append(key)
+        self._values.append(_encode(value))
+        self.count += 1
+        if len(self._keys) >= self.batch_size:
+            self._flush()
+
+    def __exit__(self, *exc) -> None:
+        self._flush()
+        super().__exit__(*exc)
+
+
+def open_sink(path: Union[str, Path], key_name: str = "doi", value_name: str = "text") -> JsonlSink:
+    """JsonlSink or ParquetSink, depending on the suffix of path (.jsonl or .parquet)"""
+    path = Path(path)
+    if path.suffix == SINK_FORMATS["jsonl"]:
+        return JsonlSink(path, key_name=key_name, value_name=value_name)
+    if path.suffix == SINK_FORMATS["parquet"]:
+        return ParquetSink(path, key_name=key_name, value_name=value_name)
+    raise ValueError("path must end with .jsonl or .parquet")
+
+
+def iter_records(path: Union[str, Path], key_name: str = "doi", value_name: str = "text") -> Iterator[Tuple[str, str]]:
+    """read back the (key, value) pairs written by a sink, one batch at a time
+
+    Values that were stored as JSON in parquet are returned as strings.
+    """
+    path = Path(path)
+    if path.suffix == SINK_FORMATS["jsonl"]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield record[key_name], record[value_name]
+    elif path.suffix == SINK_FORMATS["parquet"]:
+        for batch in pq.ParquetFile(str(path)).iter_batches(columns=[key_name, value_name]):
+            yield from zip(batch.column(0).to_pylist(), batch.column(1).to_pylist())
+    else:
+        raise ValueError("path must end with .jsonl or .parquet")
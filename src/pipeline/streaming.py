@@ -0,0 +1,208 @@
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Union
+
+import polars as pl
+from tqdm import tqdm
+
+from src.data.download_paper import PaperDownloader
+from src.data.parse_data import Parser
+from src.features.openai_gpt4 import PaperReviewer
+from src.pipeline.profiling import profile_stage
+from src.pipeline.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+# marker put on a queue to tell a worker that the upstream stage is finished
+_DONE = object()
+
+
+class StreamingPipeline:
+    """Run download -> parse -> Q&A as overlapping stages instead of one after another.
+
+    Every stage runs in its own worker threads and hands each paper to the next stage
+    through a bounded queue. When a downstream stage falls behind, its queue fills up
+    and the upstream workers block on put(), so memory stays bounded and the total
+    wall-clock time approaches that of the slowest stage.
+    The outputs are the same as running make_dataset and PaperReviewer.qa_from_folder:
+        - xml/ and pdf/ with downloaded papers
+        - papers/ with parsed text files
+        - the Q&A json (and csv) keyed by the file name in papers/ or pdf/
+    Papers that fail in a stage are not passed on. They are listed per stage in self.failures (DOI, file name or
+    path), and papers whose download fails are also added to the unavailable papers, as in the batch path.
+    """
+
+    def __init__(self,
+                 paper_downloader: PaperDownloader,
+                 parser: Parser,
+                 reviewer: PaperReviewer,
+                 output_path: str,
+                 queue_size: int = 8,
+                 download_workers: int = 1,
+                 parse_workers: int = 1,
+                 qa_workers: int = 1) -> None:
+        self.paper_downloader = paper_downloader
+        self.parser = parser
+        self.reviewer = reviewer
+        self.xml_output_folder = Path(output_path) / "xml"
+        self.pdf_output_folder = Path(output_path) / "pdf"
+        self.paper_output_folder = Path(output_path) / "papers"
+        self.queue_size = queue_size
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers
+        self.qa_workers = qa_workers
+        self._output_lock = threading.Lock()
+        # file names whose Q&A is running, so that a paper in the queue twice is asked once
+        self._qa_running = set()
+        self.failures = {"download": [], "parse": [], "qa": []}
+
+    def _stage(self, name: str, func, in_queue: queue.Queue, out_queue: Union[queue.Queue, None],
+               n_workers: int, n_downstream_workers: int) -> list:
+        """start n_workers threads that apply func to every item in in_queue
+
+        func returns a list of items to pass to out_queue. Once all workers have seen _DONE,
+        one _DONE per downstream worker is put on out_queue.
+        """
+        def work():
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    break
+                try:
+                    results = func(item)
+                except Exception as e:
+                    logger.error(f"{name} failed for {item}: {e}")
+                    self._record_failure(name, item)
+                    continue
+                if out_queue is not None:
+                    for result in results:
+                        out_queue.put(result)
+
+        workers = [threading.Thread(target=work, name=f"{name}-{i}", daemon=True) for i in range(n_workers)]
+        for worker in workers:
+            worker.start()
+
+        def close():
+            for worker in workers:
+                worker.join()
+            if out_queue is not None:
+                for _ in range(n_downstream_workers):
+                    out_queue.put(_DONE)
+
+        closer = threading.Thread(target=close, name=f"{name}-closer", daemon=True)
+        closer.start()
+        return workers + [closer]
+
+    def _record_failure(self, name: str, item) -> None:
+        if name == "download":
+            # like a paper that could not be downloaded
+            self.paper_downloader.append_unavailable_paper(item)
+            key = item["DOI"]
+        elif name == "qa":
+            key = item[0]
+        else:
+            key = str(item)
+        with self._output_lock:
+            self.failures[name].append(key)
+        self._advance()
+
+    def _advance(self) -> None:
+        # a paper is done: answered, skipped or failed, so that the progress bar reaches its total
+        with self._output_lock:
+            self._progress.update(1)
+
+    def _download(self, row: dict) -> list:
+        file_path = self.paper_downloader.download_single(row, str(self.xml_output_folder), str(self.pdf_output_folder))
+        if file_path is None:
+            self.paper_downloader.append_unavailable_paper(row)
+            self._advance()
+            return []
+        return [file_path]
+
+    def _parse(self, file_path: Path) -> list:
+        # PDFs are read by PaperReviewer.load_file in the Q&A stage
+        if file_path.suffix == ".pdf":
+            return [(file_path.name, file_path, None)]
+        papers = []
+        for doi, text in self.parser.parse_single_to_simple_dict(file_path).items():
+            paper_path = self.paper_output_folder / f"{doi.replace('/', '_')}.txt"
+            with open(paper_path, "w") as f:
+                f.write(text)
+            papers.append((paper_path.name, paper_path, text))
+        if not papers:
+            # no body: the parser added it to the unavailable papers
+            self._advance()
+        return papers
+
+    def _qa(self, paper: tuple) -> list:
+        file_name, file_path, text = paper
+        with self._output_lock:
+            if file_name in self._output_dict or file_name in self._qa_running:
+                self._progress.update(1)
+                return []
+            # reserve the paper before the request, so that a duplicate is skipped by the other workers
+            self._qa_running.add(file_name)
+        try:
+            if text is None:
+                answer = self.reviewer.qa_from_file(str(file_path))
+            else:
+                answer = self.reviewer.qa_from_text(text)
+            with self._output_lock:
+                self._output_dict[file_name] = json.loads(str(answer))
+                # save intermediary results as json
+                with open(self._output_json_file_path, "w") as outfile:
+                    json.dump(self._output_dict, outfile)
+        finally:
+            with self._output_lock:
+                self._qa_running.discard(file_name)
+        self._advance()
+        logger.info("Ran Q&A for " + file_name)
+        return []
+
+    def run(self, doi_link_df: pl.DataFrame, output_json_file_path: str) -> dict:
+        """download, parse and run Q&A with the papers in doi_link_df
+
+        Args:
+            doi_link_df (pl.DataFrame): dataframe with "DOI", "Link", and "Title"
+            output_json_file_path (str): path to save Q&A results. Existing results are reused as checkpoints.
+
+        Returns:
+            dict: Q&A results keyed by file name. The papers that failed are in self.failures
+        """
+        for folder in [self.xml_output_folder, self.pdf_output_folder, self.paper_output_folder]:
+            folder.mkdir(parents=True, exist_ok=True)
+        self._output_json_file_path = output_json_file_path
+        self._output_dict = self.reviewer.load_output_dict(output_json_file_path)
+        self.failures = {"download": [], "parse": [], "qa": []}
+        self._progress = tqdm(total=doi_link_df.height, desc="running Q&A with papers")
+        # start with an empty list of unavailable papers and append to it as the stages go
+        self.paper_downloader.write_unavailable_papers([])
+
+        row_queue = queue.Queue(maxsize=self.queue_size)
+        xml_queue = queue.Queue(maxsize=self.queue_size)
+        paper_queue = queue.Queue(maxsize=self.queue_size)
+        threads = []
+        threads += self._stage("download", self._download, row_queue, xml_queue,
+                               self.download_workers, self.parse_workers)
+        threads += self._stage("parse", self._parse, xml_queue, paper_queue,
+                               self.parse_workers, self.qa_workers)
+        threads += self._stage("qa", self._qa, paper_queue, None,
+                               self.qa_workers, 0)
+
+        with profile_stage("streaming", items=doi_link_df.height):
+            for row in doi_link_df.rows(named=True):
+                row_queue.put(row)
+            for _ in range(self.download_workers):
+                row_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+        self._progress.close()
+        failed = sum(len(keys) for keys in self.failures.values())
+        if failed:
+            logger.warning(f"{failed} papers failed: " +
+                           ", ".join(f"{len(keys)} in {name}" for name, keys in self.failures.items() if keys))
+
+        self.reviewer.save_as_csv(self._output_dict, output_json_file_path)
+        return self._output_dict
@@ -0,0 +1,102 @@
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# intermediate tables are written in the format given by the file suffix
+PARQUET_SUFFIXES = [".parquet"]
+ARROW_SUFFIXES = [".arrow", ".feather"]
+CSV_SUFFIXES = [".csv"]
+TABLE_FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def table_path(path: Union[str, Path], table_format: str) -> Path:
+    """replace the suffix of path with the suffix of table_format ("parquet", "arrow", or "csv")"""
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"table_format must be one of {list(TABLE_FORMATS)}")
+    path = Path(path)
+    return path.with_name(path.stem + TABLE_FORMATS[table_format])
+
+
+def _to_arrow(df) -> pa.Table:
+    """convert a pandas or polars DataFrame to a pyarrow Table
+
+    pandas object columns that mix strings with other python objects (e.g. lists or numbers
+    in the Q&A answers) are stored as strings, like they would be in a csv file.
+    """
+    if isinstance(df, pa.Table):
+        return df
+    if not isinstance(df, pd.DataFrame):
+        # polars
+        return df.to_arrow()
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            values = df[column].dropna()
+            if not values.map(lambda value: isinstance(value, str)).all():
+                df[column] = df[column].map(lambda value: value if value is None or isinstance(value, str) else str(value))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_csv(df, path: Path) -> None:
+    # write csv files the same way as before so that the R scripts can read them
+    if isinstance(df, pd.DataFrame):
+        df.to_csv(path, index=False)
+    elif hasattr(df, "write_csv"):
+        # polars
+        df.write_csv(path)
+    else:
+        pa_csv.write_csv(_to_arrow(df), path)
+
+
+def write_table(df, path: Union[str, Path], export_csv: bool = False) -> Path:
+    """Write a pandas/polars DataFrame to path in the format given by its suffix.
+
+    Args:
+        df: pandas DataFrame, polars DataFrame, or pyarrow Table
+        path (Union[str, Path]): output path ending with .parquet, .arrow/.feather, or .csv
+        export_csv (bool): also write a .csv file next to path. Defaults to False.
+
+    Returns:
+        Path: path to the written file
+    """
+    path = Path(path)
+    if path.suffix in PARQUET_SUFFIXES:
+        pq.write_table(_to_arrow(df), path, compression="zstd")
+    elif path.suffix in ARROW_SUFFIXES:
+        # uncompressed so that it can be memory-mapped without a copy
+        feather.write_feather(_to_arrow(df), path, compression="uncompressed")
+    elif path.suffix in CSV_SUFFIXES:
+        _write_csv(df, path)
+    else:
+        raise ValueError("path must end with .parquet, .arrow, .feather, or .csv")
+    if export_csv and path.suffix not in CSV_SUFFIXES:
+        _write_csv(df, path.with_suffix(".csv"))
+    return path
+
+
+def read_arrow_table(path: Union[str, Path], columns: Optional[List[str]] = None) -> pa.Table:
+    """Read a table as a pyarrow Table. Parquet and Arrow files are memory-mapped."""
+    path = Path(path)
+    if path.suffix in PARQUET_SUFFIXES:
+        return pq.read_table(path, columns=columns, memory_map=True)
+    if path.suffix in ARROW_SUFFIXES:
+        return feather.read_table(path, columns=columns, memory_map=True)
+    if path.suffix in CSV_SUFFIXES:
+        table = pa_csv.read_csv(path)
+        return table.select(columns) if columns is not None else table
+    raise ValueError("path must end with .parquet, .arrow, .feather, or .csv")
+
+
+def read_table(path: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a table as a pandas DataFrame. Parquet and Arrow files are memory-mapped;
+    csv files are read with pandas so that the result matches pd.read_csv.
+    """
+    path = Path(path)
+    if path.suffix in CSV_SUFFIXES:
+        return pd.read_csv(path, usecols=columns)
+    return read_arrow_table(path, columns=columns).to_pandas()
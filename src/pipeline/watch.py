@@ -0,0 +1,250 @@
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import polars as pl
+
+from src.data.download_paper import PaperDownloader
+from src.data.filter_paper import PaperFilter
+from src.data.parse_data import Parser
+from src.features.openai_gpt4 import PaperReviewer
+from src.pipeline.util.log_util import get_logger
+
+logger = get_logger(__name__)
+
+
+class FolderWatcher:
+    """Poll folders for new or modified files.
+
+    A file is reported once its size and modification time stayed the same for one poll,
+    so that files that are still being downloaded or copied are picked up on the next poll.
+    The files that have been reported are saved to state_path, so a restarted watcher
+    only reports what changed while it was down.
+
+    Args:
+        folders (Dict[str, List[str]]): folder -> glob patterns, e.g. {"data/raw/xml": ["*.xml"]}
+        state_path (Optional[str]): json file to keep the reported files in. Not saved if None.
+    """
+
+    def __init__(self, folders: Dict[str, List[str]], state_path: Optional[str] = None) -> None:
+        self.folders = {Path(folder): patterns for folder, patterns in folders.items()}
+        self.state_path = Path(state_path) if state_path is not None else None
+        self._seen = {}
+        if self.state_path is not None and self.state_path.exists():
+            with open(self.state_path, "r") as f:
+                self._seen = {path: tuple(signature) for path, signature in json.load(f).items()}
+        self._pending = {}
+
+    def _scan(self) -> Dict[str, tuple]:
+        signatures = {}
+        for folder, patterns in self.folders.items():
+            if not folder.exists():
+                continue
+            for pattern in patterns:
+                for path in folder.glob(pattern):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    signatures[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self) -> List[Path]:
+        """new or modified files whose size and mtime did not change since the last poll"""
+        ready = []
+        pending = {}
+        for path, signature in self._scan().items():
+            if self._seen.get(path) == signature:
+                continue
+            if self._pending.get(path) == signature:
+                ready.append(Path(path))
+            else:
+                pending[path] = signature
+        self._pending = pending
+        return sorted(ready)
+
+    def mark_seen(self, path: Path) -> None:
+        """do not report path again until it changes"""
+        stat = path.stat()
+        self._seen[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        if self.state_path is not None:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_path, "w") as f:
+                json.dump(self._seen, f)
+
+
+class WatchDaemon:
+    """Parse, run Q&A and extract new papers as they land, without re-scanning everything.
+
+    The Parser, the PaperReviewer (and its LLM client), the NLTK sentence tokenizer and the
+    extractor are created once and kept warm between files. Per batch of new files:
+        - new exports in export_folder (Scopus/ASReview csv or xlsx): papers with a new DOI are downloaded
+          into xml_folder/pdf_folder, where the next poll picks them up
+        - new XML files: parsed into paper_output_folder and answered with the reviewer
+        - new PDF files: answered with the reviewer
+        - the answers are checkpointed to output_json_file_path and, if an extractor is given,
+          added to its tables with ExtractInformation.update()
+    A file that fails (e.g. an API rate limit or timeout) is not marked as processed, so it is tried again on a
+    later poll, up to max_attempts times. Then it is given up on, logged and marked as processed.
+
+    Args:
+        parser (Parser): parser for the XML files
+        reviewer (PaperReviewer): reviewer with the question list
+        xml_folder (str): folder with downloaded XML files
+        pdf_folder (str): folder with downloaded PDF files
+        paper_output_folder (str): folder to save the parsed text files
+        output_json_file_path (str): Q&A results. Existing results are kept.
+        export_folder (Optional[str]): folder with Scopus/ASReview exports. Not watched if None.
+        paper_downloader (Optional[PaperDownloader]): downloader for the papers in the exports
+        extractor (Optional[ExtractInformation]): extractor reading output_json_file_path
+        interval (float): seconds between polls
+        state_path (Optional[str]): where to keep the list of processed files
+        max_attempts (int): times a failing file is processed before it is given up on
+    """
+
+    def __init__(self,
+                 parser: Parser,
+                 reviewer: PaperReviewer,
+                 xml_folder: str,
+                 pdf_folder: str,
+                 paper_output_folder: str,
+                 output_json_file_path: str,
+                 export_folder: Optional[str] = None,
+                 paper_downloader: Optional[PaperDownloader] = None,
+                 extractor=None,
+                 interval: float = 1.0,
+                 state_path: Optional[str] = "data/interim/watch_state.json",
+                 max_attempts: int = 3) -> None:
+        if export_folder is not None and paper_downloader is None:
+            raise ValueError("paper_downloader is needed to watch export_folder")
+        self.parser = parser
+        self.reviewer = reviewer
+        self.xml_folder = Path(xml_folder)
+        self.pdf_folder = Path(pdf_folder)
+        self.paper_output_folder = Path(paper_output_folder)
+        self.output_json_file_path = output_json_file_path
+        self.export_folder = export_folder
+        self.paper_downloader = paper_downloader
+        self.extractor = extractor
+        self.interval = interval
+        self.max_attempts = max_attempts
+        folders = {str(self.xml_folder): ["*.xml"], str(self.pdf_folder): ["*.pdf", "*/*.pdf"]}
+        if export_folder is not None:
+            folders[export_folder] = ["*.csv", "*.xlsx"]
+        self.watcher = FolderWatcher(folders, state_path=state_path)
+        self._output_dict = self.reviewer.load_output_dict(output_json_file_path)
+        self._downloaded_dois = set()
+        # failed attempts of the files that are retried, by path
+        self._failures: Dict[str, int] = {}
+
+    def warm_up(self) -> None:
+        """load the NLTK sentence tokenizer before the first paper arrives"""
+        self.parser.chunker.split("Warm up.")
+
+    def _read_export(self, path: Path) -> pl.DataFrame:
+        # ASReview exports have an "included" column, Scopus exports are taken as they are
+        if path.suffix == ".xlsx":
+            export_df = pl.read_excel(str(path), sheet_id=1, read_csv_options={"infer_schema_length": 0})
+        else:
+            export_df = pl.read_csv(str(path), infer_schema_length=0)
+        if "included" in export_df.columns:
+            export_df = PaperFilter(str(path)).filter_paper()
+        return export_df.select(["DOI", "Link", "Title"])
+
+    def process_export(self, path: Path) -> None:
+        """download the papers in an export that have not been downloaded yet"""
+        for row in self._read_export(path).rows(named=True):
+            if not row["DOI"] or row["DOI"] in self._downloaded_dois:
+                continue
+            file_path = self.paper_downloader.download_single(row, str(self.xml_folder), str(self.pdf_folder))
+            # added once the download went through, so that the paper is downloaded when a failed export is retried
+            self._downloaded_dois.add(row["DOI"])
+            if file_path is None:
+                self.paper_downloader.append_unavailable_paper(row)
+
+    def _has_answer(self, file_name: str) -> bool:
+        # like qa_from_folder, papers answered before (e.g. before the watch state was lost) are not asked again
+        if file_name in self._output_dict:
+            logger.info(f"Skipping Q&A for {file_name}, already in {self.output_json_file_path}")
+            return True
+        return False
+
+    def _answer(self, file_name: str, answer) -> None:
+        self._output_dict[file_name] = json.loads(str(answer))
+        # save intermediary results as json
+        with open(self.output_json_file_path, "w") as outfile:
+            json.dump(self._output_dict, outfile)
+        logger.info("Ran Q&A for " + file_name)
+
+    def process_xml(self, path: Path) -> List[str]:
+        """parse an XML file and answer the questions. Returns the new keys of the Q&A json"""
+        file_names = []
+        for doi, text in self.parser.parse_single_to_simple_dict(path).items():
+            paper_path = self.paper_output_folder / f"{doi.replace('/', '_')}.txt"
+            with open(paper_path, "w") as f:
+                f.write(text)
+            if self._has_answer(paper_path.name):
+                continue
+            self._answer(paper_path.name, self.reviewer.qa_from_text(text))
+            file_names.append(paper_path.name)
+        return file_names
+
+    def process_pdf(self, path: Path) -> List[str]:
+        if self._has_answer(path.name):
+            return []
+        self._answer(path.name, self.reviewer.qa_from_file(str(path)))
+        return [path.name]
+
+    def run_once(self) -> List[str]:
+        """process the files that landed since the last poll. Returns the new keys of the Q&A json"""
+        file_names = []
+        for path in self.watcher.poll():
+            started = time.perf_counter()
+            answered = len(self._output_dict)
+            try:
+                if path.suffix in [".csv", ".xlsx"]:
+                    self.process_export(path)
+                elif path.suffix == ".xml":
+                    self.process_xml(path)
+                else:
+                    self.process_pdf(path)
+            except Exception as e:
+                self._failed(path, e)
+                continue
+            finally:
+                # the papers answered before a failure are kept, and skipped when the file is retried
+                file_names += list(self._output_dict)[answered:]
+            self._failures.pop(str(path), None)
+            self.watcher.mark_seen(path)
+            logger.info(f"Processed {path} in {time.perf_counter() - started:.2f}s")
+        if file_names:
+            self.reviewer.save_as_csv(self._output_dict, self.output_json_file_path)
+            if self.extractor is not None:
+                self.extractor.update(file_names)
+        return file_names
+
+    def _failed(self, path: Path, error: Exception) -> None:
+        # leave the file unseen so that the watcher reports it again, until it failed max_attempts times
+        attempts = self._failures.get(str(path), 0) + 1
+        if attempts < self.max_attempts:
+            self._failures[str(path)] = attempts
+            logger.warning(f"Failed to process {path} (attempt {attempts} of {self.max_attempts}), "
+                           f"retrying on a later poll: {error}")
+            return
+        self._failures.pop(str(path), None)
+        logger.error(f"Giving up on {path} after {attempts} failed attempts: {error}")
+        self.watcher.mark_seen(path)
+
+    def run(self) -> None:
+        """poll every self.interval seconds until interrupted"""
+        for folder in [self.xml_folder, self.pdf_folder, self.paper_output_folder]:
+            folder.mkdir(parents=True, exist_ok=True)
+        self.warm_up()
+        logger.info(f"Watching {', '.join(str(folder) for folder in self.watcher.folders)}")
+        try:
+            while True:
+                self.run_once()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
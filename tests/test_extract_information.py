@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+
+from src.features.extract_information import ExtractInformation
+
+
+def _extractor(tmp_path, qa=None):
+    (tmp_path / "qa.json").write_text(json.dumps(qa or {}))
+    pd.DataFrame({"0": ["a"], "Affiliations": ["x"]}).to_csv(tmp_path / "citation.csv", index=False)
+    return ExtractInformation(str(tmp_path / "qa.json"), str(tmp_path / "citation.csv"), str(tmp_path / "out"))
+
+
+def test_csv_of_an_earlier_run_is_reused(tmp_path, monkeypatch):
+    extractor = _extractor(tmp_path, {"a.txt": {"study_area": {"Country": "Japan", "City": "Tokyo"}}})
+    study_area = pd.DataFrame({"filename": ["a.txt"], "Country": ["Japan"], "City": ["Tokyo"], "lat": [35.7],
+                               "lon": [139.7]})
+    study_area.to_csv(tmp_path / "out" / "study_area.csv", index=False)
+
+    def geocode(*args, **kwargs):
+        raise AssertionError("geocoded again")
+
+    monkeypatch.setattr(extractor, "add_lat_lon", geocode)
+    extractor.extract_study_area()
+    assert extractor.table_path("study_area").suffix == ".parquet"
+    pd.testing.assert_frame_equal(pd.read_parquet(extractor.table_path("study_area")), study_area)
+
+
+def test_missing_table(tmp_path):
+    extractor = _extractor(tmp_path)
+    assert not extractor.has_table("study_area")
+
+
+def test_only_new_study_areas_are_geocoded(tmp_path, monkeypatch):
+    qa = {"a.txt": {"study_area": {"Country": "Japan", "City": "Tokyo"}},
+          "b.txt": {"study_area": {"Country": "France", "City": ""}}}
+    extractor = _extractor(tmp_path, qa)
+    pd.DataFrame({"filename": ["a.txt", "gone.txt"], "Country": ["Japan", "Peru"], "City": ["Tokyo", "Lima"],
+                  "lat": [35.7, -12.0], "lon": [139.7, -77.0]}).to_csv(tmp_path / "out" / "study_area.csv", index=False)
+    geocoded = []
+
+    def geocode(locations):
+        geocoded.extend(locations)
+        return pd.DataFrame({"lat": [46.6] * len(locations), "lon": [2.2] * len(locations)}, index=locations.index)
+
+    monkeypatch.setattr(extractor, "geocode", geocode)
+    extractor.extract_study_area()
+    assert geocoded == ["France, "]
+    study_area = pd.read_parquet(extractor.table_path("study_area"))
+    assert study_area["filename"].tolist() == ["a.txt", "b.txt"]
+    assert study_area["lat"].tolist() == [35.7, 46.6]
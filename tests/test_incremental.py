@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from src.features.extract_information import ExtractInformation
+from src.pipeline.incremental import IncrementalRunner, build_review_stages
+
+
+def test_extract_stage_is_stale_without_one_of_its_tables(tmp_path):
+    config = {key: str(tmp_path / key) for key in [
+        "raw_path", "initial_input_folder", "abstract_filtered_input_filepath", "question_list_text", "paper_folder",
+        "qa_json", "citation_csv", "extract_dir", "aspect_csv", "summary_csv", "image_data_type_csv",
+        "recalibrated_aspect_csv", "complementary_excel", "limitation_opportunity_csv", "review_csv"]}
+    extract = [stage for stage in build_review_stages(config) if stage.name == "extract"][0]
+    assert len(extract.outputs) == len(ExtractInformation.TABLES)
+    for path in [config["qa_json"], config["citation_csv"]] + extract.outputs:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text("")
+    runner = IncrementalRunner([extract], manifest_path=str(tmp_path / "manifest.json"))
+    runner.manifest["stages"]["extract"] = runner._stage_fingerprint(extract)
+    assert not runner.is_stale(extract)
+    Path(extract.outputs[-1]).unlink()
+    assert runner.is_stale(extract)
@@ -0,0 +1,51 @@
+import pytest
+from lxml import etree
+
+from src.benchmarks.normalizer_benchmark import (_fuzz_texts, _legacy_normalize, _legacy_normalize_joined,
+                                                 _legacy_normalize_keyword)
+from src.data.normalize_text import TextNormalizer
+
+EDGE_CASES = [
+    "",
+    " ",
+    "\n",
+    "   \n\n  ",
+    # ligatures are left as they are
+    "The \ufb01rst \ufb02oor of the of\ufb01ce .",
+    "\ufb00 \ufb03 \ufb04  ligatures",
+    # hyphenation across line breaks
+    "street-\nview images",
+    "percep-\n  tion of safety [12] .",
+    "co-\n\noperation",
+    # unicode whitespace is not a space
+    "urban\u00a0\u00a0greenery",
+    "thin\u2009space\u2009.",
+    "tab\tand\u3000ideographic \u00a0space",
+    "zero\u200bwidth [1]",
+    # citations and periods
+    "[1]",
+    "a [1] [2, 3] b .",
+    "unclosed [bracket .",
+    "nested [[1]] end",
+    " . . ",
+    "trailing  [1]  .",
+]
+
+
+@pytest.fixture
+def normalizer():
+    return TextNormalizer()
+
+
+@pytest.mark.parametrize("text", EDGE_CASES + _fuzz_texts(500))
+def test_normalize_is_identical_to_the_old_cleanup(normalizer, text):
+    assert normalizer.normalize(text) == _legacy_normalize(text)
+    assert normalizer.normalize(text, remove_citations=False) == _legacy_normalize_keyword(text)
+    assert normalizer.normalize_joined(text) == _legacy_normalize_joined(text)
+
+
+@pytest.mark.parametrize("text", ["Street-\nview <b>images</b> [3] .", "", "ﬁgure  1"])
+def test_element_text_is_identical_to_the_old_cleanup(normalizer, text):
+    element = etree.fromstring(f"<para>{text}</para>")
+    old = _legacy_normalize(etree.tostring(element, method="text", encoding="unicode"))
+    assert normalizer.element_text(element) == old
@@ -0,0 +1,64 @@
+import pytest
+
+from src.benchmarks.synthetic_pdf import make_pdf, write_pdf_corpus
+from src.data.pdf_text import (PdfTextCache, PdfTextExtractor, extract_page_texts, extract_pages, scanned_pages,
+                               unreadable_pages)
+
+pytest.importorskip("fitz")
+
+
+@pytest.fixture
+def pdf_paths(tmp_path):
+    paths = write_pdf_corpus(tmp_path, 6, pages=2)
+    corrupt = tmp_path / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.7 not a pdf")
+    return [str(path) for path in paths[:2] + [corrupt] + paths[2:]]
+
+
+def test_iter_extract_raises_or_skips_errors(pdf_paths):
+    extractor = PdfTextExtractor(executor="serial", ocr="none")
+    with pytest.raises(Exception):
+        list(extractor.iter_extract(pdf_paths))
+    texts = dict(extractor.iter_extract(pdf_paths, skip_errors=True))
+    assert texts[pdf_paths[2]] is None
+    assert all(texts[path] == extract_pages(path) for path in pdf_paths if path != pdf_paths[2])
+
+
+def test_prefetch_keeps_going_after_a_corrupt_file(pdf_paths):
+    cache = PdfTextCache(PdfTextExtractor(executor="serial", ocr="none"), max_ahead=2)
+    cache.prefetch(pdf_paths)
+    for path in pdf_paths:
+        # no more than max_ahead texts are held
+        assert len(cache._texts) <= 2
+        text = cache.get(path)
+        assert text == (None if path == pdf_paths[2] else extract_pages(path))
+    cache._thread.join(timeout=10)
+    assert not cache._thread.is_alive()
+
+
+def test_blank_and_figure_pages_are_not_sent_to_ocr(tmp_path):
+    path = make_pdf(tmp_path / "paper.pdf", pages=5, scanned_pages=[1], blank_pages=[2], figure_pages=[3])
+    page_texts = extract_page_texts(path)
+    assert unreadable_pages(page_texts) == [1, 2, 3]
+    assert unreadable_pages(page_texts, path) == [1]
+    assert scanned_pages(path, [1, 2, 3]) == [1]
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+def test_prefetch_with_one_pool(pdf_paths, executor):
+    cache = PdfTextCache(PdfTextExtractor(jobs=2, executor=executor, ocr="none"), max_ahead=3)
+    cache.prefetch(pdf_paths)
+    for path in pdf_paths:
+        assert len(cache._texts) <= 3
+        assert cache.get(path) == (None if path == pdf_paths[2] else extract_pages(path))
+    cache.close()
+    assert not cache._thread.is_alive()
+
+
+def test_close_stops_a_prefetch_waiting_for_slots(pdf_paths):
+    cache = PdfTextCache(PdfTextExtractor(jobs=2, executor="thread", ocr="none"), max_ahead=1)
+    cache.prefetch(pdf_paths)
+    assert cache.get(pdf_paths[0]) == extract_pages(pdf_paths[0])
+    cache.close()
+    assert not cache._thread.is_alive()
+    assert cache.get(pdf_paths[-1]) is None
@@ -0,0 +1,28 @@
+import os
+import pickle
+
+import pytest
+
+from src.data.download_paper import PaperDownloader
+from src.pipeline.executor import map_jobs
+
+
+def test_paper_downloader_runs_in_process_workers(tmp_path):
+    csv_path = tmp_path / "unavailable.csv"
+    downloader = PaperDownloader("key", "token", str(csv_path))
+    copy = pickle.loads(pickle.dumps(downloader))
+    assert (copy.client.api_key, copy.client.inst_token) == ("key", "token")
+    assert copy.unavailable_papers_csv_path == str(csv_path)
+    rows = [{"Title": f"title {i}", "DOI": f"10.1/{i}", "Link": None} for i in range(4)]
+    map_jobs(downloader.append_unavailable_paper, rows, jobs=2, executor="process")
+    assert sorted(csv_path.read_text().splitlines()) == [f"title {i},10.1/{i}," for i in range(4)]
+
+
+def test_recalibrator_keeps_its_key_in_process_workers(monkeypatch):
+    pytest.importorskip("langchain_community")
+    from src.models.recalibrate import Recalibrator
+    recalibrator = Recalibrator("sk-test")
+    monkeypatch.delenv("OPENAI_API_KEY")
+    copy = pickle.loads(pickle.dumps(recalibrator))
+    assert copy.openai_api_key == "sk-test"
+    assert os.environ["OPENAI_API_KEY"] == "sk-test"
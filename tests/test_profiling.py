@@ -0,0 +1,62 @@
+import json
+import time
+
+from src.pipeline import profiling
+from src.pipeline.profiling import RunProfiler, profile_iter, profile_stage
+
+
+def _produce(n, seconds=0.0):
+    for i in range(n):
+        time.sleep(seconds)
+        yield i
+
+
+def _stages(report_path):
+    with open(report_path) as f:
+        return {stage["name"]: stage for stage in json.load(f)["stages"]}
+
+
+def test_profile_iter_does_not_count_the_consumer(tmp_path):
+    report_path = tmp_path / "profile.json"
+    with RunProfiler(str(report_path)):
+        for _ in profile_iter("parse", _produce(3, 0.01), items=3):
+            time.sleep(0.1)
+    stage = _stages(report_path)["parse"]
+    assert stage["calls"] == 1 and stage["items"] == 3
+    assert 0.02 < stage["wall_time_s"] < 0.2
+
+
+def test_interleaved_and_abandoned_generators_keep_the_nesting(tmp_path):
+    report_path = tmp_path / "profile.json"
+    with RunProfiler(str(report_path)) as profiler:
+        with profile_stage("qa"):
+            first = profile_iter("parse", _produce(5))
+            second = profile_iter("download", _produce(5))
+            next(first)
+            next(second)
+            next(first)
+            # abandoned before the end
+            first.close()
+            list(second)
+            assert [frame.name for frame in profiler._stack()] == ["qa"]
+            with profile_stage("ocr"):
+                pass
+        assert profiler._stack() == []
+    stages = _stages(report_path)
+    assert stages["parse"]["parent"] == "qa" and stages["parse"]["calls"] == 1
+    assert stages["download"]["parent"] == "qa"
+    assert stages["ocr"]["parent"] == "qa"
+
+
+def test_no_stage_peak_without_psutil(tmp_path, monkeypatch):
+    import resource
+    monkeypatch.setattr(profiling, "psutil", None)
+    monkeypatch.setattr(profiling, "resource", resource, raising=False)
+    report_path = tmp_path / "profile.json"
+    with RunProfiler(str(report_path)):
+        with profile_stage("parse"):
+            pass
+    with open(report_path) as f:
+        report = json.load(f)
+    assert report["stages"][0]["peak_rss_mb"] is None
+    assert report["peak_rss_mb"] > 0
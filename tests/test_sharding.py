@@ -0,0 +1,30 @@
+import pytest
+
+from src.pipeline.sharding import merge_sink_shards, shard_path
+from src.pipeline.sinks import iter_records, open_sink
+
+
+def _write(path, records, value_name="text"):
+    with open_sink(path, value_name=value_name) as sink:
+        sink.write_all(records.items())
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".parquet"])
+def test_merge_sink_shards(tmp_path, suffix):
+    path = tmp_path / f"papers{suffix}"
+    _write(shard_path(path, (0, 2)), {"10.1/a": "text a", "10.1/b": "text b"})
+    _write(shard_path(path, (1, 2)), {"10.1/c": "text c"})
+    assert merge_sink_shards(path) == 3
+    assert dict(iter_records(path)) == {"10.1/a": "text a", "10.1/b": "text b", "10.1/c": "text c"}
+
+
+def test_merge_sink_shards_keeps_previous_records(tmp_path):
+    path = tmp_path / "section_index.jsonl"
+    _write(path, {"10.1/a": {"old": [[0, 1]]}, "10.1/z": {"methods": [[0, 5]]}}, value_name="sections")
+    _write(shard_path(path, (0, 1)), {"10.1/a": {"results": [[2, 9]]}}, value_name="sections")
+    merge_sink_shards(path, value_name="sections")
+    # merging twice gives the same file
+    merge_sink_shards(path, value_name="sections")
+    assert dict(iter_records(path, value_name="sections")) == {"10.1/a": {"results": [[2, 9]]},
+                                                              "10.1/z": {"methods": [[0, 5]]}}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["section_index.jsonl", "section_index.shard-0-of-1.jsonl"]
@@ -0,0 +1,76 @@
+import json
+import threading
+from pathlib import Path
+
+import polars as pl
+
+from src.pipeline.sharding import append_unavailable_paper
+from src.pipeline.streaming import StreamingPipeline
+
+
+class StubDownloader:
+    """writes a PDF per row, and fails for the DOIs in fail"""
+
+    def __init__(self, unavailable_papers_csv_path, fail=()):
+        self.unavailable_papers_csv_path = unavailable_papers_csv_path
+        self.fail = set(fail)
+
+    def write_unavailable_papers(self, rows):
+        with open(self.unavailable_papers_csv_path, "w") as f:
+            f.write("Title,DOI,Link\n")
+
+    def append_unavailable_paper(self, row):
+        append_unavailable_paper(self.unavailable_papers_csv_path, row["Title"], row["DOI"], row["Link"])
+
+    def download_single(self, row, xml_output_folder, pdf_output_folder):
+        if row["DOI"] in self.fail:
+            raise ConnectionError("rate limited")
+        if row["DOI"].endswith("missing"):
+            return None
+        path = f"{pdf_output_folder}/{row['DOI'].replace('/', '_')}.pdf"
+        with open(path, "wb") as f:
+            f.write(b"%PDF")
+        return Path(path)
+
+
+class StubReviewer:
+    def load_output_dict(self, output_json_file_path):
+        return {}
+
+    def qa_from_file(self, file_path):
+        if "bad" in file_path:
+            raise ValueError("invalid json")
+        return json.dumps({"file": file_path})
+
+    def save_as_csv(self, output_dict, output_json_file_path):
+        pass
+
+
+def test_progress_reaches_total_with_failures(tmp_path):
+    csv_path = tmp_path / "unavailable.csv"
+    dois = ["10.1/ok", "10.1/missing", "10.1/down", "10.1/bad", "10.1/ok"]
+    pipeline = StreamingPipeline(StubDownloader(str(csv_path), fail=["10.1/down"]), None, StubReviewer(),
+                                 str(tmp_path), download_workers=3, qa_workers=2)
+    output = pipeline.run(pl.DataFrame({"DOI": dois, "Link": ["l"] * 5, "Title": ["t, x"] * 5}),
+                          str(tmp_path / "qa.json"))
+    assert list(output) == ["10.1_ok.pdf"]
+    assert pipeline.failures == {"download": ["10.1/down"], "parse": [], "qa": ["10.1_bad.pdf"]}
+    assert pipeline._progress.n == pipeline._progress.total == 5
+    assert sorted(csv_path.read_text().splitlines()[1:]) == ["t x,10.1/down,l", "t x,10.1/missing,l"]
+
+
+def test_concurrent_appends_do_not_interleave(tmp_path):
+    csv_path = tmp_path / "unavailable.csv"
+
+    def append(i):
+        for j in range(200):
+            append_unavailable_paper(csv_path, "title " * 50, f"10.1/{i}-{j}", None)
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = csv_path.read_text().splitlines()
+    assert len(lines) == 1600
+    assert all(line.startswith("title title") and line.endswith(",") for line in lines)
@@ -0,0 +1,41 @@
+from src.features.token_reduction import TextReducer
+
+HEADER = "DOI: 10.1016/j.test.0\nTitle: A test paper\nPaper content:\n"
+
+
+def _reduce(*chunks):
+    return TextReducer(merge_headings=False).reduce(HEADER + "\n\n".join(chunks))
+
+
+def test_limitations_that_acknowledge_something_are_kept():
+    chunk = ("Discussion: Limitations: We acknowledge that our study has several limitations. First, the sample "
+             "is small. Future research should cover more cities.")
+    assert chunk in _reduce(chunk)
+
+
+def test_methods_that_mention_funding_keep_their_methods_text():
+    reduced = _reduce("Methods: Participants: This study was funded by the National Science Foundation. "
+                      "Participants were recruited online through a survey platform.")
+    assert "Participants were recruited online through a survey platform." in reduced
+    assert "National Science Foundation" not in reduced
+
+
+def test_project_number_of_participants_is_kept():
+    chunk = "Methods: Sampling: We set the project number of participants with a power analysis."
+    assert chunk in _reduce(chunk)
+
+
+def test_back_matter_sections_are_dropped():
+    reduced = _reduce("Conclusion: Summary: Greenery raises perceived safety.",
+                      "Conclusion: Summary: Acknowledgements",
+                      "Conclusion: Summary: We are grateful to the city for the images.",
+                      "Conclusion: Summary: Declaration of competing interest",
+                      "Conclusion: Summary: The authors declare that they have no known competing interests.",
+                      "Funding: The work received support from the research council.")
+    assert reduced == HEADER + "Conclusion: Summary: Greenery raises perceived safety."
+
+
+def test_thanks_and_grants_in_other_paragraphs_are_removed_by_sentence():
+    reduced = _reduce("Data: Images: Images were taken in 2020. We thank Mapillary for the images. "
+                      "Collection followed grant no. 1234 guidelines.")
+    assert reduced == HEADER + "Data: Images: Images were taken in 2020."
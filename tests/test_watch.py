@@ -0,0 +1,52 @@
+import json
+
+from src.pipeline.watch import WatchDaemon
+
+
+class FlakyReviewer:
+    """answers a PDF after failing fails times"""
+
+    def __init__(self, fails):
+        self.fails = fails
+        self.calls = 0
+
+    def load_output_dict(self, output_json_file_path):
+        return {}
+
+    def qa_from_file(self, file_path):
+        self.calls += 1
+        if self.calls <= self.fails:
+            raise TimeoutError("request timed out")
+        return json.dumps({"answer": file_path})
+
+    def save_as_csv(self, output_dict, output_json_file_path):
+        pass
+
+
+def _daemon(tmp_path, reviewer, max_attempts=3):
+    (tmp_path / "pdf").mkdir()
+    (tmp_path / "pdf" / "paper.pdf").write_bytes(b"%PDF")
+    return WatchDaemon(None, reviewer, str(tmp_path / "xml"), str(tmp_path / "pdf"), str(tmp_path / "papers"),
+                       str(tmp_path / "qa.json"), state_path=str(tmp_path / "state.json"), max_attempts=max_attempts)
+
+
+def _poll(daemon, times):
+    # a file is reported on the poll after the one it is first seen on
+    return [name for _ in range(times) for name in daemon.run_once()]
+
+
+def test_failed_paper_is_retried(tmp_path):
+    reviewer = FlakyReviewer(fails=1)
+    daemon = _daemon(tmp_path, reviewer)
+    assert _poll(daemon, 4) == ["paper.pdf"]
+    assert reviewer.calls == 2
+    assert _poll(daemon, 4) == []
+    assert reviewer.calls == 2
+
+
+def test_failing_paper_is_given_up_on(tmp_path):
+    reviewer = FlakyReviewer(fails=10)
+    daemon = _daemon(tmp_path, reviewer, max_attempts=2)
+    assert _poll(daemon, 10) == []
+    assert reviewer.calls == 2
+    assert str(tmp_path / "pdf" / "paper.pdf") in json.loads((tmp_path / "state.json").read_text())